@@ -44,12 +44,12 @@ import re
 import json
 import time
 import asyncio
-import itertools
 from dotenv import load_dotenv
 from dateutil.parser import parse
-from datetime import datetime, timedelta
+from datetime import datetime
 from playwright.sync_api import sync_playwright
 from playwright.async_api import async_playwright
+from .title_parser import parse_title
 
 
 def pretty_print_json(json_object):
@@ -184,106 +184,6 @@ def split_bookings_by_day(bookings):
     return days
 
 
-def add_missing_timeslots(booking_details):
-    """
-    finds all available timeslots and
-    accounts for all these periods
-    with a 30 minute interval
-    """
-    start_time = "00:00"
-    end_time = "23:30"
-    time_format = "%H:%M"
-    start_dt = datetime.strptime(start_time, time_format)
-    end_dt = datetime.strptime(end_time, time_format)
-    existing_timeslots = [
-        (
-            datetime.strptime(slot["timeslot"].split("-")[0], time_format),
-            datetime.strptime(slot["timeslot"].split("-")[1], time_format),
-        )
-        for slot in booking_details
-    ]
-    complete_booking_details = []
-    current_time = start_dt
-    while current_time <= end_dt:
-        for start, end in existing_timeslots:
-            if start <= current_time < end:
-                complete_booking_details.append(
-                    {
-                        "timeslot": f"{current_time.strftime(time_format)}-{end.strftime(time_format)}",
-                        "available": False,
-                        "status": "Not available",
-                        "details": None,
-                    }
-                )
-                break
-        else:
-            next_time = current_time + timedelta(minutes=30)
-            complete_booking_details.append(
-                {
-                    "timeslot": f"{current_time.strftime(time_format)}-{next_time.strftime(time_format)}",
-                    "available": True,
-                    "status": "Unbooked",
-                    "details": None,
-                }
-            )
-        current_time += timedelta(minutes=30)
-    return complete_booking_details
-
-
-def remove_duplicates_preserve_order(lst):
-    """
-    removes all duplicates while preserving
-    order of list elements
-    """
-    seen = set()
-    result = []
-    for item in lst:
-        if item not in seen:
-            seen.add(item)
-            result.append(item)
-    return result
-
-
-def fill_missing_timeslots(room_schedule):
-    """
-    uses the benefits of a sorted
-    queue data structure to handle
-    missing intervals in a range of timings
-    """
-    target_timeslot_array = []
-    new_schedule = []
-    timeline_overview = remove_duplicates_preserve_order(
-        list(
-            itertools.chain.from_iterable(
-                [slot["timeslot"].split("-") for slot in room_schedule]
-            )
-        )
-    )
-    for i in range(len(timeline_overview) - 1):
-        start = timeline_overview[i]
-        end = timeline_overview[i + 1]
-        target_timeslot = f"{start}-{end}"
-        target_timeslot_array.append(target_timeslot)
-    for slot in room_schedule:
-        # print(slot)
-        if slot["timeslot"] == target_timeslot_array[0]:  # already exists
-            new_schedule.append(slot)
-            del target_timeslot_array[0]
-        else:  # does not yet exist
-            new_timeslot = target_timeslot_array.pop(0)
-            new_schedule.append(
-                {
-                    "timeslot": new_timeslot,
-                    "available": True,
-                    "status": "Available for booking",
-                    "details": None,
-                }
-            )
-            new_schedule.append(slot)
-            del target_timeslot_array[0]
-    return new_schedule
-
-
 async def scrape_smu_fbs(base_url, user_email, user_password):
     """
     Handle automated login to SMU FBS based on
@@ -642,32 +542,9 @@ async def scrape_smu_fbs(base_url, user_email, user_password):
                         booking_details = []
 
                         for booking in booking_array:
-                            if booking.startswith("Booking Time:"):  # existing booking
-                                room_details = {}
-                                for el in booking.split("\n"):
-                                    if el.startswith("Booking Time:"):
-                                        local_timeslot = el.lstrip("Booking Time: ")
-                                    room_details[el.split(": ")[0]] = el.split(": ")[1]
-                                active_booking_details = {
-                                    "timeslot": local_timeslot,
-                                    "available": False,
-                                    "status": "Booked",
-                                    "details": room_details,
-                                }
-                                booking_details.append(active_booking_details)
-
-                            elif booking.endswith(
-                                "(not available)"
-                            ):  # not available booking
-                                time = booking.split(") (")[0]
-                                na_booking_details = {
-                                    "timeslot": time.lstrip("("),
-                                    "available": False,
-                                    "status": "Not available",
-                                    "details": None,
-                                }
-                                booking_details.append(na_booking_details)
-
+                            title = parse_title(booking)
+                            if title is not None:
+                                booking_details.append(title.to_entry())
                             else:
                                 # edge case checking
                                 print(f"Unrecognised timeslot format {booking}")
@@ -0,0 +1,115 @@
+"""
+building, floor and facility type filters a user saves with
+/filters, used by /now and /watch
+
+the bot is deployed on its own, so the valid names mirror
+valid_buildings, valid_floors and valid_facility_types in
+scraper_async/constants.yaml
+"""
+
+VALID_BUILDINGS = [
+    "Administration Building",
+    "Campus Open Spaces - Events/Activities",
+    "Concourse - Room/Lab",
+    "Lee Kong Chian School of Business",
+    "Li Ka Shing Library",
+    "Prinsep Street Residences",
+    "School of Accountancy",
+    "School of Computing & Information Systems 1",
+    "School of Economics/School of Computing & Information Systems 2",
+    "School of Social Sciences/College of Integrative Studies",
+    "SMU Connexion",
+    "Yong Pung How School of Law/Kwa Geok Choo Law Library",
+]
+
+VALID_FLOORS = [
+    "Basement 0",
+    "Basement 2",
+    *(f"Level {level}" for level in range(1, 15)),
+]
+
+VALID_FACILITY_TYPES = [
+    "Chatterbox",
+    "Classroom",
+    "Group Study Room",
+    "Hostel Facilities",
+    "Meeting Pod",
+    "MPH / Sports Hall",
+    "Phone Booth",
+    "Project Room",
+    "Project Room (Level 5)",
+    "Seminar Room",
+    "SMUC Facilities",
+    "Student Activities Area",
+    "Study Booth",
+]
+
+# the short names students actually type
+ALIASES = {
+    "admin": "Administration Building",
+    "lkcsb": "Lee Kong Chian School of Business",
+    "library": "Li Ka Shing Library",
+    "lks": "Li Ka Shing Library",
+    "psr": "Prinsep Street Residences",
+    "soa": "School of Accountancy",
+    "scis1": "School of Computing & Information Systems 1",
+    "scis2": "School of Economics/School of Computing & Information Systems 2",
+    "soe": "School of Economics/School of Computing & Information Systems 2",
+    "soss": "School of Social Sciences/College of Integrative Studies",
+    "cis": "School of Social Sciences/College of Integrative Studies",
+    "connexion": "SMU Connexion",
+    "law": "Yong Pung How School of Law/Kwa Geok Choo Law Library",
+    "yphsl": "Yong Pung How School of Law/Kwa Geok Choo Law Library",
+    "gsr": "Group Study Room",
+    "pod": "Meeting Pod",
+    "booth": "Study Booth",
+}
+
+# /filters <kind> names the user_data key and the valid names for it
+FILTER_KINDS = {
+    "building": ("building_names", VALID_BUILDINGS),
+    "floor": ("floors", VALID_FLOORS),
+    "type": ("facility_types", VALID_FACILITY_TYPES),
+}
+
+
+def match_name(text, valid_names):
+    """
+    the valid spelling of text: an alias, an exact case
+    insensitive match, or else the one valid name that
+    contains it, and None when there is no single match
+    """
+    lowered = text.strip().lower()
+    if not lowered:
+        return None
+    alias = ALIASES.get(lowered)
+    if alias in valid_names:
+        return alias
+    for name in valid_names:
+        if name.lower() == lowered:
+            return name
+    contained = [name for name in valid_names if lowered in name.lower()]
+    return contained[0] if len(contained) == 1 else None
+
+
+def parse_filter(kind, text):
+    """
+    comma separated names for one filter kind into the
+    user_data key and valid names, raising ValueError for
+    the kind or any name that cannot be matched
+    """
+    if kind not in FILTER_KINDS:
+        raise ValueError(f"unknown filter {kind}, use one of {', '.join(FILTER_KINDS)}")
+    key, valid_names = FILTER_KINDS[kind]
+    names = []
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name = match_name(part, valid_names)
+        if name is None:
+            raise ValueError(f"no single {kind} matches '{part.strip()}'")
+        if name not in names:
+            names.append(name)
+    if not names:
+        raise ValueError(f"give at least one {kind}")
+    return key, names
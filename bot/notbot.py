@@ -1,5 +1,7 @@
+import html
 import json
 import os
+import httpx
 from dotenv import load_dotenv
 from telegram.constants import ParseMode
 from telegram.ext import MessageHandler, filters
@@ -11,7 +13,9 @@ from telegram.ext import (
     CallbackQueryHandler,
 )
 from .async_do import scrape_smu_fbs
-from .async_do import fill_missing_timeslots
+from .timeline import fill_timeline
+from .watch import WatchPoller, parse_watch_date
+from .filters import FILTER_KINDS, parse_filter
 
 
 def read_token_env():
@@ -48,6 +52,212 @@ def read_token_json(token_filepath):
         return None
 
 
+def read_api_url_env():
+    """
+    read the sagasu api base url from a .env file,
+    defaulting to a locally running api
+    """
+    load_dotenv()
+    return os.getenv("SAGASU_API_URL", "http://localhost:8000").rstrip("/")
+
+
+async def fetch_available_now(user_data):
+    """
+    ask the api which rooms are free right now for the
+    user's saved configuration, answered from its index
+    without a fresh scrape
+    """
+    params = {
+        "building_names": user_data.get("building_names", []),
+        "floors": user_data.get("floors", []),
+        "facility_types": user_data.get("facility_types", []),
+        "min_free_minutes": user_data.get("min_free_minutes", 30),
+    }
+    async with httpx.AsyncClient(timeout=10) as client:
+        response = await client.get(f"{read_api_url_env()}/now", params=params)
+        response.raise_for_status()
+        return response.json()
+
+
+def describe_filters(user_data):
+    """
+    the user's saved filters as one line per kind
+    """
+    lines = []
+    for kind, (key, _) in FILTER_KINDS.items():
+        lines.append(f"<i>{kind}:</i> {html.escape(', '.join(user_data.get(key, [])) or 'any')}")
+    return "\n".join(lines)
+
+
+async def filters_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /filters building|floor|type <names, comma separated>
+    saves the building, floor and facility type filters used
+    by /now and /watch, /filters clear removes them all
+    """
+    usage = (
+        "Usage: /filters building|floor|type <names, comma separated>\n"
+        "e.g. /filters building SCIS1, SOA or /filters type GSR\n"
+        "/filters <kind> any or /filters clear removes them"
+    )
+    if context.args and context.args[0].lower() == "clear":
+        for key, _ in FILTER_KINDS.values():
+            context.user_data.pop(key, None)
+    elif len(context.args) >= 2 and context.args[1].lower() == "any" and context.args[0].lower() in FILTER_KINDS:
+        context.user_data.pop(FILTER_KINDS[context.args[0].lower()][0], None)
+    elif len(context.args) >= 2:
+        try:
+            key, names = parse_filter(context.args[0].lower(), " ".join(context.args[1:]))
+        except ValueError as e:
+            await update.message.reply_text(f"Couldn't read that: {e}\n{usage}")
+            return
+        context.user_data[key] = names
+    elif context.args:
+        await update.message.reply_text(usage)
+        return
+    await update.message.reply_text(
+        f"<b>Your filters 🗂️</b>\n\n{describe_filters(context.user_data)}",
+        parse_mode=ParseMode.HTML,
+    )
+
+
+async def now_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        available = await fetch_available_now(context.user_data)
+    except httpx.HTTPError as e:
+        print(f"Error fetching available rooms: {e}")
+        await update.message.reply_text(
+            "Couldn't reach the Sagasu API right now. Try again in a bit 🛰️"
+        )
+        return
+
+    rooms = available["rooms"]
+    filtered = any(context.user_data.get(key) for key, _ in FILTER_KINDS.values())
+    filter_text = describe_filters(context.user_data) if filtered else "<i>No filters saved, showing every room. Narrow it with /filters</i>"
+    if not rooms:
+        await update.message.reply_text(
+            f"No rooms free right now ({available['as_of']}) that I know of 😔\n"
+            f"{available['rooms_indexed']} rooms are being tracked today.\n\n{filter_text}",
+            parse_mode=ParseMode.HTML,
+        )
+        return
+
+    response_text = f"<b>Free right now ({available['as_of']}) ⚡</b>\n{filter_text}\n\n"
+    for room in rooms[:10]:
+        response_text += f"<code>{room['room']}</code> 🏠\n"
+        response_text += f"<i>Free until:</i> {room['free_until']}\n"
+        response_text += f"<i>Checked:</i> {int(room['age_seconds'] // 60)} min ago\n\n"
+    if len(rooms) > 10:
+        response_text += f"<i>...and {len(rooms) - 10} more</i>"
+    await update.message.reply_text(response_text, parse_mode=ParseMode.HTML)
+
+
+async def watch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /watch <date> <start time> <hours> [room name]
+    watches for a slot in the window to become available, in
+    rooms matching the user's saved building, floor and facility
+    type filters, or only in rooms whose name contains room name.
+    a watch needs a building filter or a room name, as anything
+    wider would scrape the whole campus every interval
+    """
+    usage = "Usage: /watch <date> <start time> <hours> [room name]\ne.g. /watch tomorrow 14:00 2 or /watch 2024-11-01 10:00 1 SCIS1 GSR 2-4"
+    USER_EMAIL = context.user_data.get("email")
+    USER_PASSWORD = context.user_data.get("password")
+    if not USER_EMAIL or not USER_PASSWORD:
+        await update.message.reply_text(
+            "Set your email and password first lah! Type /settings 💀"
+        )
+        return
+    if len(context.args) < 3:
+        await update.message.reply_text(usage)
+        return
+    try:
+        date_raw = parse_watch_date(context.args[0])
+        start_time = context.args[1]
+        start_hours, start_minutes = map(int, start_time.split(":"))
+        if start_minutes not in (0, 30) or not 0 <= start_hours < 24:
+            raise ValueError("start time must be on the hour or half hour")
+        duration_hours = float(context.args[2])
+    except ValueError as e:
+        await update.message.reply_text(f"Couldn't read that: {e}\n{usage}")
+        return
+
+    query = {
+        "date_raw": date_raw,
+        "start_time": f"{start_hours:02}:{start_minutes:02}",
+        "duration_hours": duration_hours,
+        "building_names": context.user_data.get("building_names", []),
+        "floors": context.user_data.get("floors", []),
+        "facility_types": context.user_data.get("facility_types", []),
+    }
+    room = " ".join(context.args[3:]) or None
+    if not room and not query["building_names"]:
+        await update.message.reply_text(
+            "That would watch every room on campus 🫠\n"
+            "Give a room name, or save a building first, e.g. /filters building SCIS1"
+        )
+        return
+    watch = context.bot_data["watch_poller"].add(
+        update.effective_chat.id,
+        {"username": USER_EMAIL, "password": USER_PASSWORD},
+        query,
+        room,
+    )
+    await update.message.reply_text(
+        f"Watch #{watch['id']} set for {room or 'any matching room'} on {date_raw}, "
+        f"{query['start_time']} for {duration_hours:g}h 🔭\n"
+        "I'll message you when a slot frees up. /watches lists them, /unwatch <id> stops one."
+    )
+
+
+async def watches_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    watches = context.bot_data["watch_poller"].for_chat(update.effective_chat.id)
+    if not watches:
+        await update.message.reply_text("You're not watching anything. Try /watch 🔭")
+        return
+    response_text = "<b>Your watches 🔭</b>\n\n"
+    for watch in watches:
+        response_text += (
+            f"#{watch['id']}: {html.escape(watch['room'] or 'any matching room')} on {watch['query']['date_raw']}, "
+            f"{watch['query']['start_time']} for {watch['query']['duration_hours']:g}h\n"
+        )
+    await update.message.reply_text(response_text, parse_mode=ParseMode.HTML)
+
+
+async def unwatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args or not context.args[0].lstrip("#").isdigit():
+        await update.message.reply_text("Usage: /unwatch <id>")
+        return
+    watch_id = int(context.args[0].lstrip("#"))
+    if context.bot_data["watch_poller"].remove(update.effective_chat.id, watch_id):
+        await update.message.reply_text(f"Watch #{watch_id} stopped 🛑")
+    else:
+        await update.message.reply_text(f"No watch #{watch_id} found 🤔")
+
+
+async def start_watch_poller(application):
+    """
+    one shared poller for every user's watches, scraping each
+    distinct query once per WATCH_INTERVAL_SECONDS
+    """
+    poller = WatchPoller(
+        read_api_url_env(), int(os.getenv("WATCH_INTERVAL_SECONDS", "300"))
+    )
+    application.bot_data["watch_poller"] = poller
+
+    async def send(chat_id, text):
+        await application.bot.send_message(
+            chat_id=chat_id, text=text, parse_mode=ParseMode.HTML
+        )
+
+    poller.start(send)
+
+
+async def stop_watch_poller(application):
+    await application.bot_data["watch_poller"].stop()
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [
         [InlineKeyboardButton("Poke to start scraping 🤯", callback_data="run_script")],
@@ -124,7 +334,7 @@ async def run_script(callback_query: Update, context: ContextTypes.DEFAULT_TYPE)
                 )
         else:
             for room, bookings in scraped_results.items():
-                complete_bookings = fill_missing_timeslots(bookings)
+                complete_bookings = fill_timeline(bookings)
                 response_text = ""
                 response_text += f"<code>{room}</code> 🏠\n\n"
                 for booking in complete_bookings:
@@ -261,16 +471,27 @@ async def settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
-        "<code>Sagasu</code> scrapes SMU FBS data.\n\nType /start to see all options\nType /help for help\nType /settings to adjust your configurations",
+        "<code>Sagasu</code> scrapes SMU FBS data.\n\nType /start to see all options\nType /now for rooms free right now\nType /watch to get told when a room frees up\nType /filters to pick buildings, floors and room types\nType /help for help\nType /settings to adjust your configurations",
         parse_mode=ParseMode.HTML,
     )
 
 
 def main():
-    app = ApplicationBuilder().token(read_token_env()).build()
+    app = (
+        ApplicationBuilder()
+        .token(read_token_env())
+        .post_init(start_watch_poller)
+        .post_shutdown(stop_watch_poller)
+        .build()
+    )
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("help", help_command))
     app.add_handler(CommandHandler("settings", settings_command))
+    app.add_handler(CommandHandler("filters", filters_command))
+    app.add_handler(CommandHandler("now", now_command))
+    app.add_handler(CommandHandler("watch", watch_command))
+    app.add_handler(CommandHandler("watches", watches_command))
+    app.add_handler(CommandHandler("unwatch", unwatch_command))
     app.add_handler(CallbackQueryHandler(button_callback))
     app.add_handler(MessageHandler(filters.TEXT, handle_text_input))
     print("Bot is polling...")
@@ -0,0 +1,97 @@
+"""
+normalise one room's day into a complete timeline: every booked
+and not-available entry as scraped, with the gaps between them
+filled by free slots on a fixed grid
+
+the bot is deployed on its own, so this mirrors scraper_async/timeline.py
+"""
+
+from functools import lru_cache
+
+DAY_MINUTES = 24 * 60
+FREE_STATUS = "Available for booking"
+
+
+def time_minutes(label):
+    hours, minutes = label.strip().split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+@lru_cache(maxsize=4096)
+def timeslot_bounds(timeslot):
+    """
+    Start and end minutes of an HH:MM-HH:MM timeslot. FBS ends the day at 23:59
+    and older grids at 00:00, and both mean the end of the day.
+    """
+    start_label, end_label = timeslot.split("-")
+    start, end = time_minutes(start_label), time_minutes(end_label)
+    if end == DAY_MINUTES - 1 or (end == 0 and start > 0):
+        end = DAY_MINUTES
+    if not 0 <= start < end <= DAY_MINUTES:
+        raise ValueError(f"Invalid timeslot {timeslot}")
+    return start, end
+
+
+def time_label(minutes):
+    if minutes >= DAY_MINUTES:
+        return "23:59"
+    return f"{minutes // 60:02}:{minutes % 60:02}"
+
+
+def free_slots(start, end, slot_minutes, free_status):
+    """
+    Free entries covering start..end, cut at multiples of slot_minutes, so a gap
+    that starts or ends off the grid gets a shorter first or last slot.
+    """
+    slots = []
+    while start < end:
+        slot_end = min((start // slot_minutes + 1) * slot_minutes, end)
+        slots.append({
+            "timeslot": f"{time_label(start)}-{time_label(slot_end)}",
+            "available": True,
+            "status": free_status,
+            "details": None,
+        })
+        start = slot_end
+    return slots
+
+
+def fill_timeline(entries, slot_minutes=30, free_status=FREE_STATUS, day_start=0, day_end=DAY_MINUTES):
+    """
+    entries are a room's booked and not-available timeslot entries, which may span
+    any number of slots, overlap, or sit off the grid. Returns them in start order
+    with free slots in every gap between day_start and day_end, in one pass over
+    the entries (scraped entries already arrive in order, so the sort is linear).
+    Entries are passed through unchanged; ones with an unreadable timeslot are
+    kept where they were and do not move the timeline forward.
+    """
+    if DAY_MINUTES % slot_minutes:
+        raise ValueError(f"slot_minutes must divide a day, got {slot_minutes}")
+    bounded = []
+    for position, entry in enumerate(entries):
+        try:
+            start, end = timeslot_bounds(entry["timeslot"])
+        except (ValueError, AttributeError):
+            print(f"Unrecognised timeslot format, logged here: {entry['timeslot']}")
+            start, end = None, None
+        bounded.append((start, end, position, entry))
+    # Unreadable entries sort just after the entry before them
+    last_start = day_start
+    for index, (start, end, position, entry) in enumerate(bounded):
+        if start is None:
+            bounded[index] = (last_start, None, position, entry)
+        else:
+            last_start = start
+    bounded.sort(key=lambda item: (item[0], item[2]))
+
+    timeline = []
+    cursor = day_start
+    for start, end, _, entry in bounded:
+        if end is not None and start > cursor:
+            timeline.extend(free_slots(cursor, min(start, day_end), slot_minutes, free_status))
+        timeline.append(entry)
+        if end is not None:
+            cursor = max(cursor, end)
+    if cursor < day_end:
+        timeline.extend(free_slots(cursor, day_end, slot_minutes, free_status))
+    return timeline
@@ -0,0 +1,222 @@
+"""
+room watch subscriptions for the telegram bot
+
+every distinct query (date, time window and filters) is scraped once
+per interval through the sagasu api, however many users are watching
+it, and each subscriber is only messaged about slots that have become
+available since the last poll
+"""
+
+import time
+import asyncio
+import itertools
+import httpx
+from dateutil.parser import parse
+from datetime import datetime, timedelta
+from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from .timeline import timeslot_bounds
+
+
+def parse_watch_date(date_input):
+    """
+    accepts today, tomorrow or any date dateutil
+    understands and returns it as YYYY-MM-DD
+    """
+    today = datetime.now().date()
+    words = {"today": today, "tomorrow": today + timedelta(days=1)}
+    date_obj = words.get(date_input.lower()) or parse(date_input).date()
+    if date_obj < today:
+        raise ValueError(f"{date_obj.isoformat()} is in the past")
+    return date_obj.isoformat()
+
+
+def encrypt_credential(public_key_pem, value):
+    """
+    encrypt a credential with the api's public key,
+    hex encoded as the /scrape endpoint expects
+    """
+    public_key = serialization.load_pem_public_key(public_key_pem.encode())
+    encrypted = public_key.encrypt(
+        value.encode(),
+        padding.OAEP(
+            mgf=padding.MGF1(algorithm=hashes.SHA256()),
+            algorithm=hashes.SHA256(),
+            label=None,
+        ),
+    )
+    return encrypted.hex()
+
+
+class WatchPoller:
+    """
+    holds every active watch and polls the api
+    once per distinct query every interval_seconds
+    """
+
+    def __init__(self, api_url, interval_seconds=300):
+        self.api_url = api_url
+        self.interval_seconds = interval_seconds
+        self.watches = {}
+        self._ids = itertools.count(1)
+        self._public_key = None
+        self._task = None
+
+    def add(self, chat_id, credentials, query, room=None):
+        """
+        query holds date_raw, start_time, duration_hours and the
+        building, floor and facility type filters; room optionally
+        narrows the watch to rooms whose name contains it
+        """
+        start_hours, start_minutes = map(int, query["start_time"].split(":"))
+        start = start_hours * 60 + start_minutes
+        watch = {
+            "id": next(self._ids),
+            "chat_id": chat_id,
+            "credentials": credentials,
+            "query": query,
+            "room": room,
+            "window": (start, min(start + int(query["duration_hours"] * 60), 24 * 60)),
+            # None until the first poll, which only records the baseline
+            "seen_available": None,
+        }
+        self.watches[watch["id"]] = watch
+        return watch
+
+    def remove(self, chat_id, watch_id):
+        watch = self.watches.get(watch_id)
+        if watch is None or watch["chat_id"] != chat_id:
+            return False
+        del self.watches[watch_id]
+        return True
+
+    def for_chat(self, chat_id):
+        return [watch for watch in self.watches.values() if watch["chat_id"] == chat_id]
+
+    @staticmethod
+    def query_key(query):
+        return (
+            query["date_raw"],
+            query["start_time"],
+            query["duration_hours"],
+            tuple(sorted(query.get("building_names", []))),
+            tuple(sorted(query.get("floors", []))),
+            tuple(sorted(query.get("facility_types", []))),
+        )
+
+    def expire(self):
+        """
+        drop watches whose window has already ended
+        """
+        now = datetime.now()
+        for watch_id, watch in list(self.watches.items()):
+            window_end = datetime.fromisoformat(watch["query"]["date_raw"]) + timedelta(minutes=watch["window"][1])
+            if window_end <= now:
+                del self.watches[watch_id]
+
+    async def public_key(self, client):
+        if self._public_key is None:
+            response = await client.get(f"{self.api_url}/public-key")
+            response.raise_for_status()
+            self._public_key = response.text
+        return self._public_key
+
+    async def scrape(self, client, query, credentials):
+        public_key = await self.public_key(client)
+        payload = {
+            **query,
+            "credentials": {
+                "username": encrypt_credential(public_key, credentials["username"]),
+                "password": encrypt_credential(public_key, credentials["password"]),
+            },
+        }
+        response = await client.post(f"{self.api_url}/scrape", json=payload)
+        response.raise_for_status()
+        return response.json()["data"]["scraped"]["result"]
+
+    @staticmethod
+    def newly_available(watch, result):
+        """
+        slots inside the watch window that are available now
+        but were not at the previous poll, grouped by room. the
+        first poll only seeds the baseline, since slots that were
+        already free when the watch was set have not freed up
+        """
+        window_start, window_end = watch["window"]
+        # keyed by the parsed bounds, so a slot relabelled between
+        # polls (9:00 and 09:00) is not mistaken for a new one
+        available = {}
+        for room, timeslots in result.items():
+            if watch["room"] and watch["room"].lower() not in room.lower():
+                continue
+            for booking in timeslots:
+                if not booking["available"]:
+                    continue
+                try:
+                    start, end = timeslot_bounds(booking["timeslot"])
+                except ValueError as e:
+                    print(f"Skipping timeslot in watch #{watch['id']}: {e}")
+                    continue
+                if start < window_end and end > window_start:
+                    available[(room, start, end)] = booking["timeslot"]
+        seen = watch["seen_available"]
+        watch["seen_available"] = set(available)
+        if seen is None:
+            return {}
+        grouped = {}
+        for slot in sorted(available.keys() - seen):
+            grouped.setdefault(slot[0], []).append(available[slot])
+        return grouped
+
+    async def poll_once(self, send):
+        """
+        scrape each distinct watched query once and notify
+        every subscriber of slots that changed to available
+        """
+        self.expire()
+        by_query = {}
+        for watch in self.watches.values():
+            by_query.setdefault(self.query_key(watch["query"]), []).append(watch)
+
+        async with httpx.AsyncClient(timeout=None) as client:
+            for watches in by_query.values():
+                try:
+                    result = await self.scrape(client, watches[0]["query"], watches[0]["credentials"])
+                except Exception as e:
+                    print(f"Error polling watched query {watches[0]['query']}: {e}")
+                    continue
+                for watch in watches:
+                    fresh = self.newly_available(watch, result)
+                    if not fresh:
+                        continue
+                    response_text = f"<b>Watch #{watch['id']}: a room freed up on {watch['query']['date_raw']} 👀</b>\n\n"
+                    for room, timeslots in fresh.items():
+                        response_text += f"<code>{room}</code> 🏠\n"
+                        response_text += f"<i>Available:</i> {', '.join(timeslots)}\n\n"
+                    response_text += "<u><a href='https://fbs.intranet.smu.edu.sg/home'>Book it on FBS</a></u> ✅"
+                    try:
+                        await send(watch["chat_id"], response_text)
+                    except Exception as e:
+                        print(f"Error notifying chat {watch['chat_id']}: {e}")
+
+    async def run(self, send):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll_once(send)
+            except Exception as e:
+                print(f"Watch poll failed: {e}")
+            await asyncio.sleep(max(0, self.interval_seconds - (time.monotonic() - started)))
+
+    def start(self, send):
+        self._task = asyncio.create_task(self.run(send))
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -1,14 +1,24 @@
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import PlainTextResponse
 from scraper import scrape_smu_fbs
 from pydantic import BaseModel
 import yaml
+from dateutil.parser import parse
 from security import encrypt_data_rsa, decrypt_data_rsa, load_public_key, load_private_key
 from cryptography.hazmat.primitives import serialization
-from exceptions import FrameNotFoundException
-
-app = FastAPI()
+from exceptions import FrameNotFoundException, BrowserPoolTimeoutException, UpstreamTimeoutException
+from browser_pool import BrowserPool
+from session_cache import SessionCache
+from superset import SupersetStore
+from result_cache import ResultCache
+from prefetch import PrefetchScheduler
+from availability_index import AvailabilityIndex
+from change_feed import ChangeFeed
+from history_store import HistoryStore
+from timeline import DAY_MINUTES, time_minutes
+from superset import REQUEST_FILTERS, canonical_name
 
 def load_constants(config_path='constants.yaml'):
     try:
@@ -24,19 +34,77 @@ def load_constants(config_path='constants.yaml'):
 
 constants = load_constants()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.browser_pool = BrowserPool.from_constants(constants)
+    app.state.session_cache = SessionCache.from_constants(constants)
+    app.state.superset_store = SupersetStore.from_constants(constants)
+    app.state.result_cache = ResultCache.from_constants(constants)
+    app.state.history_store = HistoryStore.from_constants(constants)
+    if app.state.history_store is not None:
+        await app.state.history_store.start()
+    app.state.availability_index = AvailabilityIndex.from_constants(constants)
+    if app.state.availability_index is not None:
+        if app.state.result_cache is not None:
+            app.state.result_cache.listeners.append(lambda key, log, stored_at: app.state.availability_index.ingest_log(log, stored_at))
+        if app.state.superset_store is not None:
+            app.state.superset_store.listeners.append(app.state.availability_index.ingest_snapshot)
+        app.state.availability_index.start()
+    app.state.change_feed = ChangeFeed.from_constants(constants)
+    if app.state.change_feed is not None and app.state.result_cache is not None:
+        app.state.result_cache.listeners.append(app.state.change_feed.record)
+    # Warm start after the listeners are in place so the index and change feed see the reloaded data
+    if app.state.superset_store is not None:
+        await app.state.superset_store.load()
+    if app.state.result_cache is not None:
+        await app.state.result_cache.load()
+    await app.state.browser_pool.start()
+    app.state.prefetch = PrefetchScheduler.from_constants(
+        constants,
+        lambda request: scrape_smu_fbs(request, constants, app.state.browser_pool, app.state.session_cache, app.state.superset_store, app.state.history_store),
+        app.state.result_cache,
+        ScrapeRequest,
+        app.state.browser_pool,
+    )
+    if app.state.prefetch is not None:
+        app.state.prefetch.start()
+    try:
+        yield
+    finally:
+        if app.state.prefetch is not None:
+            await app.state.prefetch.stop()
+        if app.state.availability_index is not None:
+            await app.state.availability_index.stop()
+        await app.state.browser_pool.stop()
+        if app.state.history_store is not None:
+            await app.state.history_store.stop()
+
+app = FastAPI(lifespan=lifespan)
+
 class Credentials(BaseModel):
     username: str
     password: str
 
 class ScrapeRequest(BaseModel):
     credentials: Credentials
-    date_raw: str
+    date_raw: Optional[str] = None
+    date_end: Optional[str] = None
+    dates: Optional[List[str]] = None
+    date_mode: Optional[str] = None
+    scope: Optional[str] = None
     duration_hours: float
     start_time: str
     building_names: Optional[List[str]] = []
     floors: Optional[List[str]] = []
     facility_types: Optional[List[str]] = []
     equipment: Optional[List[str]] = []
+    wait_profile: Optional[str] = None
+    lean: Optional[bool] = None
+    engine: Optional[str] = None
+    filter_mode: Optional[str] = None
+    extractor: Optional[str] = None
+    availability_source: Optional[str] = None
+    compare_availability: Optional[bool] = False
 
 private_key = load_private_key()
 public_key = load_public_key()
@@ -49,6 +117,55 @@ def get_public_key():
     )
     return pem.decode('utf-8')
 
+@app.get("/pool-stats")
+def get_pool_stats():
+    return app.state.browser_pool.stats()
+
+@app.get("/cache-stats")
+def get_cache_stats():
+    if app.state.result_cache is None:
+        return {"enabled": False}
+    stats = app.state.result_cache.stats()
+    if app.state.prefetch is not None:
+        stats["prefetch"] = app.state.prefetch.stats()
+    if app.state.history_store is not None:
+        stats["history"] = app.state.history_store.stats()
+    return stats
+
+@app.get("/changes")
+def get_changes(since: int = 0, limit: int = 100):
+    """
+    Slots freed or booked and rooms added or removed between consecutive scrapes
+    of the same query, after sequence number since.
+    """
+    if app.state.change_feed is None:
+        raise HTTPException(status_code=404, detail="Change feed is disabled")
+    return app.state.change_feed.since(since, limit)
+
+def canonical_filter(names, field):
+    # Filter names spelled as constants.yaml lists them, e.g. "SCIS 1" for "scis 1"; unknown names pass through
+    return [canonical_name(name, constants[REQUEST_FILTERS[field][1]]) or name for name in names]
+
+@app.get("/now")
+def get_available_now(
+    building_names: List[str] = Query([]),
+    floors: List[str] = Query([]),
+    facility_types: List[str] = Query([]),
+    min_free_minutes: int = 30,
+):
+    """
+    Rooms free right now, answered from the availability index without scraping.
+    The index covers whatever the prefetcher and recent scrapes have seen today.
+    """
+    if app.state.availability_index is None:
+        raise HTTPException(status_code=404, detail="Availability index is disabled")
+    return app.state.availability_index.query(
+        building_names=canonical_filter(building_names, "building_names"),
+        floors=canonical_filter(floors, "floors"),
+        facility_types=canonical_filter(facility_types, "facility_types"),
+        min_free_minutes=min_free_minutes,
+    )
+
 ''' 
 THIS IS ONLY FOR TESTING: DO NOT USE THIS IN PRODUCTION
 '''
@@ -86,9 +203,114 @@ async def scrape_endpoint(request: ScrapeRequest):
         request.credentials.username = decrypted_username
         request.credentials.password = decrypted_password
 
-        # Pass the request data to the scraping function
-        data = await scrape_smu_fbs(request, constants)
+        # Pass the request data to the scraping function, sharing results between identical requests
+        scrape = lambda: scrape_smu_fbs(request, constants, app.state.browser_pool, app.state.session_cache, app.state.superset_store, app.state.history_store)
+        if app.state.result_cache is not None:
+            data, freshness = await app.state.result_cache.get_or_scrape(request, constants, scrape)
+        else:
+            data, freshness = await scrape(), {"source": "scrape", "age_seconds": 0}
         if data:
-            return {"status": "success", "data": data}
+            return {"status": "success", "freshness": freshness, "data": data}
+    except BrowserPoolTimeoutException as timeout_error:
+        raise HTTPException(status_code=503, detail=str(timeout_error))
+    except UpstreamTimeoutException as upstream_timeout:
+        raise HTTPException(status_code=504, detail=str(upstream_timeout))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+def window_minutes(time_value):
+    minutes = time_minutes(time_value)
+    # 23:59 stands for the end of the day, as in FBS
+    return DAY_MINUTES if minutes == DAY_MINUTES - 1 else minutes
+
+def index_dates(dates):
+    try:
+        return [parse(date_input).strftime("%d-%b-%Y") for date_input in dates] or None
+    except (ValueError, OverflowError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date input: {e}")
+
+@app.get("/free-runs")
+def get_free_runs(
+    dates: List[str] = Query([]),
+    start_time: str = "00:00",
+    end_time: str = "23:59",
+    duration_hours: float = 1,
+    building_names: List[str] = Query([]),
+    floors: List[str] = Query([]),
+    facility_types: List[str] = Query([]),
+    rank: str = "best_fit",
+    limit: int = 100,
+):
+    """
+    Free runs of at least duration_hours between start_time and end_time on any
+    indexed date (or only dates), best fit first. Answered from the availability
+    index, so only dates and rooms that have been scraped recently are covered.
+    """
+    if app.state.availability_index is None:
+        raise HTTPException(status_code=404, detail="Availability index is disabled")
+    try:
+        runs = app.state.availability_index.matrix().free_runs(
+            int(duration_hours * 60), window_minutes(start_time), window_minutes(end_time),
+            rank=rank, limit=limit, dates=index_dates(dates),
+            building_names=canonical_filter(building_names, "building_names"),
+            floors=canonical_filter(floors, "floors"),
+            facility_types=canonical_filter(facility_types, "facility_types"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"runs": runs}
+
+@app.get("/free-together")
+def get_free_together(
+    rooms: List[str] = Query(...),
+    dates: List[str] = Query([]),
+    start_time: str = "00:00",
+    end_time: str = "23:59",
+    duration_hours: float = 1,
+):
+    """
+    Windows of at least duration_hours when every one of rooms is free at once.
+    """
+    if app.state.availability_index is None:
+        raise HTTPException(status_code=404, detail="Availability index is disabled")
+    try:
+        windows = app.state.availability_index.matrix().joint_availability(
+            rooms, int(duration_hours * 60), window_minutes(start_time), window_minutes(end_time), dates=index_dates(dates),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"windows": windows}
+
+def history_timestamp(time_input):
+    try:
+        return parse(time_input).timestamp() if time_input else None
+    except (ValueError, OverflowError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time input: {e}")
+
+@app.get("/history")
+async def get_history(room: str, date: str, since: Optional[str] = None, until: Optional[str] = None, limit: int = 50):
+    """
+    Past scrapes of one room on one date, newest first, from the history store.
+    """
+    if app.state.history_store is None:
+        raise HTTPException(status_code=404, detail="History store is disabled")
+    date_formatted = index_dates([date])[0]
+    return await app.state.history_store.history(room, date_formatted, history_timestamp(since), history_timestamp(until), limit)
+
+@app.get("/as-of")
+async def get_as_of(
+    date: str,
+    at: Optional[str] = None,
+    building_names: List[str] = Query([]),
+    rooms: List[str] = Query([]),
+):
+    """
+    What every room looked like on date as of the time at (default now), using each
+    room's latest scrape at or before it, without scraping.
+    """
+    if app.state.history_store is None:
+        raise HTTPException(status_code=404, detail="History store is disabled")
+    date_formatted = index_dates([date])[0]
+    return await app.state.history_store.as_of(
+        date_formatted, history_timestamp(at), canonical_filter(building_names, "building_names"), rooms,
+    )
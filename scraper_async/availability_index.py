@@ -0,0 +1,210 @@
+import time
+import asyncio
+from datetime import datetime
+from scheduler_model import minutes_label
+from timeline import timeslot_bounds
+from room_bitmap import free_mask
+from availability_matrix import AvailabilityMatrix
+
+
+def room_now(timeslots, now_minutes):
+    """
+    Whether the room is free at now_minutes, until when, and its next free slot.
+    """
+    slots = sorted((*timeslot_bounds(entry["timeslot"]), entry["available"]) for entry in timeslots)
+    available_now = any(start <= now_minutes < end and available for start, end, available in slots)
+    free_until = None
+    if available_now:
+        # Extend through back-to-back free slots
+        free_until = now_minutes
+        for start, end, available in slots:
+            if end <= free_until:
+                continue
+            if start > free_until or not available:
+                break
+            free_until = end
+    search_from = free_until if available_now else now_minutes
+    next_free = next((minutes_label(start) for start, _, available in slots if available and start >= search_from), None)
+    return {
+        "available_now": available_now,
+        "free_until": minutes_label(free_until) if available_now else None,
+        "free_minutes": free_until - now_minutes if available_now else 0,
+        "next_free": next_free,
+    }
+
+
+class AvailabilityIndex:
+    """
+    Latest timeslots per date and room from every scrape that lands in the result
+    cache or superset store, plus a precomputed "now" view of today's rooms (free
+    right now, until when, next free slot). The view is rebuilt on every ingest and
+    every refresh_seconds as time moves on, so a "now" query only filters it.
+
+    The multi-day matrix is kept up to date row by row on the event loop and
+    swapped in whole, so threadpool queries read a snapshot that never changes
+    under them.
+    """
+
+    def __init__(self, refresh_seconds=30, max_age_seconds=3600):
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self._days = {}
+        self._metadata = {}
+        self._now = {}
+        self._now_date = None
+        self._now_minutes = None
+        self._matrix = AvailabilityMatrix.empty()
+        # Date and room pairs cleared from the matrix after passing max_age_seconds
+        self._expired = set()
+        self._task = None
+
+    @classmethod
+    def from_constants(cls, constants):
+        config = constants.get('availability_index', {})
+        if not config.get('enabled', True):
+            return None
+        return cls(
+            refresh_seconds=config.get('refresh_seconds', 30),
+            max_age_seconds=config.get('max_age_seconds', 3600),
+        )
+
+    def _store(self, date_formatted, room_timeslots, updated_at):
+        """
+        Keep each room's timeslots unless newer ones are already indexed, and return
+        the free bitmask of every room that was stored.
+        """
+        rooms = self._days.setdefault(date_formatted, {})
+        masks = {}
+        for room, timeslots in room_timeslots.items():
+            if room not in rooms or rooms[room]["updated_at"] <= updated_at:
+                rooms[room] = {"timeslots": timeslots, "updated_at": updated_at}
+                masks[room] = free_mask(timeslots, self._matrix.slot_minutes)
+                self._expired.discard((date_formatted, room))
+        return masks
+
+    def _update_matrix(self, masks_by_date, drop_dates=()):
+        # Metadata is copied too, as the matrix hands it out from the threadpool
+        metadata = {room: dict(attributes) for room, attributes in self._metadata.items()}
+        self._matrix = self._matrix.updated(masks_by_date, metadata, drop_dates)
+
+    def ingest_log(self, log, updated_at=None):
+        """
+        Index a booking log. Single-value filters in its config (one building, one
+        facility type, one floor) also tell us that attribute for every room in it.
+        """
+        updated_at = updated_at or time.time()
+        config, result = log["scraped"]["config"], log["scraped"]["result"]
+        dates = config.get("dates") or [config["date"]]
+        by_date = result if "dates" in config else {config["date"]: result}
+        known = {
+            attribute: values[0]
+            for attribute, values in (
+                ("building", config.get("building_names")),
+                ("floor", config.get("floors")),
+                ("facility_type", config.get("facility_types")),
+            )
+            if values and len(values) == 1
+        }
+        masks_by_date = {}
+        for date_formatted in dates:
+            room_timeslots = by_date.get(date_formatted, {})
+            masks_by_date[date_formatted] = self._store(date_formatted, room_timeslots, updated_at)
+            for room in room_timeslots:
+                for attribute, value in known.items():
+                    self._metadata.setdefault(room, {}).setdefault(attribute, value)
+        self._update_matrix(masks_by_date)
+        self.recompute()
+
+    def ingest_snapshot(self, snapshot, updated_at=None):
+        masks = self._store(snapshot["date"], snapshot["timeslots"], updated_at or time.time())
+        for room, metadata in snapshot["rooms"].items():
+            self._metadata.setdefault(room, {}).update({key: value for key, value in metadata.items() if value is not None})
+        self._update_matrix({snapshot["date"]: masks})
+        self.recompute()
+
+    def recompute(self):
+        now = datetime.now()
+        today = now.strftime("%d-%b-%Y")
+        now_minutes = now.hour * 60 + now.minute
+        cutoff = time.time() - self.max_age_seconds
+        view = {}
+        for room, entry in self._days.get(today, {}).items():
+            if entry["updated_at"] < cutoff:
+                continue
+            try:
+                now_view = room_now(entry["timeslots"], now_minutes)
+            except (ValueError, KeyError) as e:
+                # One unreadable room must not take the whole view down with it
+                print(f"Skipping {room} in availability index: {e}")
+                continue
+            view[room] = {
+                "room": room,
+                **self._metadata.get(room, {}),
+                **now_view,
+                "updated_at": entry["updated_at"],
+            }
+        # Past days are never asked for again, and rooms past max_age_seconds count as busy
+        past_dates = [date for date in self._days if datetime.strptime(date, "%d-%b-%Y").date() < now.date()]
+        for date_formatted in past_dates:
+            del self._days[date_formatted]
+        expired = {}
+        for date_formatted, rooms in self._days.items():
+            for room, entry in rooms.items():
+                if entry["updated_at"] < cutoff and (date_formatted, room) not in self._expired:
+                    expired.setdefault(date_formatted, {})[room] = 0
+                    self._expired.add((date_formatted, room))
+        self._expired = {(date_formatted, room) for date_formatted, room in self._expired if date_formatted not in past_dates}
+        if past_dates or expired:
+            self._update_matrix(expired, drop_dates=past_dates)
+        self._now, self._now_date, self._now_minutes = view, today, now_minutes
+
+    def query(self, building_names=None, floors=None, facility_types=None, min_free_minutes=0):
+        """
+        Rooms free right now that match every given filter, longest free run first.
+        A room whose building, floor or facility type is unknown never matches a filter on it.
+        """
+        filters = {"building": building_names, "floor": floors, "facility_type": facility_types}
+        now = time.time()
+        rooms = []
+        for entry in self._now.values():
+            if not entry["available_now"] or entry["free_minutes"] < min_free_minutes:
+                continue
+            if any(names and entry.get(attribute) not in names for attribute, names in filters.items()):
+                continue
+            rooms.append({**entry, "age_seconds": round(now - entry["updated_at"], 1)})
+        rooms.sort(key=lambda room: room["free_minutes"], reverse=True)
+        return {
+            "date": self._now_date,
+            "as_of": minutes_label(self._now_minutes) if self._now_minutes is not None else None,
+            "rooms_indexed": len(self._now),
+            "rooms": rooms,
+        }
+
+    def matrix(self):
+        """
+        Every indexed date and room as an AvailabilityMatrix for multi-day queries.
+        Rooms whose data has passed max_age_seconds count as busy from the next
+        refresh on.
+        """
+        return self._matrix
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                self.recompute()
+            except Exception as e:
+                print(f"Availability index refresh failed: {e}")
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,183 @@
+import numpy as np
+from datetime import datetime
+from scheduler_model import minutes_label
+from room_bitmap import DAY_MINUTES, free_mask
+
+RANKINGS = ("best_fit", "earliest", "longest")
+
+
+def free_runs_2d(free):
+    """
+    Every maximal run of True in each row of a 2D boolean array, as arrays of
+    (row, first, last) with last exclusive, ordered by row then first.
+    """
+    rows, slots = free.shape
+    padded = np.zeros((rows, slots + 2), dtype=np.int8)
+    padded[:, 1:-1] = free
+    edges = np.diff(padded, axis=1)
+    run_rows, firsts = np.nonzero(edges == 1)
+    _, lasts = np.nonzero(edges == -1)
+    return run_rows, firsts, lasts
+
+
+class AvailabilityMatrix:
+    """
+    Free slots for many rooms and dates as one boolean array indexed by
+    (date, room, slot), built from the per room-day bitmasks. A room missing on a
+    date counts as busy all day. Queries clip to a time window and find free runs
+    with array operations instead of walking timeslot lists.
+    """
+
+    def __init__(self, dates, rooms, free, slot_minutes=30, room_metadata=None):
+        self.dates = list(dates)
+        self.rooms = list(rooms)
+        self.free = free
+        self.slot_minutes = slot_minutes
+        self.room_metadata = room_metadata or {}
+        self._date_index = {date_formatted: index for index, date_formatted in enumerate(self.dates)}
+        self._room_index = {room: index for index, room in enumerate(self.rooms)}
+
+    @classmethod
+    def empty(cls, slot_minutes=30, room_metadata=None):
+        return cls([], [], np.zeros((0, 0, DAY_MINUTES // slot_minutes), dtype=bool), slot_minutes, room_metadata)
+
+    @classmethod
+    def from_masks(cls, masks_by_date, slot_minutes=30, room_metadata=None):
+        """
+        masks_by_date is {date: {room: free bitmask}} with dates in %d-%b-%Y.
+        """
+        return cls.empty(slot_minutes).updated(masks_by_date, room_metadata)
+
+    def updated(self, masks_by_date, room_metadata=None, drop_dates=()):
+        """
+        A new matrix with the rows in masks_by_date ({date: {room: free bitmask}})
+        replaced, new dates and rooms added and drop_dates left out. Other rows are
+        copied over rather than recomputed, and this matrix is not modified, so a
+        query already holding it is unaffected. room_metadata defaults to this
+        matrix's.
+        """
+        drop_dates = set(drop_dates)
+        kept_dates = [date_formatted for date_formatted in self.dates if date_formatted not in drop_dates]
+        new_dates = {date_formatted for date_formatted in masks_by_date if date_formatted not in drop_dates}
+        dates = sorted(set(kept_dates) | new_dates, key=lambda date_formatted: datetime.strptime(date_formatted, "%d-%b-%Y"))
+        rooms = sorted(set(self.rooms).union(*(masks_by_date[date_formatted] for date_formatted in new_dates)))
+        date_index = {date_formatted: index for index, date_formatted in enumerate(dates)}
+        room_index = {room: index for index, room in enumerate(rooms)}
+        slots = self.free.shape[2]
+        width = (slots + 7) // 8
+        free = np.zeros((len(dates), len(rooms), slots), dtype=bool)
+        if kept_dates and self.rooms:
+            free[np.ix_([date_index[date_formatted] for date_formatted in kept_dates], [room_index[room] for room in self.rooms])] = \
+                self.free[[self._date_index[date_formatted] for date_formatted in kept_dates]]
+        for date_formatted in new_dates:
+            masks = masks_by_date[date_formatted]
+            if not masks:
+                continue
+            packed = np.frombuffer(b"".join(mask.to_bytes(width, "little") for mask in masks.values()), dtype=np.uint8)
+            rows = np.unpackbits(packed.reshape(len(masks), width), axis=1, bitorder="little")[:, :slots].astype(bool)
+            free[date_index[date_formatted], [room_index[room] for room in masks]] = rows
+        return type(self)(dates, rooms, free, self.slot_minutes, self.room_metadata if room_metadata is None else room_metadata)
+
+    @classmethod
+    def from_room_days(cls, room_days_by_date, slot_minutes=30, room_metadata=None):
+        """
+        room_days_by_date is {date: {room: RoomDay}}, all with slot_minutes slots.
+        """
+        masks_by_date = {}
+        for date_formatted, days in room_days_by_date.items():
+            for room, day in days.items():
+                if day.slot_minutes != slot_minutes:
+                    raise ValueError(f"{room} on {date_formatted} has {day.slot_minutes} minute slots, expected {slot_minutes}")
+                masks_by_date.setdefault(date_formatted, {})[room] = day.free
+        return cls.from_masks(masks_by_date, slot_minutes, room_metadata)
+
+    @classmethod
+    def from_results(cls, results, slot_minutes=30, room_metadata=None):
+        """
+        results is {date: {room: timeslots}} as in a multi-date booking log.
+        """
+        masks_by_date = {
+            date_formatted: {room: free_mask(timeslots, slot_minutes) for room, timeslots in rooms.items()}
+            for date_formatted, rooms in results.items()
+        }
+        return cls.from_masks(masks_by_date, slot_minutes, room_metadata)
+
+    def select(self, dates=None, rooms=None, building_names=None, floors=None, facility_types=None):
+        """
+        Date and room positions matching the arguments. Unknown dates are skipped, and a
+        room whose building, floor or facility type is unknown never matches a filter on it.
+        """
+        date_positions = np.arange(len(self.dates)) if dates is None else np.array(
+            [self._date_index[date_formatted] for date_formatted in dates if date_formatted in self._date_index], dtype=np.intp)
+        candidates = self.rooms if rooms is None else [room for room in rooms if room in self._room_index]
+        filters = {"building": building_names, "floor": floors, "facility_type": facility_types}
+        room_positions = np.array([
+            self._room_index[room] for room in candidates
+            if not any(names and self.room_metadata.get(room, {}).get(attribute) not in names for attribute, names in filters.items())
+        ], dtype=np.intp)
+        return date_positions, room_positions
+
+    def _slot_window(self, start_minutes, end_minutes):
+        return -(-start_minutes // self.slot_minutes), min(end_minutes, DAY_MINUTES) // self.slot_minutes
+
+    def free_runs(self, min_minutes, start_minutes=0, end_minutes=DAY_MINUTES, rank="best_fit", limit=None,
+                  dates=None, rooms=None, building_names=None, floors=None, facility_types=None):
+        """
+        Free runs of at least min_minutes inside start_minutes..end_minutes for every
+        selected date and room. best_fit puts the shortest runs that still fit first,
+        so long stretches are left for longer bookings; earliest sorts by date and
+        start; longest puts the longest runs first.
+        """
+        if rank not in RANKINGS:
+            raise ValueError(f"rank must be one of {RANKINGS}, got {rank}")
+        date_positions, room_positions = self.select(dates, rooms, building_names, floors, facility_types)
+        first_slot, last_slot = self._slot_window(start_minutes, end_minutes)
+        if not len(date_positions) or not len(room_positions) or last_slot <= first_slot:
+            return []
+        window = self.free[np.ix_(date_positions, room_positions)][:, :, first_slot:last_slot]
+        run_rows, firsts, lasts = free_runs_2d(window.reshape(-1, last_slot - first_slot))
+        lengths = lasts - firsts
+        fits = lengths >= max(1, -(-min_minutes // self.slot_minutes))
+        run_rows, firsts, lengths = run_rows[fits], firsts[fits] + first_slot, lengths[fits]
+        run_dates = date_positions[run_rows // len(room_positions)]
+        run_rooms = room_positions[run_rows % len(room_positions)]
+        if rank == "best_fit":
+            order = np.lexsort((firsts, run_dates, lengths))
+        elif rank == "longest":
+            order = np.lexsort((firsts, run_dates, -lengths))
+        else:
+            order = np.lexsort((run_rooms, firsts, run_dates))
+        if limit is not None:
+            order = order[:limit]
+        return [
+            {
+                "date": self.dates[run_dates[index]],
+                "room": self.rooms[run_rooms[index]],
+                "start": minutes_label(int(firsts[index]) * self.slot_minutes),
+                "end": minutes_label(int(firsts[index] + lengths[index]) * self.slot_minutes),
+                "free_minutes": int(lengths[index]) * self.slot_minutes,
+                **self.room_metadata.get(self.rooms[run_rooms[index]], {}),
+            }
+            for index in order
+        ]
+
+    def joint_availability(self, rooms, min_minutes, start_minutes=0, end_minutes=DAY_MINUTES, dates=None):
+        """
+        Windows of at least min_minutes when every one of rooms is free at once, by date.
+        """
+        date_positions, room_positions = self.select(dates, rooms)
+        first_slot, last_slot = self._slot_window(start_minutes, end_minutes)
+        if not len(date_positions) or len(room_positions) < len(set(rooms)) or last_slot <= first_slot:
+            return []
+        together = self.free[np.ix_(date_positions, room_positions)][:, :, first_slot:last_slot].all(axis=1)
+        run_rows, firsts, lasts = free_runs_2d(together)
+        fits = lasts - firsts >= max(1, -(-min_minutes // self.slot_minutes))
+        return [
+            {
+                "date": self.dates[date_positions[row]],
+                "start": minutes_label(int(first + first_slot) * self.slot_minutes),
+                "end": minutes_label(int(last + first_slot) * self.slot_minutes),
+                "free_minutes": int(last - first) * self.slot_minutes,
+            }
+            for row, first, last in zip(run_rows[fits], firsts[fits], lasts[fits])
+        ]
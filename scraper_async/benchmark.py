@@ -0,0 +1,373 @@
+"""
+Benchmarks for the scraper's hot paths.
+
+    python benchmark.py extraction [saved_scheduler_page.html] [rooms]
+    python benchmark.py bitmap [rooms]
+    python benchmark.py matrix [rooms] [days]
+    python benchmark.py timeline [room_days]
+    python benchmark.py titles [count]
+
+Without a saved page, a synthetic FBS results page with the same markup is generated.
+"""
+
+import sys
+import json
+import random
+import time
+import asyncio
+import yaml
+from playwright.async_api import async_playwright
+from scraper import extract_matching_rooms, scrape_timeslots, extract_page_bulk, parse_timeslots
+from room_bitmap import RoomDay, joint_free, free_windows, free_mask
+from availability_matrix import AvailabilityMatrix
+from timeline import fill_timeline, timeslot_bounds, DAY_MINUTES
+from title_parser import parse_title
+from datetime import date, timedelta
+
+
+def load_constants(config_path='constants.yaml'):
+    with open(config_path, 'r') as file:
+        return yaml.safe_load(file)
+
+
+def synthetic_scheduler_page(rooms=300):
+    grid_rows = []
+    row_headers = ['<div class="scheduler_bluewhite_rowheader_inner">School of Computing &amp; Information Systems 1</div>']
+    events = []
+    for index in range(rooms):
+        room = f"SCIS1 Group Study Room 2-{index:03}"
+        grid_rows.append(f"<tr><td><input type='checkbox'></td><td>{room}</td><td>Level 2</td><td>Group Study Room</td><td>6</td></tr>")
+        row_headers.append(f'<div class="scheduler_bluewhite_rowheader_inner">{room}</div>')
+        titles = ["(00:00-08:30) (not available)"]
+        for hour in range(9, 21, 3):
+            titles.append(
+                f"Booking Time: {hour:02}:00-{hour + 1:02}:30&#10;"
+                "Booking Status: Confirmed&#10;"
+                f"Booking Reference Number: BK-20241101-{index:06}&#10;"
+                "Booked for User Name: JANE DOE&#10;"
+                "Booked for User Org Unit: &#10;"
+                "Booked for User Email Address: jane.doe.2024@scis.smu.edu.sg&#10;"
+                "Use Type: AdHoc&#10;"
+                "Purpose of Booking: study"
+            )
+        titles.append("(22:30-23:59) (not available)")
+        events.extend(f'<div class="scheduler_bluewhite_event scheduler_bluewhite_event_line0" title="{title}"></div>' for title in titles)
+    return (
+        "<html><body>"
+        f"<table id='GridResults_gv'><tbody>{''.join(grid_rows)}</tbody></table>"
+        f"<div class='scheduler'>{''.join(row_headers)}{''.join(events)}</div>"
+        "</body></html>"
+    )
+
+
+def synthetic_room_day(index):
+    """
+    A filled room day like the scraper returns: closed overnight, a few merged
+    bookings, and single 30 minute free slots in between.
+    """
+    booked = {(9 + (index + offset) % 12) * 60 + 30 * (offset % 2): 90 for offset in range(0, 9, 3)}
+    timeslots = [{"timeslot": "00:00-08:30", "available": False, "status": "Not available", "details": None}]
+    minutes = 8 * 60 + 30
+    while minutes < 22 * 60 + 30:
+        if minutes in booked:
+            end = min(minutes + booked[minutes], 22 * 60 + 30)
+            timeslots.append({
+                "timeslot": f"{minutes // 60:02}:{minutes % 60:02}-{end // 60:02}:{end % 60:02}",
+                "available": False,
+                "status": "Booked",
+                "details": {"Booking Status": "Confirmed", "Booking Reference Number": f"BK-20241101-{index:06}"},
+            })
+        else:
+            end = minutes + 30
+            timeslots.append({
+                "timeslot": f"{minutes // 60:02}:{minutes % 60:02}-{end // 60:02}:{end % 60:02}",
+                "available": True,
+                "status": "Available for booking",
+                "details": None,
+            })
+        minutes = end
+    timeslots.append({"timeslot": "22:30-23:59", "available": False, "status": "Not available", "details": None})
+    return timeslots
+
+
+def time_sync(label, function, repeats):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    best = min(timings)
+    print(f"{label:<24} best {best:10.3f} ms   mean {sum(timings) / len(timings):10.3f} ms")
+    return best, result
+
+
+def benchmark_bitmap(rooms=1000, repeats=20):
+    result = {f"Room {index:04}": synthetic_room_day(index) for index in range(rooms)}
+    start, end = 14 * 60, 16 * 60
+
+    def parse_strings():
+        free = []
+        for room, timeslots in result.items():
+            covered = sorted(timeslot_bounds(entry["timeslot"]) for entry in timeslots if entry["available"])
+            reached = start
+            for slot_start, slot_end in covered:
+                if slot_start <= reached < slot_end:
+                    reached = slot_end
+            if reached >= end:
+                free.append(room)
+        return free
+
+    build_ms, days = time_sync("build bitmaps", lambda: {room: RoomDay.from_timeslots(timeslots) for room, timeslots in result.items()}, 3)
+    string_ms, string_free = time_sync("free 14:00-16:00 strings", parse_strings, repeats)
+    bitmap_ms, bitmap_free = time_sync("free 14:00-16:00 bitmap", lambda: [room for room, day in days.items() if day.is_free(start, end)], repeats)
+    time_sync("first free after 12:00", lambda: [day.first_free_after(12 * 60, 120) for day in days.values()], repeats)
+    time_sync("joint free windows", lambda: free_windows(joint_free(list(days.values())[:10]), 30, 60), repeats)
+
+    round_trip = all(day.to_timeslots() == result[room] for room, day in days.items())
+    json_bytes = len(json.dumps(result))
+    compact_bytes = len(json.dumps({room: day.to_compact() for room, day in days.items()}))
+    print(f"rooms: {rooms}, identical answers: {string_free == bitmap_free}, speedup: {string_ms / bitmap_ms:.1f}x")
+    print(f"lossless round trip: {round_trip}, json {json_bytes} bytes, compact {compact_bytes} bytes ({compact_bytes / json_bytes:.0%})")
+
+
+def benchmark_matrix(rooms=2000, days=30, repeats=5):
+    first_day = date.today()
+    day_lists = [synthetic_room_day(index) for index in range(48)]
+    results = {
+        (first_day + timedelta(days=offset)).strftime("%d-%b-%Y"): {
+            f"Room {index:04}": day_lists[(index + offset) % len(day_lists)] for index in range(rooms)
+        }
+        for offset in range(days)
+    }
+    metadata = {f"Room {index:04}": {"floor": f"Level {index % 5}"} for index in range(rooms)}
+    start, end, needed = 11 * 60, 18 * 60, 150
+
+    def nested_loops():
+        runs = []
+        for date_formatted, by_room in results.items():
+            for room, timeslots in by_room.items():
+                if metadata[room]["floor"] != "Level 2":
+                    continue
+                run_start = None
+                for slot_start, slot_end, available in sorted((*timeslot_bounds(entry["timeslot"]), entry["available"]) for entry in timeslots):
+                    inside = available and slot_start >= start and slot_end <= end
+                    if inside and run_start is None:
+                        run_start, run_end = slot_start, slot_end
+                    elif inside and slot_start == run_end:
+                        run_end = slot_end
+                    else:
+                        if run_start is not None and run_end - run_start >= needed:
+                            runs.append((date_formatted, room, run_start, run_end))
+                        run_start = slot_start if inside else None
+                        run_end = slot_end
+                if run_start is not None and run_end - run_start >= needed:
+                    runs.append((date_formatted, room, run_start, run_end))
+        return runs
+
+    build_ms, matrix = time_sync("build matrix", lambda: AvailabilityMatrix.from_results(results, room_metadata=metadata), 1)
+    loop_ms, loop_runs = time_sync("nested dict loops", nested_loops, repeats)
+    array_ms, array_runs = time_sync("matrix free runs", lambda: matrix.free_runs(needed, start, end, rank="earliest", floors=["Level 2"]), repeats)
+    time_sync("matrix best fit", lambda: matrix.free_runs(needed, start, end, floors=["Level 2"], limit=20), repeats)
+    time_sync("matrix joint (5 rooms)", lambda: matrix.joint_availability(matrix.rooms[:5], 60, start, end), repeats)
+    # What the availability index does per scrape: recompute only the scraped rows
+    scraped_date = min(results)
+    scraped = dict(list(results[scraped_date].items())[:300])
+    update_ms, updated = time_sync("update 300 scraped rows", lambda: matrix.updated({scraped_date: {room: free_mask(timeslots) for room, timeslots in scraped.items()}}), repeats)
+    print(f"{'':<24} incremental update is {build_ms / update_ms:.0f}x faster than a rebuild, same matrix: {bool((updated.free == matrix.free).all())}")
+
+    same = sorted(loop_runs) == sorted((run["date"], run["room"], timeslot_bounds(f"{run['start']}-{run['end']}")[0], timeslot_bounds(f"{run['start']}-{run['end']}")[1]) for run in array_runs)
+    print(f"rooms: {rooms}, days: {days}, runs: {len(array_runs)}, identical answers: {same}, speedup: {loop_ms / array_ms:.1f}x")
+
+
+def random_bookings(rng, step):
+    """
+    Unavailable entries for one room-day on a step minute grid, closed overnight,
+    with merged and occasionally overlapping bookings in between.
+    """
+    label = lambda minutes: "23:59" if minutes >= DAY_MINUTES else f"{minutes // 60:02}:{minutes % 60:02}"
+    entries = [{"timeslot": "00:00-08:30", "available": False, "status": "Not available", "details": None}]
+    minutes = 8 * 60 + 30
+    while minutes < 22 * 60:
+        minutes += rng.randrange(0, 240, step)
+        end = min(minutes + rng.randrange(step, 300, step), 22 * 60 + 30)
+        if minutes < end:
+            entries.append({"timeslot": f"{label(minutes)}-{label(end)}", "available": False, "status": "Booked", "details": {}})
+        minutes = end - (step if rng.random() < 0.1 else 0)
+    entries.append({"timeslot": "22:30-23:59", "available": False, "status": "Not available", "details": None})
+    return entries
+
+
+def timeline_problems(entries, timeline):
+    """
+    What is wrong with a filled timeline: entries lost, free slots overlapping
+    unavailable ones, or minutes of the day left uncovered.
+    """
+    if [entry for entry in timeline if not entry["available"]] != sorted(entries, key=lambda entry: timeslot_bounds(entry["timeslot"])[0]):
+        return "unavailable entries changed"
+    covered = [False] * DAY_MINUTES
+    busy = [False] * DAY_MINUTES
+    for entry in entries:
+        start, end = timeslot_bounds(entry["timeslot"])
+        busy[start:end] = [True] * (end - start)
+    for entry in timeline:
+        start, end = timeslot_bounds(entry["timeslot"])
+        if entry["available"] and any(busy[start:end]):
+            return f"free slot {entry['timeslot']} overlaps a booking"
+        covered[start:end] = [True] * (end - start)
+    return None if all(covered) else "gaps left in the day"
+
+
+def benchmark_timeline(room_days=5000, repeats=5):
+    rng = random.Random(0)
+    for step in (30, 15, 5):
+        days = [random_bookings(rng, step) for _ in range(room_days)]
+        problems = [problem for entries in days[:500] for problem in [timeline_problems(entries, fill_timeline(entries, step))] if problem]
+        best, _ = time_sync(f"fill at {step} minutes", lambda: [fill_timeline(entries, step) for entries in days], repeats)
+        print(f"{'':<24} {best * 1000 / room_days:10.1f} us per room-day, invariant violations: {len(problems)}")
+
+
+def title_corpus(count, rng):
+    """
+    Event titles in the formats FBS renders: bookings with every field, an empty
+    org unit, a multi-line purpose or an extra field, and not-available periods.
+    """
+    purposes = ["study", "CS101 project meeting", "Interview prep\nbring laptops", "Club AGM: budget, elections", ""]
+    titles = []
+    for index in range(count):
+        start = rng.randrange(17, 44)
+        end = min(start + rng.randrange(1, 8), 48)
+        label = lambda slot: "23:59" if slot == 48 else f"{slot // 2:02}:{slot % 2 * 30:02}"
+        if index % 5 == 0:
+            titles.append(f"({label(start)}-{label(end)}) (not available)")
+            continue
+        lines = [
+            f"Booking Time: {label(start)}-{label(end)}",
+            "Booking Status: Confirmed",
+            f"Booking Reference Number: BK-20241101-{index:06}",
+            "Booked for User Name: JANE DOE",
+            "Booked for User Org Unit: " + ("" if index % 3 else "School of Computing and Information Systems"),
+            f"Booked for User Email Address: jane.doe.{index}@scis.smu.edu.sg",
+            "Use Type: AdHoc",
+            f"Purpose of Booking: {rng.choice(purposes)}",
+        ]
+        if index % 7 == 0:
+            lines.insert(3, "Booking Remarks: recurring weekly")
+        titles.append("\n".join(lines))
+    return titles
+
+
+def legacy_parse_title(booking):
+    # The split based parser this module replaced, kept for comparison
+    if booking.startswith("Booking Time:"):
+        details = {}
+        lines = booking.split("\n")
+        for line in lines[1:]:
+            key, value = line.split(": ", 1)
+            details[key] = value
+        return lines[0].replace("Booking Time: ", ""), details
+    elif booking.endswith("(not available)"):
+        return booking.split(") (")[0].lstrip("("), None
+    return None
+
+
+def benchmark_titles(count=100000, repeats=5):
+    titles = title_corpus(count, random.Random(0))
+
+    def legacy():
+        parsed = []
+        for title in titles:
+            try:
+                parsed.append(legacy_parse_title(title))
+            except ValueError:
+                parsed.append(None)
+        return parsed
+
+    legacy_ms, legacy_parsed = time_sync("split parser", legacy, repeats)
+    parser_ms, records = time_sync("compiled parser", lambda: [parse_title(title) for title in titles], repeats)
+    crashed = sum(parsed is None for parsed in legacy_parsed)
+    unparsed = sum(record is None for record in records)
+    print(f"titles: {count}, split parser failures: {crashed}, compiled parser failures: {unparsed}")
+    print(f"compiled parser: {count / parser_ms * 1000:,.0f} titles/s, split parser: {count / legacy_ms * 1000:,.0f} titles/s")
+
+
+async def time_async(label, coroutine_factory, repeats):
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = await coroutine_factory()
+        timings.append((time.perf_counter() - started) * 1000)
+    best = min(timings)
+    print(f"{label:<24} best {best:10.1f} ms   mean {sum(timings) / len(timings):10.1f} ms")
+    return best, result
+
+
+async def benchmark_extraction(markup, repeats=3):
+    constants = load_constants()
+    valid_buildings = constants['valid_buildings']
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.set_content(markup)
+        frame = page.main_frame
+
+        async def per_element():
+            matching_rooms = await extract_matching_rooms(frame)
+            return matching_rooms, await scrape_timeslots(frame, valid_buildings)
+
+        async def bulk():
+            extracted = await extract_page_bulk(frame)
+            return extracted["matching_rooms"], parse_timeslots(extracted["room_names"], extracted["booking_titles"], valid_buildings)
+
+        element_ms, element_result = await time_async("per-element extraction", per_element, repeats)
+        bulk_ms, bulk_result = await time_async("bulk extraction", bulk, repeats)
+        await browser.close()
+
+    print(f"rooms: {len(bulk_result[0])}, identical output: {element_result == bulk_result}, speedup: {element_ms / bulk_ms:.1f}x")
+
+
+def main(argv):
+    if not argv or argv[0] not in BENCHMARKS:
+        print(__doc__)
+        return
+    BENCHMARKS[argv[0]](argv[1:])
+
+
+def run_extraction(args):
+    saved_page = args[0] if args and args[0].endswith(".html") else None
+    if saved_page:
+        with open(saved_page, 'r') as file:
+            markup = file.read()
+    else:
+        markup = synthetic_scheduler_page(int(args[0]) if args else 300)
+    asyncio.run(benchmark_extraction(markup))
+
+
+def run_bitmap(args):
+    benchmark_bitmap(int(args[0]) if args else 1000)
+
+
+def run_matrix(args):
+    benchmark_matrix(int(args[0]) if args else 2000, int(args[1]) if len(args) > 1 else 30)
+
+
+def run_timeline(args):
+    benchmark_timeline(int(args[0]) if args else 5000)
+
+
+def run_titles(args):
+    benchmark_titles(int(args[0]) if args else 100000)
+
+
+BENCHMARKS = {
+    "extraction": run_extraction,
+    "bitmap": run_bitmap,
+    "matrix": run_matrix,
+    "timeline": run_timeline,
+    "titles": run_titles,
+}
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
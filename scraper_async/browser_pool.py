@@ -0,0 +1,158 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from exceptions import BrowserPoolTimeoutException
+
+
+class BrowserPool:
+    """
+    Keeps a fixed number of warm Chromium browsers alive for the lifetime of the
+    service and leases out fresh BrowserContexts on top of them.
+    """
+
+    def __init__(self, size=2, lease_timeout=30, launch_options=None):
+        self.size = size
+        self.lease_timeout = lease_timeout
+        self.launch_options = launch_options or {"headless": True}
+        self._playwright = None
+        self._idle = asyncio.Queue()
+        self._browsers = []
+        self._leased = 0
+        self._waiting = 0
+        self._total_leases = 0
+        self._lease_timeouts = 0
+        self._relaunches = 0
+        self._total_wait_seconds = 0.0
+
+    @classmethod
+    def from_constants(cls, constants):
+        config = constants.get('browser_pool', {})
+        return cls(
+            size=config.get('size', 2),
+            lease_timeout=config.get('lease_timeout_seconds', 30),
+            launch_options={
+                "headless": config.get('headless', True),
+                "slow_mo": config.get('slow_mo', 0),
+            },
+        )
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        for _ in range(self.size):
+            browser = await self._launch()
+            self._browsers.append(browser)
+            self._idle.put_nowait(browser)
+        print(f"Browser pool started with {self.size} browsers")
+
+    async def stop(self):
+        for browser in self._browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                print(f"Error closing pooled browser: {e}")
+        self._browsers = []
+        self._idle = asyncio.Queue()
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        print("Browser pool stopped")
+
+    async def _launch(self):
+        return await self._playwright.chromium.launch(**self.launch_options)
+
+    async def _replace(self, browser):
+        # A crashed or disconnected browser is swapped out so the pool keeps its size.
+        # browser is None for a slot whose last relaunch failed
+        if browser in self._browsers:
+            self._browsers.remove(browser)
+        replacement = await self._launch()
+        self._browsers.append(replacement)
+        self._relaunches += 1
+        print("Replaced disconnected browser in pool")
+        return replacement
+
+    async def _acquire(self, timeout):
+        self._waiting += 1
+        wait_started = time.monotonic()
+        try:
+            browser = await asyncio.wait_for(self._idle.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._lease_timeouts += 1
+            raise BrowserPoolTimeoutException(timeout)
+        finally:
+            self._waiting -= 1
+        if browser is None or not browser.is_connected():
+            try:
+                browser = await self._replace(browser)
+            except Exception:
+                # Keep the slot for the next lease to retry
+                self._idle.put_nowait(None)
+                raise
+        self._total_wait_seconds += time.monotonic() - wait_started
+        self._leased += 1
+        self._total_leases += 1
+        return browser
+
+    async def _release(self, browser):
+        self._leased -= 1
+        if not browser.is_connected():
+            try:
+                browser = await self._replace(browser)
+            except Exception as e:
+                # Don't hold up the caller on a broken launch: an empty slot goes back
+                # into the pool and the next lease that takes it relaunches
+                print(f"Failed to relaunch pooled browser, retrying on the next lease: {e}")
+                if browser in self._browsers:
+                    self._browsers.remove(browser)
+                browser = None
+        self._idle.put_nowait(browser)
+
+    @asynccontextmanager
+    async def lease(self, timeout=None, **context_options):
+        """
+        Lease a fresh BrowserContext from one of the pooled browsers.
+        The context is closed and the browser returned to the pool on exit.
+        """
+        if self._playwright is None:
+            raise RuntimeError("Browser pool has not been started.")
+        browser = await self._acquire(timeout if timeout is not None else self.lease_timeout)
+        context = None
+        try:
+            context = await browser.new_context(**context_options)
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    print(f"Error closing leased context: {e}")
+            await self._release(browser)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "alive": len(self._browsers),
+            "idle": self._idle.qsize(),
+            "leased": self._leased,
+            "waiting": self._waiting,
+            "total_leases": self._total_leases,
+            "lease_timeouts": self._lease_timeouts,
+            "relaunches": self._relaunches,
+            "average_wait_ms": round(self._total_wait_seconds * 1000 / self._total_leases, 2) if self._total_leases else 0.0,
+        }
+
+
+@asynccontextmanager
+async def standalone_context(launch_options=None, **context_options):
+    """
+    One-off browser and context for callers that run without a pool.
+    """
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(**(launch_options or {"headless": True}))
+        try:
+            context = await browser.new_context(**context_options)
+            yield context
+        finally:
+            print("Closing browser...")
+            await browser.close()
@@ -0,0 +1,148 @@
+import json
+import time
+from collections import deque
+from room_bitmap import runs, span
+from timeline import time_label, timeslot_bounds
+
+
+def slots_by_room(log):
+    """
+    {(date, room): timeslots} for a single- or multi-date booking log.
+    """
+    config, result = log["scraped"]["config"], log["scraped"]["result"]
+    by_date = result if "dates" in config else {config["date"]: result}
+    return {
+        (date_formatted, room): timeslots
+        for date_formatted, rooms in by_date.items()
+        for room, timeslots in rooms.items()
+    }
+
+
+def minute_masks(timeslots):
+    """
+    Bitmasks of the minutes of the day that available and unavailable entries cover,
+    bit i being minute i. Entries with an unreadable timeslot are left out.
+    """
+    free = busy = 0
+    for entry in timeslots:
+        try:
+            start, end = timeslot_bounds(entry["timeslot"])
+        except ValueError:
+            continue
+        if entry["available"]:
+            free |= span(start, end)
+        else:
+            busy |= span(start, end)
+    return free & ~busy, busy
+
+
+def status_at(timeslots, minute, available):
+    for entry in timeslots:
+        try:
+            start, end = timeslot_bounds(entry["timeslot"])
+        except ValueError:
+            continue
+        if entry["available"] == available and start <= minute < end:
+            return entry["status"]
+    return None
+
+
+def changed_ranges(date_formatted, room, mask, timeslots, available):
+    return [
+        {
+            "date": date_formatted,
+            "room": room,
+            "timeslot": f"{time_label(first)}-{time_label(last)}",
+            "status": status_at(timeslots, first, available),
+        }
+        for first, last in runs(mask)
+    ]
+
+
+def diff_logs(previous, current):
+    """
+    Time ranges newly freed and newly booked in rooms present in both logs, plus
+    rooms that appeared or disappeared between them. Rooms are compared minute by
+    minute, so a merged booking that is cancelled into free slots, or a booking laid
+    over several free slots, shows up however the two logs cut their timeslots.
+    Minutes only one of the logs covers are not counted as changes.
+    """
+    before, after = slots_by_room(previous), slots_by_room(current)
+    diff = {"freed": [], "booked": [], "rooms_added": [], "rooms_removed": []}
+    for date_formatted, room in sorted(after.keys() - before.keys()):
+        diff["rooms_added"].append({"date": date_formatted, "room": room})
+    for date_formatted, room in sorted(before.keys() - after.keys()):
+        diff["rooms_removed"].append({"date": date_formatted, "room": room})
+    for date_formatted, room in sorted(before.keys() & after.keys()):
+        old_slots, new_slots = before[(date_formatted, room)], after[(date_formatted, room)]
+        old_free, old_busy = minute_masks(old_slots)
+        new_free, new_busy = minute_masks(new_slots)
+        diff["freed"].extend(changed_ranges(date_formatted, room, new_free & old_busy, new_slots, True))
+        diff["booked"].extend(changed_ranges(date_formatted, room, new_busy & old_free, new_slots, False))
+    return diff
+
+
+class ChangeFeed:
+    """
+    Keeps the previous booking log per result cache key and appends a numbered
+    event whenever a refresh changes it. Consumers poll since(cursor) and only
+    process deltas. The first log for a key is a baseline and yields no event.
+    Only the last max_events events are retained.
+
+    Sequence numbers live in memory and start again from 0 after a restart, so each
+    feed also carries an epoch, the time it was started, for consumers to notice.
+    """
+
+    def __init__(self, max_events=1000):
+        self._previous = {}
+        self._events = deque(maxlen=max_events)
+        self.sequence = 0
+        self.epoch = int(time.time() * 1000)
+
+    @classmethod
+    def from_constants(cls, constants):
+        config = constants.get('change_feed', {})
+        if not config.get('enabled', True):
+            return None
+        return cls(max_events=config.get('max_events', 1000))
+
+    def record(self, key, log, stored_at=None):
+        previous = self._previous.get(key)
+        self._previous[key] = log
+        if previous is None:
+            return None
+        diff = diff_logs(previous, log)
+        if not any(diff.values()):
+            return None
+        self.sequence += 1
+        event = {
+            "seq": self.sequence,
+            "at": time.time(),
+            "query": json.loads(key),
+            "previous_scraped_at": previous["metrics"]["scraping_date"],
+            "scraped_at": log["metrics"]["scraping_date"],
+            **diff,
+        }
+        self._events.append(event)
+        return event
+
+    def since(self, seq=0, limit=100):
+        """
+        Events after seq, oldest first. truncated is set when events after seq have
+        already been dropped, in which case the consumer should re-read full snapshots.
+        A seq past latest_seq was handed out before a restart: reset is set, the
+        events are read from 0 and truncated is set as well.
+        """
+        reset = seq > self.sequence
+        if reset:
+            seq = 0
+        events = [event for event in self._events if event["seq"] > seq][:limit]
+        oldest_seq = self._events[0]["seq"] if self._events else self.sequence + 1
+        return {
+            "events": events,
+            "next_seq": events[-1]["seq"] if events else max(seq, 0),
+            "latest_seq": self.sequence,
+            "epoch": self.epoch,
+            "reset": reset,
+            "truncated": reset or seq < oldest_seq - 1,
+        }
@@ -4,4 +4,28 @@ class FrameNotFoundException(Exception):
         if message is None:
             message = f"Frame '{frame_name}' could not be found."
         super().__init__(message)
-        self.frame_name = frame_name
\ No newline at end of file
+        self.frame_name = frame_name
+
+class BrowserPoolTimeoutException(Exception):
+    """Exception raised when no pooled browser frees up within the lease timeout."""
+    def __init__(self, timeout: float, message: str = None):
+        if message is None:
+            message = f"No browser became available within {timeout} seconds."
+        super().__init__(message)
+        self.timeout = timeout
+
+class HttpEngineUnsupportedException(Exception):
+    """Exception raised when the HTTP engine meets an FBS page it does not understand."""
+    def __init__(self, reason: str, message: str = None):
+        if message is None:
+            message = f"HTTP engine cannot handle this page: {reason}"
+        super().__init__(message)
+        self.reason = reason
+
+class UpstreamTimeoutException(Exception):
+    """Exception raised when FBS does not produce a result within the upstream timeout."""
+    def __init__(self, timeout: float, message: str = None):
+        if message is None:
+            message = f"FBS did not respond within {timeout} seconds. The scrape continues in the background; retry shortly."
+        super().__init__(message)
+        self.timeout = timeout
@@ -0,0 +1,372 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from timeline import timeslot_bounds
+from superset import canonical_name
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scrapes (
+    id INTEGER PRIMARY KEY,
+    scraped_at REAL NOT NULL,
+    query TEXT NOT NULL,
+    metrics TEXT
+);
+CREATE TABLE IF NOT EXISTS rooms (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    building TEXT
+);
+CREATE TABLE IF NOT EXISTS slots (
+    scrape_id INTEGER NOT NULL REFERENCES scrapes(id) ON DELETE CASCADE,
+    room_id INTEGER NOT NULL REFERENCES rooms(id),
+    date TEXT NOT NULL,
+    start_minute INTEGER NOT NULL,
+    end_minute INTEGER NOT NULL,
+    timeslot TEXT NOT NULL,
+    available INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS scrapes_scraped_at ON scrapes(scraped_at);
+CREATE INDEX IF NOT EXISTS rooms_building ON rooms(building);
+CREATE INDEX IF NOT EXISTS slots_room_date ON slots(room_id, date, scrape_id);
+CREATE INDEX IF NOT EXISTS slots_date ON slots(date, scrape_id);
+CREATE INDEX IF NOT EXISTS slots_scrape ON slots(scrape_id);
+"""
+
+# Keep the latest scrape of each room and date per bucket, for scrapes older than the cutoff
+COMPACT_SLOTS_SQL = """
+DELETE FROM slots WHERE rowid IN (
+    SELECT slots.rowid FROM slots JOIN scrapes ON scrapes.id = slots.scrape_id
+    WHERE scrapes.scraped_at < :cutoff AND slots.scrape_id < (
+        SELECT MAX(kept.scrape_id) FROM slots AS kept JOIN scrapes AS kept_scrape ON kept_scrape.id = kept.scrape_id
+        WHERE kept.room_id = slots.room_id AND kept.date = slots.date
+          AND CAST(kept_scrape.scraped_at / :bucket AS INTEGER) = CAST(scrapes.scraped_at / :bucket AS INTEGER)
+    )
+)
+"""
+
+AS_OF_SQL = """
+WITH latest AS (
+    SELECT slots.room_id, MAX(slots.scrape_id) AS scrape_id
+    FROM slots JOIN scrapes ON scrapes.id = slots.scrape_id
+    WHERE slots.date = :date AND scrapes.scraped_at <= :at
+    GROUP BY slots.room_id
+)
+SELECT rooms.name, rooms.building, scrapes.scraped_at, slots.timeslot, slots.available, slots.status, slots.details
+FROM latest
+JOIN slots ON slots.room_id = latest.room_id AND slots.scrape_id = latest.scrape_id AND slots.date = :date
+JOIN rooms ON rooms.id = latest.room_id
+JOIN scrapes ON scrapes.id = latest.scrape_id
+ORDER BY rooms.name, slots.start_minute, slots.rowid
+"""
+
+HISTORY_SQL = """
+SELECT scrapes.id, scrapes.scraped_at, slots.timeslot, slots.available, slots.status, slots.details
+FROM slots JOIN scrapes ON scrapes.id = slots.scrape_id
+WHERE slots.room_id = (SELECT id FROM rooms WHERE name = :room) AND slots.date = :date
+  AND slots.scrape_id IN (
+    SELECT DISTINCT scrape_id FROM slots
+    WHERE room_id = (SELECT id FROM rooms WHERE name = :room) AND date = :date
+      AND scrape_id IN (SELECT id FROM scrapes WHERE scraped_at BETWEEN :since AND :until)
+    ORDER BY scrape_id DESC LIMIT :limit
+  )
+ORDER BY slots.scrape_id DESC, slots.start_minute, slots.rowid
+"""
+
+
+def iso_date(date_formatted):
+    return datetime.strptime(date_formatted, "%d-%b-%Y").date().isoformat()
+
+
+def timestamp_label(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def slot_entry(timeslot, available, status, details):
+    return {
+        "timeslot": timeslot,
+        "available": bool(available),
+        "status": status,
+        "details": json.loads(details) if details is not None else None,
+    }
+
+
+class HistoryStore:
+    """
+    Append-only SQLite history of every booking log: one row per scrape, one per
+    room, and one per timeslot entry of each room and date, so past availability can
+    be read back without scraping. record() only queues the log; a background task
+    writes queued logs in batches on a dedicated thread, with the database in WAL
+    mode so reads on their own connection never wait for the writer.
+
+    Scrapes older than compact_after_days keep only the latest snapshot per room,
+    date and compact_bucket_hours, and anything older than retention_days is deleted.
+    """
+
+    def __init__(self, path, batch_size=50, flush_interval_seconds=1.0, compact_after_days=7,
+                 compact_bucket_hours=6, retention_days=90, compact_interval_seconds=3600, valid_buildings=None):
+        self.path = path
+        # rooms.building holds these spellings, the ones /as-of filters by
+        self.valid_buildings = valid_buildings or []
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.compact_after_days = compact_after_days
+        self.compact_bucket_hours = compact_bucket_hours
+        self.retention_days = retention_days
+        self.compact_interval_seconds = compact_interval_seconds
+        self._queue = asyncio.Queue()
+        # sqlite3 connections stay on the thread that made them, one for writes and one for reads
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-writer")
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-reader")
+        self._write_connection = None
+        self._read_connection = None
+        self._writer_task = None
+        self._compaction_task = None
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.last_compaction = None
+
+    @classmethod
+    def from_constants(cls, constants):
+        config = constants.get('history', {})
+        if not config.get('enabled', True):
+            return None
+        return cls(
+            path=config.get('filepath', './history/history.sqlite3'),
+            batch_size=config.get('batch_size', 50),
+            flush_interval_seconds=config.get('flush_interval_seconds', 1.0),
+            compact_after_days=config.get('compact_after_days', 7),
+            compact_bucket_hours=config.get('compact_bucket_hours', 6),
+            retention_days=config.get('retention_days', 90),
+            compact_interval_seconds=config.get('compact_interval_seconds', 3600),
+            valid_buildings=constants.get('valid_buildings', []),
+        )
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA foreign_keys=ON")
+        return connection
+
+    def _open_writer(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        # Only takes effect on a new database, so compaction can hand space back incrementally
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.close()
+        self._write_connection = self._connect()
+        self._write_connection.executescript(SCHEMA)
+        with self._write_connection:
+            # Rooms written before buildings were canonicalised kept the request's spelling
+            for (building,) in self._write_connection.execute("SELECT DISTINCT building FROM rooms WHERE building IS NOT NULL").fetchall():
+                canonical = canonical_name(building, self.valid_buildings)
+                if canonical is not None and canonical != building:
+                    self._write_connection.execute("UPDATE rooms SET building = ? WHERE building = ?", (canonical, building))
+
+    def _open_reader(self):
+        self._read_connection = self._connect()
+
+    async def _on_writer(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, function, *args)
+
+    async def _on_reader(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._reader, function, *args)
+
+    def record(self, log, scraped_at=None):
+        """
+        Queue a booking log for the next batch. Never blocks the request.
+        """
+        self.recorded += 1
+        self._queue.put_nowait((scraped_at or time.time(), log))
+
+    def _room_id(self, cursor, room, building, room_ids):
+        if room not in room_ids:
+            cursor.execute("INSERT INTO rooms (name, building) VALUES (?, ?) ON CONFLICT(name) DO NOTHING", (room, building))
+            room_ids[room] = cursor.execute("SELECT id FROM rooms WHERE name = ?", (room,)).fetchone()[0]
+        if building is not None:
+            cursor.execute("UPDATE rooms SET building = ? WHERE id = ? AND building IS NULL", (building, room_ids[room]))
+        return room_ids[room]
+
+    def _write_batch(self, batch):
+        connection = self._write_connection
+        room_ids = {}
+        with connection:
+            cursor = connection.cursor()
+            for scraped_at, log in batch:
+                config = log["scraped"]["config"]
+                buildings = config.get("building_names") or []
+                building = canonical_name(buildings[0], self.valid_buildings) if len(buildings) == 1 else None
+                cursor.execute(
+                    "INSERT INTO scrapes (scraped_at, query, metrics) VALUES (?, ?, ?)",
+                    (scraped_at, json.dumps(config), json.dumps(log.get("metrics"))),
+                )
+                scrape_id = cursor.lastrowid
+                rows = []
+                result = log["scraped"]["result"]
+                by_date = result if "dates" in config else {config["date"]: result}
+                for date_formatted, room_timeslots in by_date.items():
+                    for room, timeslots in room_timeslots.items():
+                        room_id = self._room_id(cursor, room, building, room_ids)
+                        for entry in timeslots:
+                            try:
+                                start, end = timeslot_bounds(entry["timeslot"])
+                            except ValueError:
+                                continue
+                            rows.append((
+                                scrape_id, room_id, iso_date(date_formatted), start, end, entry["timeslot"],
+                                int(entry["available"]), entry["status"],
+                                json.dumps(entry["details"]) if entry["details"] is not None else None,
+                            ))
+                cursor.executemany(
+                    "INSERT INTO slots (scrape_id, room_id, date, start_minute, end_minute, timeslot, available, status, details) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        return len(batch)
+
+    async def _flush(self, batch):
+        try:
+            self.written += await self._on_writer(self._write_batch, batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"History write of {len(batch)} logs failed: {e}")
+
+    async def _run_writer(self):
+        """
+        Write queued logs in batches until stop() queues None, flushing the batch
+        in progress before returning.
+        """
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), max(0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    def _compact(self):
+        now = time.time()
+        connection = self._write_connection
+        with connection:
+            expired = connection.execute("DELETE FROM scrapes WHERE scraped_at < ?", (now - self.retention_days * 86400,)).rowcount
+            thinned = connection.execute(COMPACT_SLOTS_SQL, {
+                "cutoff": now - self.compact_after_days * 86400,
+                "bucket": self.compact_bucket_hours * 3600,
+            }).rowcount
+            # Only scrapes that thinning emptied; a recent scrape that found no rooms is still history
+            emptied = connection.execute(
+                "DELETE FROM scrapes WHERE scraped_at < ? AND id NOT IN (SELECT DISTINCT scrape_id FROM slots)",
+                (now - self.compact_after_days * 86400,),
+            ).rowcount
+        connection.execute("PRAGMA incremental_vacuum")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"expired_scrapes": expired, "thinned_slots": thinned, "emptied_scrapes": emptied}
+
+    async def compact(self):
+        """
+        Apply the retention and compaction policy once.
+        """
+        result = await self._on_writer(self._compact)
+        self.last_compaction = {"at": timestamp_label(time.time()), **result}
+        return result
+
+    async def _run_compaction(self):
+        while True:
+            try:
+                await self.compact()
+            except Exception as e:
+                print(f"History compaction failed: {e}")
+            await asyncio.sleep(self.compact_interval_seconds)
+
+    async def start(self):
+        await self._on_writer(self._open_writer)
+        await self._on_reader(self._open_reader)
+        self._writer_task = asyncio.ensure_future(self._run_writer())
+        self._compaction_task = asyncio.ensure_future(self._run_compaction())
+
+    async def stop(self):
+        self._compaction_task.cancel()
+        try:
+            await self._compaction_task
+        except asyncio.CancelledError:
+            pass
+        # The writer drains everything queued before the sentinel, then returns
+        self._queue.put_nowait(None)
+        await self._writer_task
+        # Logs recorded while the writer was finishing its last batch
+        pending = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                pending.append(item)
+        if pending:
+            await self._flush(pending)
+        await self._on_writer(self._write_connection.close)
+        await self._on_reader(self._read_connection.close)
+        self._writer.shutdown()
+        self._reader.shutdown()
+
+    def _as_of(self, date_formatted, at, building_names, rooms):
+        result, scraped_at = {}, {}
+        for room, building, room_scraped_at, timeslot, available, status, details in self._read_connection.execute(
+            AS_OF_SQL, {"date": iso_date(date_formatted), "at": at},
+        ):
+            if (building_names and building not in building_names) or (rooms and room not in rooms):
+                continue
+            result.setdefault(room, []).append(slot_entry(timeslot, available, status, details))
+            scraped_at[room] = timestamp_label(room_scraped_at)
+        return {"date": date_formatted, "at": timestamp_label(at), "scraped_at": scraped_at, "result": result}
+
+    async def as_of(self, date_formatted, at=None, building_names=None, rooms=None):
+        """
+        Every room's timeslots on date_formatted as last scraped at or before at.
+        A room whose building is unknown never matches building_names.
+        """
+        return await self._on_reader(self._as_of, date_formatted, at or time.time(), building_names, rooms)
+
+    def _history(self, room, date_formatted, since, until, limit):
+        snapshots = {}
+        for scrape_id, scraped_at, timeslot, available, status, details in self._read_connection.execute(
+            HISTORY_SQL, {"room": room, "date": iso_date(date_formatted), "since": since, "until": until, "limit": limit},
+        ):
+            snapshot = snapshots.setdefault(scrape_id, {"scraped_at": timestamp_label(scraped_at), "timeslots": []})
+            snapshot["timeslots"].append(slot_entry(timeslot, available, status, details))
+        return {"room": room, "date": date_formatted, "snapshots": list(snapshots.values())}
+
+    async def history(self, room, date_formatted, since=None, until=None, limit=50):
+        """
+        The last limit snapshots of one room on one date, newest first.
+        """
+        return await self._on_reader(self._history, room, date_formatted, since or 0, until or time.time(), limit)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "recorded": self.recorded,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+            "last_compaction": self.last_compaction,
+        }
@@ -0,0 +1,383 @@
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+import httpx
+from exceptions import HttpEngineUnsupportedException
+
+POSTBACK_TARGET_PATTERN = re.compile(r"__doPostBack\(\\?['\"]([^'\"\\]+)\\?['\"]")
+DELTA_RESPONSE_PATTERN = re.compile(r"^\d+\|[^|]*\|[^|]*\|")
+DELTA_RECORD_PATTERN = re.compile(r"(\d+)\|([^|]*)\|([^|]*)\|")
+
+DATE_INPUT_ID = "DateBookingFrom_c1_textDate"
+START_TIME_ID = "TimeFrom_c1_ctl04"
+END_TIME_ID = "TimeTo_c1_ctl04"
+CAPACITY_ID = "DropCapacity_c1"
+CHECK_AVAILABILITY_ID = "CheckAvailability"
+MULTI_SELECT_PREFIXES = {
+    "building_names": "DropMultiBuildingList",
+    "floors": "DropMultiFloorList",
+    "facility_types": "DropMultiFacilityTypeList",
+    "equipment": "DropMultiEquipmentList",
+}
+
+
+class FbsPageParser(HTMLParser):
+    """
+    Collects just enough of an FBS/ADFS page to drive it without a browser:
+    forms and their fields, checkbox labels, frames, postback targets, the
+    GridResults_gv table and the scheduler row headers and event titles.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms = []
+        self.elements_by_id = {}
+        self.labels = {}
+        self.frames = {}
+        self.grid_rows = []
+        self.room_names = []
+        self.booking_titles = []
+        self._form = None
+        self._select = None
+        self._captures = []
+        self._in_grid = False
+        self._row = None
+
+    def _field(self, attrs, kind):
+        field = {
+            "kind": kind,
+            "type": (attrs.get("type") or "text").lower(),
+            "name": attrs.get("name"),
+            "value": attrs.get("value"),
+            "checked": "checked" in attrs,
+            "postback_target": self._postback_target(attrs),
+            "form": self._form,
+        }
+        if attrs.get("id"):
+            self.elements_by_id[attrs["id"]] = field
+        if self._form is not None:
+            self._form["fields"].append(field)
+        return field
+
+    @staticmethod
+    def _postback_target(attrs):
+        for handler in ("onclick", "onchange", "href"):
+            match = POSTBACK_TARGET_PATTERN.search(attrs.get(handler) or "")
+            if match:
+                return match.group(1)
+        return None
+
+    def _start_capture(self, tag, on_done):
+        # Captures can nest (a label inside a grid cell), so each tracks its own depth
+        self._captures.append({"tag": tag, "depth": 1, "text": [], "on_done": on_done})
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        for capture in self._captures:
+            if capture["tag"] == tag:
+                capture["depth"] += 1
+
+        if tag == "form":
+            self._form = {"action": attrs.get("action") or "", "method": (attrs.get("method") or "get").lower(), "fields": []}
+            self.forms.append(self._form)
+        elif tag == "input":
+            self._field(attrs, "input")
+        elif tag == "textarea":
+            field = self._field(attrs, "textarea")
+            field["value"] = ""
+            self._start_capture(tag, lambda text: field.update(value=text))
+        elif tag == "select":
+            self._select = self._field(attrs, "select")
+            self._select["options"] = []
+        elif tag == "option" and self._select is not None:
+            self._select["options"].append({"value": attrs.get("value"), "selected": "selected" in attrs})
+        elif tag in ("frame", "iframe") and attrs.get("name"):
+            self.frames[attrs["name"]] = attrs.get("src") or ""
+        elif tag == "a" and attrs.get("id"):
+            self.elements_by_id[attrs["id"]] = {"kind": "link", "postback_target": self._postback_target(attrs)}
+        elif tag == "label" and attrs.get("for"):
+            target = attrs["for"]
+            self._start_capture(tag, lambda text: self.labels.__setitem__(target, text))
+        elif tag == "table" and attrs.get("id") == "GridResults_gv":
+            self._in_grid = True
+        elif tag == "tr" and self._in_grid:
+            self._row = []
+            self.grid_rows.append(self._row)
+        elif tag == "td" and self._row is not None:
+            row = self._row
+            self._start_capture(tag, row.append)
+        elif tag == "div" and "scheduler_bluewhite_rowheader_inner" in classes:
+            self._start_capture(tag, self.room_names.append)
+        elif tag == "div" and "scheduler_bluewhite_event" in classes and "scheduler_bluewhite_event_line0" in classes:
+            self.booking_titles.append(attrs.get("title") or "")
+
+    def handle_endtag(self, tag):
+        for capture in [capture for capture in self._captures if capture["tag"] == tag]:
+            capture["depth"] -= 1
+            if capture["depth"] == 0:
+                self._captures.remove(capture)
+                capture["on_done"]("".join(capture["text"]).strip())
+        if tag == "form":
+            self._form = None
+        elif tag == "select":
+            self._select = None
+        elif tag == "table" and self._in_grid:
+            self._in_grid = False
+            self._row = None
+
+    def handle_data(self, data):
+        for capture in self._captures:
+            capture["text"].append(data)
+
+    # ----- Queries -----
+
+    def has_element(self, element_id):
+        return element_id in self.elements_by_id
+
+    def field_by_name(self, name):
+        for form in self.forms:
+            for field in form["fields"]:
+                if field["name"] == name:
+                    return field
+        return None
+
+    def form_with_field(self, name):
+        field = self.field_by_name(name)
+        return field["form"] if field else None
+
+    def checkboxes(self, id_prefix):
+        """Maps label text to checkbox fields for a DropMulti* list."""
+        result = {}
+        for element_id, field in self.elements_by_id.items():
+            if element_id.startswith(id_prefix) and field.get("type") == "checkbox":
+                result[self.labels.get(element_id, field.get("value") or "").strip()] = field
+        return result
+
+    def matching_rooms(self):
+        return [row[1].strip() for row in self.grid_rows if len(row) > 1]
+
+
+def parse_page(markup):
+    parser = FbsPageParser()
+    parser.feed(markup)
+    parser.close()
+    return parser
+
+
+def parse_postback_body(body):
+    """
+    Pull scheduler and grid data out of a postback response, whether it is a full
+    page or an ASP.NET AJAX delta (length|type|id|content| records, where the
+    updatePanel records carry the re-rendered HTML).
+    """
+    markup = body
+    if DELTA_RESPONSE_PATTERN.match(body):
+        panels = []
+        position = 0
+        while position < len(body):
+            header = DELTA_RECORD_PATTERN.match(body, position)
+            if header is None:
+                break
+            length = int(header.group(1))
+            start = header.end()
+            content = body[start:start + length]
+            if header.group(2) == "updatePanel":
+                panels.append(content)
+            # Content is followed by the closing delimiter
+            position = start + length + 1
+        markup = "".join(panels)
+    page = parse_page(markup)
+    return {
+        "matching_rooms": page.matching_rooms(),
+        "room_names": page.room_names,
+        "booking_titles": page.booking_titles,
+    }
+
+
+def serialise_form(form, overrides=None):
+    """
+    Build the body the browser would submit for form, with overrides
+    (name -> value, or None to leave a field out) applied on top.
+    """
+    overrides = overrides or {}
+    data = []
+    for field in form["fields"]:
+        name = field["name"]
+        if not name or name in overrides:
+            continue
+        if field["kind"] == "select":
+            selected = [option for option in field["options"] if option["selected"]] or field["options"][:1]
+            data.extend((name, option["value"] or "") for option in selected)
+        elif field["type"] in ("checkbox", "radio"):
+            if field["checked"]:
+                data.append((name, field["value"] or "on"))
+        elif field["type"] not in ("submit", "button", "image", "reset", "file"):
+            data.append((name, field["value"] or ""))
+    data.extend((name, value) for name, value in overrides.items() if value is not None)
+    return data
+
+
+class HttpEngine:
+    """
+    Browserless FBS scraper: logs in over plain HTTP, carries the ADFS cookies and
+    replays the ASP.NET postbacks the UI would fire. Raises
+    HttpEngineUnsupportedException whenever a page does not look the way it expects,
+    so the caller can fall back to Playwright.
+    """
+
+    def __init__(self, constants, client=None):
+        config = constants.get('http_engine', {})
+        self.target_url = config.get('target_url') or constants['target_url']
+        self.max_login_hops = config.get('max_login_hops', 8)
+        self._client = client or httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=config.get('timeout_seconds', 30),
+            headers={"User-Agent": config.get('user_agent', "Mozilla/5.0 (sagasu)")},
+        )
+        self._owns_client = client is None
+        self._url = None
+        self._page = None
+
+    async def close(self):
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def _send(self, method, url, **kwargs):
+        """
+        One request through the shared client. HTTP errors and transport failures
+        (timeouts, refused connections, broken TLS) become
+        HttpEngineUnsupportedException, like any other page the engine cannot use,
+        so the scrape falls back to Playwright instead of failing.
+        """
+        try:
+            response = await self._client.request(method, url, **kwargs)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise HttpEngineUnsupportedException(f"{method} {url} returned {e.response.status_code}") from e
+        except httpx.TransportError as e:
+            raise HttpEngineUnsupportedException(f"{method} {url} failed: {e!r}") from e
+        return response
+
+    async def _submit(self, base_url, form, data):
+        url = urljoin(base_url, form["action"]) if form["action"] else base_url
+        # httpx wants repeated names grouped into lists rather than (name, value) pairs
+        grouped = {}
+        for name, value in data:
+            grouped.setdefault(name, []).append(value)
+        data = {name: values[0] if len(values) == 1 else values for name, values in grouped.items()}
+        if form["method"] == "post":
+            return await self._send("POST", url, data=data)
+        return await self._send("GET", url, params=data)
+
+    async def login(self, credentials):
+        response = await self._send("GET", self.target_url)
+        credentials_sent = False
+        for _ in range(self.max_login_hops):
+            page = parse_page(response.text)
+            url = str(response.url)
+            if "frameContent" in page.frames:
+                return await self._open_content_frame(url, page.frames["frameContent"])
+            if page.has_element("userNameInput"):
+                if credentials_sent:
+                    raise HttpEngineUnsupportedException("ADFS login form came back after submitting credentials")
+                username_field = page.elements_by_id["userNameInput"]
+                password_field = page.elements_by_id.get("passwordInput")
+                if password_field is None or username_field["form"] is None:
+                    raise HttpEngineUnsupportedException("ADFS login form has an unexpected shape")
+                data = serialise_form(username_field["form"], {
+                    username_field["name"]: credentials.username,
+                    password_field["name"]: credentials.password,
+                })
+                response = await self._submit(url, username_field["form"], data)
+                credentials_sent = True
+                continue
+            # SAML / WS-Federation hand-offs are auto-submitting forms
+            token_form = page.form_with_field("SAMLResponse") or page.form_with_field("wresult")
+            if token_form is not None:
+                response = await self._submit(url, token_form, serialise_form(token_form))
+                continue
+            raise HttpEngineUnsupportedException(f"Unrecognised page during login at {url}")
+        raise HttpEngineUnsupportedException("Login did not reach the FBS home page")
+
+    async def _open_content_frame(self, home_url, frame_src):
+        url = urljoin(home_url, frame_src)
+        response = await self._send("GET", url)
+        self._set_page(response)
+        if not self._page.has_element(DATE_INPUT_ID):
+            raise HttpEngineUnsupportedException("frameContent does not contain the booking search form")
+
+    def _set_page(self, response):
+        page = parse_page(response.text)
+        if page.form_with_field("__VIEWSTATE") is None:
+            raise HttpEngineUnsupportedException(f"No ASP.NET form found at {response.url}")
+        self._url = str(response.url)
+        self._page = page
+
+    async def postback(self, event_target, overrides=None):
+        form = self._page.form_with_field("__VIEWSTATE")
+        overrides = dict(overrides or {})
+        overrides.update({"__EVENTTARGET": event_target, "__EVENTARGUMENT": ""})
+        response = await self._submit(self._url, form, serialise_form(form, overrides))
+        self._set_page(response)
+        return self._page
+
+    def _named(self, element_id):
+        field = self._page.elements_by_id.get(element_id)
+        if field is None or not field.get("name"):
+            raise HttpEngineUnsupportedException(f"Control {element_id} not found")
+        return field
+
+    async def set_date(self, target_date):
+        field = self._named(DATE_INPUT_ID)
+        await self.postback(field["postback_target"] or field["name"], {field["name"]: target_date})
+        if self._named(DATE_INPUT_ID)["value"] != target_date:
+            raise HttpEngineUnsupportedException(f"Date postback did not land on {target_date}")
+
+    async def select_options(self, id_prefix, options):
+        if not options:
+            return
+        checkboxes = self._page.checkboxes(id_prefix)
+        missing = [option for option in options if option not in checkboxes]
+        if missing:
+            raise HttpEngineUnsupportedException(f"Options {missing} not found in {id_prefix}")
+        overrides = {}
+        for label, field in checkboxes.items():
+            overrides[field["name"]] = (field["value"] or "on") if label in options else None
+        first = checkboxes[options[0]]
+        await self.postback(first["postback_target"] or first["name"], overrides)
+        applied = self._page.checkboxes(id_prefix)
+        if not all(applied.get(option, {}).get("checked") for option in options):
+            raise HttpEngineUnsupportedException(f"{id_prefix} did not keep the selected options")
+
+    async def fetch_availability(self, request, date_formatted, end_time, room_capacity):
+        """
+        Drive the search form and return the raw extraction shared with the
+        Playwright engine: matching rooms, scheduler row names and event titles.
+        """
+        await self.login(request.credentials)
+        await self.set_date(date_formatted)
+        for request_field, id_prefix in MULTI_SELECT_PREFIXES.items():
+            await self.select_options(id_prefix, getattr(request, request_field) or [])
+        form_values = {
+            self._named(START_TIME_ID)["name"]: request.start_time,
+            self._named(END_TIME_ID)["name"]: end_time,
+            self._named(CAPACITY_ID)["name"]: room_capacity,
+        }
+        check_availability = self._page.elements_by_id.get(CHECK_AVAILABILITY_ID)
+        if not check_availability or not check_availability.get("postback_target"):
+            raise HttpEngineUnsupportedException("CheckAvailability postback target not found")
+
+        # Like the browser flow, time and capacity only travel with the CheckAvailability postback
+        matching_rooms = self._page.matching_rooms()
+        if not matching_rooms:
+            return {"matching_rooms": [], "room_names": [], "booking_titles": []}
+
+        result_page = await self.postback(check_availability["postback_target"], form_values)
+        if not result_page.room_names:
+            raise HttpEngineUnsupportedException("Scheduler markup is not present in the server response")
+        return {
+            "matching_rooms": matching_rooms,
+            "room_names": result_page.room_names,
+            "booking_titles": result_page.booking_titles,
+        }
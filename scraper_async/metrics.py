@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+
+
+class ScrapeMetrics:
+    """
+    Per-request timing breakdown that ends up under "metrics" in the booking log.
+    """
+
+    def __init__(self):
+        self._started = time.monotonic()
+        self.steps_ms = {}
+        self.details = {}
+
+    @contextmanager
+    def step(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+            self.steps_ms[name] = round(self.steps_ms.get(name, 0) + elapsed_ms, 1)
+
+    def record(self, key, value):
+        self.details[key] = value
+
+    def as_dict(self):
+        return {
+            "total_ms": round((time.monotonic() - self._started) * 1000, 1),
+            "steps_ms": dict(self.steps_ms),
+            **self.details,
+        }
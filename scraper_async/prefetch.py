@@ -0,0 +1,141 @@
+import os
+import math
+import asyncio
+from datetime import datetime, timedelta
+
+SERVICE_USERNAME_ENV = "FBS_SERVICE_USERNAME"
+SERVICE_PASSWORD_ENV = "FBS_SERVICE_PASSWORD"
+
+
+class PrefetchScheduler:
+    """
+    Keeps the result cache warm for the popular queries in constants.yaml by
+    scraping them with a service account every interval_seconds. Each cycle
+    refreshes the stalest (query, date) pairs first, only those past refresh_after
+    of their TTL, and runs at most max_pool_share of the browser pool at once. A
+    cycle stops early when interactive requests are queueing for a browser.
+    """
+
+    def __init__(self, queries, credentials, scrape, result_cache, constants, request_factory,
+                 interval_seconds=120, refresh_after=0.8, concurrency=1, browser_pool=None):
+        self.queries = queries
+        self.credentials = credentials
+        self.scrape = scrape
+        self.result_cache = result_cache
+        self.constants = constants
+        self.request_factory = request_factory
+        self.interval_seconds = interval_seconds
+        self.refresh_after = refresh_after
+        self.concurrency = concurrency
+        self.browser_pool = browser_pool
+        self._task = None
+        self.cycles = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.deferred = 0
+
+    @classmethod
+    def from_constants(cls, constants, scrape, result_cache, request_factory, browser_pool=None):
+        """
+        None when prefetching is disabled, there is no result cache to fill, the
+        service credentials are missing from the environment, or max_pool_share of
+        the pool rounds down to no browsers.
+        """
+        config = constants.get('prefetch', {})
+        if not config.get('enabled', False) or result_cache is None:
+            return None
+        username, password = os.getenv(SERVICE_USERNAME_ENV), os.getenv(SERVICE_PASSWORD_ENV)
+        if not username or not password:
+            print(f"Prefetch disabled: {SERVICE_USERNAME_ENV} and {SERVICE_PASSWORD_ENV} are not set")
+            return None
+        pool_size = browser_pool.size if browser_pool is not None else 1
+        max_pool_share = config.get('max_pool_share', 0.5)
+        concurrency = math.floor(pool_size * max_pool_share)
+        if concurrency < 1:
+            print(f"Prefetch disabled: a max_pool_share of {max_pool_share} leaves no browser of {pool_size} for it")
+            return None
+        return cls(
+            queries=config.get('queries', []),
+            credentials={"username": username, "password": password},
+            scrape=scrape,
+            result_cache=result_cache,
+            constants=constants,
+            request_factory=request_factory,
+            interval_seconds=config.get('interval_seconds', 120),
+            refresh_after=config.get('refresh_after', 0.8),
+            concurrency=concurrency,
+            browser_pool=browser_pool,
+        )
+
+    def requests(self):
+        today = datetime.now().date()
+        for query in self.queries:
+            fields = {key: value for key, value in query.items() if key != 'days_ahead'}
+            for days_ahead in query.get('days_ahead', [0]):
+                date_raw = (today + timedelta(days=days_ahead)).isoformat()
+                yield self.request_factory(credentials=dict(self.credentials), date_raw=date_raw, **fields)
+
+    async def due_requests(self):
+        """
+        Requests whose cached data is past refresh_after of its TTL, stalest first.
+        """
+        due = []
+        for request in self.requests():
+            staleness = await self.result_cache.staleness(request, self.constants)
+            if staleness >= self.refresh_after:
+                due.append((staleness, request))
+        due.sort(key=lambda entry: entry[0], reverse=True)
+        return [request for _, request in due]
+
+    def interactive_waiting(self):
+        return self.browser_pool is not None and self.browser_pool.stats()["waiting"] > 0
+
+    async def run_once(self):
+        self.cycles += 1
+        pending = await self.due_requests()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(request):
+            async with semaphore:
+                if self.interactive_waiting():
+                    self.deferred += 1
+                    return
+                try:
+                    await self.result_cache.refresh(request, self.constants, lambda: self.scrape(request))
+                    self.refreshed += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Prefetch of {request.date_raw} failed: {e}")
+
+        await asyncio.gather(*(refresh(request) for request in pending))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Prefetch cycle failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self):
+        return {
+            "queries": len(self.queries),
+            "concurrency": self.concurrency,
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "deferred": self.deferred,
+        }
@@ -0,0 +1,125 @@
+import re
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+# Content-Length of the most recently seen URLs on unblocked runs, used to estimate
+# what a lean run saved. Least recently seen URLs are dropped past the limit, since
+# cache-busted and per-session URLs would otherwise grow it for the life of the process
+MAX_KNOWN_RESPONSE_SIZES = 2000
+KNOWN_RESPONSE_SIZES = OrderedDict()
+# Running [total bytes, responses] per resource type, the estimate for blocked URLs never seen
+SIZES_BY_RESOURCE_TYPE = {}
+
+
+def remember_response_size(url, resource_type, size):
+    KNOWN_RESPONSE_SIZES[url] = size
+    KNOWN_RESPONSE_SIZES.move_to_end(url)
+    while len(KNOWN_RESPONSE_SIZES) > MAX_KNOWN_RESPONSE_SIZES:
+        KNOWN_RESPONSE_SIZES.popitem(last=False)
+    totals = SIZES_BY_RESOURCE_TYPE.setdefault(resource_type, [0, 0])
+    totals[0] += size
+    totals[1] += 1
+
+
+def estimated_size(url, resource_type):
+    """
+    (bytes, source) for a blocked request: the size last seen for the URL, else the
+    mean seen for its resource type, else (0, "unknown").
+    """
+    if url in KNOWN_RESPONSE_SIZES:
+        KNOWN_RESPONSE_SIZES.move_to_end(url)
+        return KNOWN_RESPONSE_SIZES[url], "url"
+    total, count = SIZES_BY_RESOURCE_TYPE.get(resource_type, (0, 0))
+    if count:
+        return total // count, "resource_type"
+    return 0, "unknown"
+
+
+def record_response_sizes(context):
+    """
+    Remember response sizes on a context so blocked bytes can be estimated later.
+    Lean contexts record the responses they let through as well.
+    """
+    def on_response(response):
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            remember_response_size(response.url, response.request.resource_type, int(content_length))
+    context.on("response", on_response)
+
+
+class ResourceBlocker:
+    """
+    Route-interception profile that aborts images, media, fonts and third-party
+    subresources, keeping only what the FBS postbacks and scheduler widget need.
+    Documents always load, wherever they are, so login redirects through an
+    identity provider work, and subresources from auth_domains are treated as
+    first party for the same reason.
+    One instance per context so the stats describe a single scrape.
+    """
+
+    def __init__(self, first_party_domains, allowlist=None, blocked_resource_types=None, auth_domains=None):
+        self.first_party_domains = [domain.lower() for domain in [*first_party_domains, *(auth_domains or [])]]
+        self.allowlist = [re.compile(pattern, re.IGNORECASE) for pattern in (allowlist or [])]
+        self.blocked_resource_types = set(blocked_resource_types or ["image", "media", "font"])
+        self.allowed_requests = 0
+        self.blocked_requests = 0
+        self.blocked_by_type = {}
+        self.blocked_bytes = 0
+        self.blocked_bytes_by_type_estimate = 0
+        self.blocked_unknown_size = 0
+
+    @classmethod
+    def from_constants(cls, constants):
+        config = constants.get('lean_profile', {})
+        first_party_domains = list(config.get('first_party_domains', []))
+        target_host = urlparse(constants['target_url']).hostname
+        if target_host and target_host not in first_party_domains:
+            first_party_domains.append(target_host)
+        return cls(
+            first_party_domains,
+            allowlist=config.get('allowlist', []),
+            blocked_resource_types=config.get('blocked_resource_types'),
+            auth_domains=config.get('auth_domains', []),
+        )
+
+    def is_first_party(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        return any(host == domain or host.endswith(f".{domain}") for domain in self.first_party_domains)
+
+    def is_allowlisted(self, url):
+        return any(pattern.search(url) for pattern in self.allowlist)
+
+    def should_block(self, url, resource_type):
+        if url.startswith("data:") or resource_type == "document" or self.is_allowlisted(url):
+            return False
+        return resource_type in self.blocked_resource_types or not self.is_first_party(url)
+
+    async def attach(self, context):
+        record_response_sizes(context)
+        await context.route("**/*", self._handle_route)
+
+    async def _handle_route(self, route):
+        request = route.request
+        if not self.should_block(request.url, request.resource_type):
+            self.allowed_requests += 1
+            await route.continue_()
+            return
+        self.blocked_requests += 1
+        self.blocked_by_type[request.resource_type] = self.blocked_by_type.get(request.resource_type, 0) + 1
+        size, source = estimated_size(request.url, request.resource_type)
+        self.blocked_bytes += size
+        if source == "resource_type":
+            self.blocked_bytes_by_type_estimate += size
+        elif source == "unknown":
+            self.blocked_unknown_size += 1
+        await route.abort()
+
+    def stats(self):
+        return {
+            "allowed_requests": self.allowed_requests,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": dict(self.blocked_by_type),
+            "blocked_bytes_estimate": self.blocked_bytes,
+            "blocked_bytes_from_type_means": self.blocked_bytes_by_type_estimate,
+            "blocked_unknown_size": self.blocked_unknown_size,
+        }
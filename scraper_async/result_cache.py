@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import aiofiles
+from datetime import datetime
+from exceptions import UpstreamTimeoutException
+from scraper import requested_dates, scrape_parameters
+from superset import REQUEST_FILTERS, canonical_name
+
+
+class ResultCache:
+    """
+    Booking logs keyed on the normalised request, so repeated and concurrent
+    identical /scrape calls share one FBS scrape. Requests for dates within
+    near_term_days expire sooner, since those slots change the most. Empty
+    "no rooms found" logs are cached like any other.
+
+    Expired entries are kept until max_stale_seconds and served immediately while
+    a background scrape refreshes them (stale-while-revalidate). A failed refresh
+    leaves the stale entry in place, and stale hits do not retry it until
+    refresh_retry_seconds have passed. Callers with nothing to fall back on wait at
+    most upstream_timeout_seconds for FBS.
+
+    With cache_dir set, every entry is also written to disk and load() brings them
+    back on boot, so a restart serves the previous hot set (fresh or stale) while
+    the background refreshes catch up.
+    """
+
+    def __init__(self, ttl_seconds=300, near_term_ttl_seconds=60, near_term_days=1,
+                 max_stale_seconds=3600, upstream_timeout_seconds=90, refresh_retry_seconds=60,
+                 cache_dir=None):
+        self.ttl_seconds = ttl_seconds
+        self.near_term_ttl_seconds = near_term_ttl_seconds
+        self.near_term_days = near_term_days
+        self.max_stale_seconds = max_stale_seconds
+        self.upstream_timeout_seconds = upstream_timeout_seconds
+        self.refresh_retry_seconds = refresh_retry_seconds
+        self.cache_dir = cache_dir
+        self._entries = {}
+        self._in_flight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.failed_scrapes = 0
+        self.upstream_timeouts = 0
+        # Called with the key, booking log and stored_at of every fresh or reloaded entry
+        self.listeners = []
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_constants(cls, constants):
+        config = constants.get('result_cache', {})
+        if not config.get('enabled', True):
+            return None
+        return cls(
+            ttl_seconds=config.get('ttl_seconds', 300),
+            near_term_ttl_seconds=config.get('near_term_ttl_seconds', 60),
+            near_term_days=config.get('near_term_days', 1),
+            max_stale_seconds=config.get('max_stale_seconds', 3600),
+            upstream_timeout_seconds=config.get('upstream_timeout_seconds', 90),
+            refresh_retry_seconds=config.get('refresh_retry_seconds', 60),
+            cache_dir=config.get('filepath'),
+        )
+
+    @staticmethod
+    async def key_for(request, constants):
+        """
+        Everything that changes what FBS returns, and nothing that only changes how
+        it is scraped (credentials, engine, wait profile and so on).
+        """
+        dates = requested_dates(request, constants)
+        _, end_time, room_capacity = await scrape_parameters(request, constants)
+        normalised = {
+            "dates": dates,
+            "start_time": request.start_time,
+            "end_time": end_time,
+            "room_capacity": room_capacity,
+        }
+        for field, (_, valid_key) in REQUEST_FILTERS.items():
+            names = getattr(request, field, None) or []
+            normalised[field] = sorted({canonical_name(name, constants[valid_key]) or name.strip() for name in names})
+        return json.dumps(normalised, sort_keys=True), dates
+
+    def _path_for(self, key):
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(key.encode()).hexdigest()}.json")
+
+    def ttl_for(self, dates):
+        today = datetime.now().date()
+        days_ahead = min((datetime.strptime(date, "%d-%b-%Y").date() - today).days for date in dates)
+        return self.near_term_ttl_seconds if days_ahead <= self.near_term_days else self.ttl_seconds
+
+    @staticmethod
+    def is_stale(entry):
+        return time.time() - entry["stored_at"] >= entry["ttl_seconds"]
+
+    def _usable_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry):
+            del self._entries[key]
+            if self.cache_dir and os.path.exists(self._path_for(key)):
+                os.remove(self._path_for(key))
+            return None
+        return entry
+
+    def _expired(self, entry):
+        return time.time() - entry["stored_at"] >= max(entry["ttl_seconds"], self.max_stale_seconds)
+
+    def _notify(self, key, entry):
+        for listener in self.listeners:
+            try:
+                listener(key, entry["log"], entry["stored_at"])
+            except Exception as e:
+                print(f"Result cache listener failed: {e}")
+
+    async def _scrape_and_store(self, key, dates, scrape):
+        log = await scrape()
+        entry = {"log": log, "stored_at": time.time(), "ttl_seconds": self.ttl_for(dates)}
+        self._entries[key] = entry
+        self._notify(key, entry)
+        if self.cache_dir:
+            # Swapped in whole, so a crash mid-write never leaves a truncated entry for load()
+            path = self._path_for(key)
+            partial_path = f"{path}.{os.getpid()}.partial"
+            async with aiofiles.open(partial_path, 'w') as entry_file:
+                await entry_file.write(json.dumps({"key": key, **entry}))
+            os.replace(partial_path, path)
+        return entry
+
+    async def load(self):
+        """
+        Reload persisted entries that are still within max_stale_seconds, dropping
+        the rest from disk. Returns how many were loaded.
+        """
+        if not self.cache_dir:
+            return 0
+        loaded = 0
+        for filename in sorted(os.listdir(self.cache_dir)):
+            path = os.path.join(self.cache_dir, filename)
+            if filename.endswith(".partial"):
+                os.remove(path)
+                continue
+            if not filename.endswith(".json"):
+                continue
+            try:
+                async with aiofiles.open(path, 'r') as entry_file:
+                    persisted = json.loads(await entry_file.read())
+                key = persisted.pop("key")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Discarding unreadable cache entry {filename}: {e}")
+                os.remove(path)
+                continue
+            if self._expired(persisted):
+                os.remove(path)
+                continue
+            self._entries[key] = persisted
+            self._notify(key, persisted)
+            loaded += 1
+        print(f"Warm-started result cache with {loaded} entries")
+        return loaded
+
+    def _start_scrape(self, key, dates, scrape):
+        """
+        The running scrape for key, starting one if there is none. Returns (task, started).
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            return task, False
+        task = asyncio.ensure_future(self._scrape_and_store(key, dates, scrape))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda finished: self._scrape_done(key, finished))
+        return task, True
+
+    def _scrape_done(self, key, task):
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        self.failed_scrapes += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["refresh_error"] = str(error) or type(error).__name__
+            entry["refresh_failed_at"] = time.time()
+        print(f"Scrape for {key} failed: {error}")
+
+    async def get_or_scrape(self, request, constants, scrape):
+        """
+        Return (booking log, freshness) for request. Fresh entries are returned as is,
+        stale ones are returned at once while scrape() refreshes them in the background,
+        and otherwise the caller joins the running (or a new) scrape for the same key.
+        """
+        key, dates = await self.key_for(request, constants)
+        entry = self._usable_entry(key)
+        if entry is not None:
+            if not self.is_stale(entry):
+                self.hits += 1
+                return entry["log"], self.freshness(entry, "cache")
+            self.stale_hits += 1
+            if time.time() - entry.get("refresh_failed_at", 0) >= self.refresh_retry_seconds:
+                self._start_scrape(key, dates, scrape)
+            return entry["log"], self.freshness(entry, "stale")
+
+        task, started = self._start_scrape(key, dates, scrape)
+        if started:
+            self.misses += 1
+            source = "scrape"
+        else:
+            self.coalesced += 1
+            source = "coalesced"
+        # Shielded so a caller giving up or disconnecting does not cancel the scrape for the rest
+        try:
+            entry = await asyncio.wait_for(asyncio.shield(task), timeout=self.upstream_timeout_seconds)
+        except asyncio.TimeoutError:
+            self.upstream_timeouts += 1
+            raise UpstreamTimeoutException(self.upstream_timeout_seconds)
+        return entry["log"], self.freshness(entry, source)
+
+    async def staleness(self, request, constants):
+        """
+        Age of the cached entry for request as a fraction of its TTL (1.0 means just
+        expired), or infinity when nothing is cached.
+        """
+        key, _ = await self.key_for(request, constants)
+        entry = self._entries.get(key)
+        if entry is None:
+            return float("inf")
+        return (time.time() - entry["stored_at"]) / entry["ttl_seconds"]
+
+    async def refresh(self, request, constants, scrape):
+        """
+        Scrape request into the cache regardless of freshness, joining any identical
+        scrape that is already running.
+        """
+        key, dates = await self.key_for(request, constants)
+        task, _ = self._start_scrape(key, dates, scrape)
+        return await asyncio.shield(task)
+
+    def freshness(self, entry, source):
+        freshness = {
+            "source": source,
+            "age_seconds": round(time.time() - entry["stored_at"], 1),
+            "cached_at": datetime.fromtimestamp(entry["stored_at"]).strftime('%Y-%m-%d %H:%M:%S'),
+            "ttl_seconds": entry["ttl_seconds"],
+            "stale": self.is_stale(entry),
+        }
+        if freshness["stale"] and entry.get("refresh_error"):
+            freshness["refresh_error"] = entry["refresh_error"]
+        return freshness
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "failed_scrapes": self.failed_scrapes,
+            "upstream_timeouts": self.upstream_timeouts,
+        }
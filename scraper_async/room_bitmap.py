@@ -0,0 +1,231 @@
+from functools import lru_cache
+from scheduler_model import minutes_label
+from timeline import timeslot_bounds
+
+DAY_MINUTES = 24 * 60
+DEFAULT_FREE_STATUS = "Available for booking"
+
+
+def span(first, last):
+    """
+    Bitmask with bits first..last-1 set.
+    """
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+
+def set_bits(mask):
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def run_starts(mask, length):
+    """
+    Bits i of mask where bits i..i+length-1 are all set, in O(log length) shifts.
+    """
+    covered = 1
+    while covered < length:
+        step = min(covered, length - covered)
+        mask &= mask >> step
+        covered += step
+    return mask
+
+
+def runs(mask):
+    """
+    Maximal runs of set bits as (first, last) bit ranges, last exclusive.
+    """
+    found = []
+    while mask:
+        first = (mask & -mask).bit_length() - 1
+        shifted = mask >> first
+        length = (shifted ^ (shifted + 1)).bit_length() - 1
+        found.append((first, first + length))
+        mask &= ~span(first, first + length)
+    return found
+
+
+def free_windows(mask, slot_minutes, min_minutes=0, start_minutes=0, end_minutes=DAY_MINUTES):
+    """
+    (start, end) minutes of every free run in mask that lies within start_minutes
+    and end_minutes and lasts at least min_minutes.
+    """
+    window = span(-(-start_minutes // slot_minutes), end_minutes // slot_minutes)
+    min_slots = max(1, -(-min_minutes // slot_minutes))
+    return [
+        (first * slot_minutes, last * slot_minutes)
+        for first, last in runs(mask & window)
+        if last - first >= min_slots
+    ]
+
+
+def free_mask(timeslots, slot_minutes=30):
+    """
+    Bitmask of the slots that available entries cover completely and no unavailable
+    entry touches. Entries with an unreadable timeslot are left out.
+    """
+    slots = DAY_MINUTES // slot_minutes
+    covered = busy = 0
+    for entry in timeslots:
+        try:
+            start, end = timeslot_bounds(entry["timeslot"])
+        except ValueError:
+            continue
+        if entry["available"]:
+            covered |= span(-(-start // slot_minutes), min(end // slot_minutes, slots))
+        else:
+            busy |= span(start // slot_minutes, min(-(-end // slot_minutes), slots))
+    return covered & ~busy
+
+
+@lru_cache(maxsize=None)
+def grid_entries(slot_minutes, free_status, end_of_day):
+    """
+    The plain free entry for every slot of the grid. Shared, so copy before handing out.
+    """
+    entries = []
+    for start in range(0, DAY_MINUTES, slot_minutes):
+        end = start + slot_minutes
+        end_label = end_of_day if end == DAY_MINUTES else minutes_label(end)
+        entries.append({"timeslot": f"{minutes_label(start)}-{end_label}", "available": True, "status": free_status, "details": None})
+    return tuple(entries)
+
+
+class RoomDay:
+    """
+    One room's day as a bitmask of free slots, where bit i is the slot starting at
+    i * slot_minutes (48 bits at 30 minutes, 96 at 15). A slot is free only when
+    available entries cover all of it and no unavailable entry touches it, so
+    off-grid bookings block every slot they overlap.
+
+    The original timeslot list is kept for a lossless round trip: plain is a bitmask
+    of the one-slot free entries that can be regenerated from the grid, and notes
+    holds every other entry verbatim with its position in the list. Only entries on
+    the same grid as slot_minutes are plain, so storage is most compact at 30 minutes.
+    """
+
+    __slots__ = ("slot_minutes", "free", "plain", "notes", "free_status", "end_of_day")
+
+    def __init__(self, slot_minutes=30, free=0, plain=0, notes=None,
+                 free_status=DEFAULT_FREE_STATUS, end_of_day="00:00"):
+        if DAY_MINUTES % slot_minutes:
+            raise ValueError(f"slot_minutes must divide a day, got {slot_minutes}")
+        self.slot_minutes = slot_minutes
+        self.free = free
+        self.plain = plain
+        self.notes = notes or []
+        self.free_status = free_status
+        self.end_of_day = end_of_day
+
+    @property
+    def slots(self):
+        return DAY_MINUTES // self.slot_minutes
+
+    def slot_entry(self, slot):
+        return dict(grid_entries(self.slot_minutes, self.free_status, self.end_of_day)[slot])
+
+    @classmethod
+    def from_timeslots(cls, timeslots, slot_minutes=30):
+        available = [entry for entry in timeslots if entry["available"]]
+        # The grid's last slot ends at 00:00 or 23:59 depending on which filler produced it
+        ends_at_23_59 = any(entry["timeslot"].endswith("-23:59") for entry in available)
+        day = cls(
+            slot_minutes,
+            free_status=available[0]["status"] if available else DEFAULT_FREE_STATUS,
+            end_of_day="23:59" if ends_at_23_59 else "00:00",
+        )
+        plain_entries = grid_entries(slot_minutes, day.free_status, day.end_of_day)
+        plain = 0
+        last_plain = -1
+        for position, entry in enumerate(timeslots):
+            try:
+                slot = timeslot_bounds(entry["timeslot"])[0] // slot_minutes
+            except ValueError:
+                day.notes.append((position, entry))
+                continue
+            # Plain entries are regenerated in slot order, so only an increasing run of them can be
+            if slot > last_plain and slot < day.slots and entry == plain_entries[slot]:
+                plain |= 1 << slot
+                last_plain = slot
+            else:
+                day.notes.append((position, entry))
+        day.free = free_mask(timeslots, slot_minutes)
+        day.plain = plain
+        return day
+
+    def to_timeslots(self):
+        noted = dict(self.notes)
+        plain_slots = set_bits(self.plain)
+        total = len(self.notes) + bin(self.plain).count("1")
+        return [noted[position] if position in noted else self.slot_entry(next(plain_slots)) for position in range(total)]
+
+    def to_compact(self):
+        compact = {
+            "slot_minutes": self.slot_minutes,
+            "free": format(self.free, "x"),
+            "plain": format(self.plain, "x"),
+            "notes": [[position, entry] for position, entry in self.notes],
+        }
+        if self.free_status != DEFAULT_FREE_STATUS:
+            compact["free_status"] = self.free_status
+        if self.end_of_day != "00:00":
+            compact["end_of_day"] = self.end_of_day
+        return compact
+
+    @classmethod
+    def from_compact(cls, compact):
+        return cls(
+            compact["slot_minutes"],
+            free=int(compact["free"], 16),
+            plain=int(compact["plain"], 16),
+            notes=[(position, entry) for position, entry in compact["notes"]],
+            free_status=compact.get("free_status", DEFAULT_FREE_STATUS),
+            end_of_day=compact.get("end_of_day", "00:00"),
+        )
+
+    def is_free(self, start_minutes, end_minutes):
+        needed = span(start_minutes // self.slot_minutes, min(-(-end_minutes // self.slot_minutes), self.slots))
+        return self.free & needed == needed
+
+    def free_windows(self, min_minutes=0, start_minutes=0, end_minutes=DAY_MINUTES):
+        return free_windows(self.free, self.slot_minutes, min_minutes, start_minutes, end_minutes)
+
+    def first_free_after(self, minutes, duration_minutes=None):
+        """
+        Start minutes of the first free stretch of duration_minutes (one slot by
+        default) beginning at or after minutes, or None.
+        """
+        length = max(1, -(-(duration_minutes or self.slot_minutes) // self.slot_minutes))
+        starts = run_starts(self.free, length) & ~span(0, -(-minutes // self.slot_minutes))
+        if not starts:
+            return None
+        return ((starts & -starts).bit_length() - 1) * self.slot_minutes
+
+
+def joint_free(days):
+    """
+    Slots free in every one of days, which must share a slot_minutes.
+    """
+    days = list(days)
+    if len({day.slot_minutes for day in days}) > 1:
+        raise ValueError("Room days with different slot_minutes cannot be intersected")
+    mask = span(0, days[0].slots) if days else 0
+    for day in days:
+        mask &= day.free
+    return mask
+
+
+def room_days(result, slot_minutes=30):
+    """
+    {room: RoomDay} for one date of a booking log result.
+    """
+    return {room: RoomDay.from_timeslots(timeslots, slot_minutes) for room, timeslots in result.items()}
+
+
+def compact_result(result, slot_minutes=30):
+    return {room: day.to_compact() for room, day in room_days(result, slot_minutes).items()}
+
+
+def expand_result(compact):
+    return {room: RoomDay.from_compact(day).to_timeslots() for room, day in compact.items()}
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+# FBS renders availability with a DayPilot scheduler (hence the scheduler_bluewhite_* theme
+# classes). The component keeps every resource and event as plain objects, including rows
+# it has virtualised out of the DOM, so reading them avoids scrolling and re-rendering.
+READ_SCHEDULER_MODEL_JS = """
+() => {
+    const isScheduler = (candidate) => candidate && typeof candidate === 'object'
+        && Array.isArray(candidate.resources) && candidate.events && Array.isArray(candidate.events.list);
+    let scheduler = null;
+    for (const key of Object.keys(window)) {
+        try {
+            if (isScheduler(window[key])) { scheduler = window[key]; break; }
+        } catch (e) {}
+    }
+    if (!scheduler) return null;
+    const asString = (value) => value == null ? null
+        : (typeof value === 'string' ? value : (value.value || value.toString()));
+    const resources = [];
+    const flatten = (list, parent) => {
+        for (const resource of list || []) {
+            resources.push({id: String(resource.id ?? resource.value ?? ''), name: resource.name, parent: parent});
+            flatten(resource.children, resource.name);
+        }
+    };
+    flatten(scheduler.resources, null);
+    return {
+        resources: resources,
+        events: scheduler.events.list.map((event) => ({
+            resource: String(event.resource ?? ''),
+            start: asString(event.start),
+            end: asString(event.end),
+            text: event.text ?? null,
+            title: event.toolTip ?? event.bubbleHtml ?? null,
+        })),
+    };
+}
+"""
+
+
+async def read_scheduler_model(frame):
+    """
+    Resources and events straight from the scheduler component, or None when the
+    page does not expose one.
+    """
+    return await frame.evaluate(READ_SCHEDULER_MODEL_JS)
+
+
+def parse_model_datetime(value):
+    return datetime.fromisoformat(value.rstrip("Z"))
+
+
+def minutes_label(minutes):
+    # FBS closes each day at 23:59 rather than 24:00
+    if minutes >= 24 * 60:
+        return "23:59"
+    return f"{minutes // 60:02}:{minutes % 60:02}"
+
+
+def group_model_events(model, valid_buildings):
+    """
+    Split scheduler events into {date: {room: [events]}} with exact start and end
+    minutes. Events crossing midnight are cut at the day boundary, and building
+    group rows are dropped the same way the DOM path drops them.
+    """
+    rooms = {resource["id"]: resource["name"] for resource in model["resources"] if resource["name"] not in valid_buildings}
+    grouped = {}
+    for event in model["events"]:
+        room = rooms.get(event["resource"])
+        if room is None or not event["start"] or not event["end"]:
+            continue
+        start = parse_model_datetime(event["start"])
+        end = parse_model_datetime(event["end"])
+        day = start.date()
+        while day <= end.date():
+            day_start = start.hour * 60 + start.minute if day == start.date() else 0
+            day_end = end.hour * 60 + end.minute if day == end.date() else 24 * 60
+            if day_end > day_start:
+                grouped.setdefault(day.isoformat(), {}).setdefault(room, []).append({
+                    "start": day_start,
+                    "end": day_end,
+                    "timeslot": f"{minutes_label(day_start)}-{minutes_label(day_end)}",
+                    "text": event["text"],
+                    "title": event["title"],
+                })
+            day += timedelta(days=1)
+    for rooms_on_day in grouped.values():
+        for events in rooms_on_day.values():
+            events.sort(key=lambda event: event["start"])
+    return grouped, list(rooms.values())
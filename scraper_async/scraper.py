@@ -1,55 +1,32 @@
 import os
+import copy
 import json
+import time
+import asyncio
 import aiofiles
 from dateutil.parser import parse
 from datetime import datetime, timedelta
-from playwright.async_api import async_playwright
-from exceptions import FrameNotFoundException
-
-def generate_30_min_intervals():
-    intervals = []
-    start = datetime.strptime("00:00", "%H:%M")
-    end = datetime.strptime("23:59", "%H:%M")
-    while start <= end:
-        interval_end = (start + timedelta(minutes=30)).strftime("%H:%M")
-        intervals.append(f"{start.strftime('%H:%M')}-{interval_end}")
-        start += timedelta(minutes=30)
-    return intervals
-
-def remove_duplicates_preserve_order(lst):
-    seen = set()
-    result = []
-    for item in lst:
-        if item not in seen:
-            seen.add(item)
-            result.append(item)
-    return result
-
-def fill_missing_timeslots(room_schedule, target_timeslot_array):
-    new_schedule = []
-    for slot in room_schedule:
-        if slot["timeslot"] == target_timeslot_array[0]:  # already exists
-            new_schedule.append(slot)
-            del target_timeslot_array[0]
-        else:  # does not yet exist
-            new_timeslot = target_timeslot_array.pop(0)
-            new_schedule.append({
-                "timeslot": new_timeslot,
-                "available": True,
-                "status": "Available for booking",
-                "details": None
-            })
-            new_schedule.append(slot)  # Insert the existing slot
-            del target_timeslot_array[0]
-    return new_schedule
+from exceptions import FrameNotFoundException, HttpEngineUnsupportedException
+from http_engine import HttpEngine, MULTI_SELECT_PREFIXES, parse_postback_body
+from scheduler_model import read_scheduler_model, group_model_events
+from browser_pool import standalone_context
+from metrics import ScrapeMetrics
+from resource_blocking import ResourceBlocker, record_response_sizes
+from superset import describe_rooms, buildings_from_row_headers, filter_snapshot, can_answer
+from waits import WaitProfile, after_login, settle, expect_change, wait_for_value_change
+from timeline import fill_timeline
+from title_parser import parse_title
 
 def pretty_print_json(json_object):
     print(json.dumps(json_object, indent=4)) 
 
 async def write_json(json_object, filename):
     os.makedirs(os.path.dirname(filename), exist_ok=True)
-    async with aiofiles.open(filename, 'w') as json_file:
+    # Write to a private file and swap it in, so concurrent requests never interleave in one file
+    partial_filename = f"{filename}.{os.getpid()}.{id(json_object)}.partial"
+    async with aiofiles.open(partial_filename, 'w') as json_file:
         await json_file.write(json.dumps(json_object, indent=4))
+    os.replace(partial_filename, filename)
     print(f"JSON file written to filepath: {filename}")
 
 async def convert_room_capacity(room_capacity_raw, capacity_mapping):
@@ -99,28 +76,127 @@ def split_bookings_by_day(bookings):
                 current_day.append(booking)
     return days
 
-def add_missing_timeslots(booking_details, target_timeslot_array):
-    complete_booking_details = []
-    for timeslot in target_timeslot_array:
-        found = False
-        for booking in booking_details:
-            if booking["timeslot"] == timeslot:
-                complete_booking_details.append(booking)
-                found = True
-                break
-        if not found:
-            complete_booking_details.append({
-                "timeslot": timeslot,
-                "available": True,
-                "status": "Unbooked",
-                "details": None
-            })
-    return complete_booking_details
+DATE_INPUT_SELECTOR = "input#DateBookingFrom_c1_textDate"
+END_DATE_INPUT_SELECTOR = "input#DateBookingTo_c1_textDate"
+
+# Writes the target date into the picker input and fires the page's own postback.
+# Inputs wired with AutoPostBack carry an inline onchange handler, so dispatching
+# change is enough there; otherwise __doPostBack is called directly.
+JUMP_TO_DATE_JS = """
+([selector, target]) => {
+    const input = document.querySelector(selector);
+    if (!input) return null;
+    input.value = target;
+    if (input.getAttribute('onchange')) {
+        input.dispatchEvent(new Event('change', {bubbles: true}));
+        return 'change';
+    }
+    if (typeof __doPostBack === 'function' && input.name) {
+        __doPostBack(input.name, '');
+        return 'postback';
+    }
+    return null;
+}
+"""
+
+# Label text of a DropMulti* checkbox, from its <label for> or the surrounding element
+CHECKBOX_LABEL_JS = """
+const checkboxLabel = (box) => {
+    const label = document.querySelector(`label[for="${box.id}"]`);
+    return (label ? label.textContent : (box.parentElement ? box.parentElement.textContent : '')).trim();
+};
+"""
+
+# Ticks every requested option across all DropMulti* lists in one go, sets the
+# capacity and fires a single refresh postback. .checked is set directly rather
+# than clicking, since a click also runs any inline __doPostBack and every changed
+# box would post back on its own. Boxes the script touched are marked, so a box
+# still carrying the mark after the refresh was not re-rendered by the server.
+BATCH_FILTERS_JS = """
+([lists, capacity]) => {
+""" + CHECKBOX_LABEL_JS + """
+    const report = {missing: {}, trigger: null};
+    let lastChanged = null;
+    for (const [prefix, options] of Object.entries(lists)) {
+        const wanted = new Set(options);
+        const found = new Set();
+        for (const box of document.querySelectorAll(`input[type=checkbox][id^="${prefix}"]`)) {
+            const label = checkboxLabel(box);
+            const want = wanted.has(label);
+            if (want) found.add(label);
+            if (box.checked !== want) {
+                box.checked = want;
+                box.dataset.sagasuBatched = '1';
+                lastChanged = box;
+            }
+        }
+        const missing = options.filter((option) => !found.has(option));
+        if (missing.length) report.missing[prefix] = missing;
+    }
+    const capacitySelect = document.querySelector('select#DropCapacity_c1');
+    if (capacity && capacitySelect) capacitySelect.value = capacity;
+    if (lastChanged) {
+        const handler = (lastChanged.getAttribute('onclick') || '') + (lastChanged.getAttribute('onchange') || '');
+        const match = handler.match(/__doPostBack\\(\\\\?'([^'\\\\]+)/);
+        if (match && typeof __doPostBack === 'function') {
+            __doPostBack(match[1], '');
+            report.trigger = 'postback';
+        } else if (typeof popup !== 'undefined' && popup.hide) {
+            popup.hide();
+            report.trigger = 'popup';
+        }
+    }
+    return report;
+}
+"""
+
+# What the server rendered for each DropMulti* list after the refresh: the options
+# named in its summary text plus the checked boxes it re-rendered. Boxes still
+# marked by BATCH_FILTERS_JS only hold the script's own state, so they are not
+# counted, and any the server did not take are unticked again for the
+# sequential fallback to click.
+READ_FILTERS_JS = """
+(lists) => {
+""" + CHECKBOX_LABEL_JS + """
+    const applied = {};
+    for (const [prefix, options] of Object.entries(lists)) {
+        const summary = document.querySelector(`#${prefix}_c1_textItem`);
+        const summaryText = summary ? (summary.value || summary.textContent || '') : '';
+        const named = new Set(summaryText.split(',').map((part) => part.trim()).filter(Boolean));
+        const taken = new Set(options.filter((option) => named.has(option)));
+        for (const box of document.querySelectorAll(`input[type=checkbox][id^="${prefix}"]`)) {
+            const label = checkboxLabel(box);
+            if (!box.dataset.sagasuBatched) {
+                if (box.checked) taken.add(label);
+            } else if (!taken.has(label)) {
+                box.checked = false;
+            }
+        }
+        applied[prefix] = [...taken];
+    }
+    return applied;
+}
+"""
+
+# Everything the Python side parses, gathered in one round trip instead of one per element
+BULK_EXTRACT_JS = """
+() => ({
+    grid_headers: [...document.querySelectorAll('table#GridResults_gv th')]
+        .map((header) => header.innerText.trim()),
+    grid_rows: [...document.querySelectorAll('table#GridResults_gv tbody tr')]
+        .map((row) => [...row.querySelectorAll('td')].map((cell) => cell.innerText.trim())),
+    room_names: [...document.querySelectorAll('div.scheduler_bluewhite_rowheader_inner')]
+        .map((header) => header.innerText),
+    booking_titles: [...document.querySelectorAll('div.scheduler_bluewhite_event.scheduler_bluewhite_event_line0')]
+        .map((event) => event.getAttribute('title')),
+})
+"""
 
 ### SCRAPING METHODS ####
-async def login_credentials(page, constants, local_credentials):
-    await page.goto(constants['target_url'])
-    print(f"Navigating to {constants['target_url']}")
+async def login_credentials(page, constants, local_credentials, profile, navigate=True):
+    if navigate:
+        await page.goto(constants['target_url'])
+        print(f"Navigating to {constants['target_url']}")
 
     selectors = ['input#userNameInput', 'input#passwordInput', 'span#submitButton']
     for selector in selectors:
@@ -130,11 +206,53 @@ async def login_credentials(page, constants, local_credentials):
     await page.fill("input#passwordInput", local_credentials.password)
     await page.click("span#submitButton")
 
-    await page.wait_for_timeout(6000)
+    await after_login(page, profile)
+
+
+async def is_login_page(page):
     await page.wait_for_load_state('networkidle')
+    return await page.locator('input#userNameInput').count() > 0
+
+
+async def authenticate(page, constants, local_credentials, profile, session_cache=None, cached_state=None, cached_at=None):
+    """
+    Reuse a cached session when it is still accepted by FBS, otherwise perform a
+    full ADFS login. Concurrent logins for the same user are serialised so only
+    the first one hits ADFS and the rest pick up its stored session.
+    """
+    await page.goto(constants['target_url'])
+    print(f"Navigating to {constants['target_url']}")
+    if not await is_login_page(page):
+        print("Reusing cached session, skipping login")
+        return
+
+    if session_cache is None:
+        await login_credentials(page, constants, local_credentials, profile, navigate=False)
+        return
+
+    username = local_credentials.username
+    if cached_state is not None:
+        print("Cached session expired, falling back to full login")
+        await session_cache.invalidate(username, saved_at=cached_at)
 
+    async with session_cache.login_lock(username):
+        latest_at = session_cache.saved_at(username)
+        if latest_at is not None and latest_at != cached_at:
+            # Another request logged in while we were waiting on the lock
+            latest_state = await session_cache.get(username, local_credentials.password)
+            if latest_state is not None:
+                await page.context.add_cookies(latest_state.get('cookies', []))
+                await page.goto(constants['target_url'])
+                if not await is_login_page(page):
+                    print("Reusing session from concurrent login")
+                    return
 
-async def select_dropdown_options(frame, dropdown_selector, options, hide_popup_js="popup.hide()"):
+        await login_credentials(page, constants, local_credentials, profile, navigate=False)
+        await session_cache.put(username, local_credentials.password, await page.context.storage_state())
+        print("Stored authenticated session in cache")
+
+
+async def select_dropdown_options(frame, dropdown_selector, options, profile, hide_popup_js="popup.hide()"):
     if not options:
         return
 
@@ -143,17 +261,58 @@ async def select_dropdown_options(frame, dropdown_selector, options, hide_popup_
         for option in options:
             await frame.click(f'text="{option}"')
             print(f"Selecting {option}...")
-        await frame.evaluate(hide_popup_js)  # Closes the dropdown list
-        await frame.page.wait_for_load_state('networkidle')
-        await frame.wait_for_timeout(3000)
+        async with expect_change(frame, "table#GridResults_gv", profile, profile.filter_ms):
+            await frame.evaluate(hide_popup_js)  # Closes the dropdown list
+
+
+async def apply_filters(frame, request, profile):
+    HIDE_POPUP = "popup.hide()"
+    await select_dropdown_options(frame, '#DropMultiBuildingList_c1_textItem', request.building_names, profile, HIDE_POPUP)
+    await select_dropdown_options(frame, '#DropMultiFloorList_c1_textItem', request.floors, profile, HIDE_POPUP)
+    await select_dropdown_options(frame, '#DropMultiFacilityTypeList_c1_textItem', request.facility_types, profile, HIDE_POPUP)
+    await select_dropdown_options(frame, '#DropMultiEquipmentList_c1_textItem', request.equipment, profile, HIDE_POPUP)
+
+
+async def apply_filters_batched(frame, request, profile, room_capacity):
+    """
+    Apply building, floor, facility type, equipment and capacity selections in a
+    single evaluate and one refresh, then read back what the server rendered for
+    each list. Options the page did not take (e.g. floors that only appear after the building
+    postback) are applied through the sequential dropdown flow.
+    """
+    lists = {}
+    for request_field, prefix in MULTI_SELECT_PREFIXES.items():
+        options = getattr(request, request_field) or []
+        if options:
+            lists[prefix] = options
+    if not lists:
+        return {"trigger": None, "unapplied": {}}
 
+    async with expect_change(frame, "table#GridResults_gv", profile, profile.filter_ms):
+        report = await frame.evaluate(BATCH_FILTERS_JS, [lists, room_capacity])
+        if report["trigger"] is None:
+            print("Batched filters made no changes or found no refresh hook")
+    print(f"Batched filters applied via {report['trigger']}")
+
+    applied = await frame.evaluate(READ_FILTERS_JS, lists)
+    unapplied = {}
+    for prefix, options in lists.items():
+        remaining = [option for option in options if option not in applied.get(prefix, [])]
+        if remaining:
+            unapplied[prefix] = remaining
 
-async def apply_filters(frame, request):
     HIDE_POPUP = "popup.hide()"
-    await select_dropdown_options(frame, '#DropMultiBuildingList_c1_textItem', request.building_names, HIDE_POPUP)
-    await select_dropdown_options(frame, '#DropMultiFloorList_c1_textItem', request.floors, HIDE_POPUP)
-    await select_dropdown_options(frame, '#DropMultiFacilityTypeList_c1_textItem', request.facility_types, HIDE_POPUP)
-    await select_dropdown_options(frame, '#DropMultiEquipmentList_c1_textItem', request.equipment, HIDE_POPUP)
+    for prefix, options in unapplied.items():
+        print(f"Batched filters did not apply {options} to {prefix}, selecting them one by one")
+        await select_dropdown_options(frame, f'#{prefix}_c1_textItem', options, profile, HIDE_POPUP)
+    return {"trigger": report["trigger"], "unapplied": unapplied}
+
+
+def use_filter_mode(request, constants):
+    filter_mode = getattr(request, 'filter_mode', None) or constants.get('default_filter_mode', 'batched')
+    if filter_mode not in ("batched", "sequential"):
+        raise ValueError(f"Unknown filter mode '{filter_mode}'. Valid modes: batched, sequential")
+    return filter_mode
 
 
 async def select_time(frame, time_selector, time_value, description):
@@ -165,18 +324,79 @@ async def select_time(frame, time_selector, time_value, description):
         print(f"Select element for {description.lower()} not found")
 
 
-async def navigate_to_date(frame, target_date):
-    while True:
-        current_date_element = await frame.query_selector("input#DateBookingFrom_c1_textDate")
-        current_date_value = await current_date_element.get_attribute("value")
-        if current_date_value == target_date:
-            print(f"Final day is {current_date_value}")
-            break
-        else:
-            print(f"Current day is {current_date_value}")
-            print("Navigating to the next day...")
-            await frame.click("a#BtnDpcNext.btn")
-            await frame.wait_for_timeout(1500)
+async def current_date(frame):
+    current_date_element = await frame.query_selector(DATE_INPUT_SELECTOR)
+    return await current_date_element.get_attribute("value")
+
+
+async def jump_to_date(frame, target_date, profile):
+    try:
+        async with expect_change(frame, "body", profile, profile.date_step_ms):
+            trigger = await frame.evaluate(JUMP_TO_DATE_JS, [DATE_INPUT_SELECTOR, target_date])
+            if trigger is None:
+                raise ValueError("no date input or postback hook on the page")
+        return await current_date(frame) == target_date
+    except Exception as e:
+        print(f"Jump to date failed: {e}")
+        return False
+
+
+async def step_to_date(frame, target_date, profile):
+    """
+    Click "next" until the date input shows target_date. That takes exactly the
+    number of days in between, so a picker that skips or stalls past that raises
+    instead of stepping forever.
+    """
+    current_date_value = await current_date(frame)
+    max_steps = (datetime.strptime(target_date, "%d-%b-%Y") - datetime.strptime(current_date_value, "%d-%b-%Y")).days
+    if max_steps < 0:
+        raise ValueError(f"Cannot step forward from {current_date_value} to {target_date}")
+    steps = 0
+    while current_date_value != target_date:
+        if steps >= max_steps:
+            raise ValueError(f"Date picker did not reach {target_date} in {max_steps} steps, stopped at {current_date_value}")
+        print(f"Current day is {current_date_value}")
+        print("Navigating to the next day...")
+        await frame.click("a#BtnDpcNext.btn")
+        await wait_for_value_change(frame, DATE_INPUT_SELECTOR, current_date_value, profile, profile.date_step_ms)
+        steps += 1
+        current_date_value = await current_date(frame)
+    print(f"Final day is {current_date_value}")
+    return steps
+
+
+async def navigate_to_date(frame, target_date, profile, metrics=None):
+    """
+    Jump straight to target_date through the date input's postback, stepping
+    day by day with the "next" button only when the direct route fails.
+    """
+    started = time.monotonic()
+    if await current_date(frame) == target_date:
+        path, steps = "already_there", 0
+    elif await jump_to_date(frame, target_date, profile):
+        path, steps = "jump", 0
+    else:
+        path, steps = "step", await step_to_date(frame, target_date, profile)
+    elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+    print(f"Date navigation to {target_date} via {path} took {elapsed_ms} ms ({steps} steps)")
+    if metrics is not None:
+        metrics.record("date_navigation", {"path": path, "steps": steps, "elapsed_ms": elapsed_ms})
+
+
+async def widen_scheduler(frame, end_date, profile):
+    """
+    Set the booking end date so a single CheckAvailability renders every day up to
+    end_date. Returns False when the page has no end date input or rejects the value.
+    """
+    try:
+        async with expect_change(frame, "body", profile, profile.date_step_ms):
+            trigger = await frame.evaluate(JUMP_TO_DATE_JS, [END_DATE_INPUT_SELECTOR, end_date])
+            if trigger is None:
+                raise ValueError("no end date input or postback hook on the page")
+        return await frame.get_attribute(END_DATE_INPUT_SELECTOR, "value") == end_date
+    except Exception as e:
+        print(f"Widening the scheduler to {end_date} failed: {e}")
+        return False
 
 
 async def extract_matching_rooms(frame):
@@ -190,125 +410,471 @@ async def extract_matching_rooms(frame):
             matching_rooms.append(room_text)
     return matching_rooms
 
+async def extract_page_bulk(frame):
+    """
+    Grid rows, scheduler row headers and event titles from a single in-page script.
+    Returns the same shape as the HTTP engine's extraction.
+    """
+    extracted = await frame.evaluate(BULK_EXTRACT_JS)
+    return {
+        "matching_rooms": [row[1] for row in extracted["grid_rows"] if len(row) > 1],
+        "room_names": extracted["room_names"],
+        "booking_titles": extracted["booking_titles"],
+        "grid_headers": extracted["grid_headers"],
+        "grid_rows": extracted["grid_rows"],
+    }
+
+
+def use_extractor(request, constants):
+    extractor = getattr(request, 'extractor', None) or constants.get('default_extractor', 'bulk')
+    if extractor not in ("model", "bulk", "elements"):
+        raise ValueError(f"Unknown extractor '{extractor}'. Valid extractors: model, bulk, elements")
+    return extractor
+
+
 async def scrape_timeslots(frame, valid_buildings):
     room_names_raw = [await room.inner_text() for room in await frame.query_selector_all("div.scheduler_bluewhite_rowheader_inner")]
-    room_names = [name for name in room_names_raw if name not in valid_buildings]
-    
     bookings_elements = await frame.query_selector_all("div.scheduler_bluewhite_event.scheduler_bluewhite_event_line0")
     bookings_raw = [await elem.get_attribute("title") for elem in bookings_elements]
+    return parse_timeslots(room_names_raw, bookings_raw, valid_buildings)
+
+
+def parse_timeslots(room_names_raw, bookings_raw, valid_buildings):
+    room_names = [name for name in room_names_raw if name not in valid_buildings]
     bookings_sanitised = split_bookings_by_day(bookings_raw)
     
     room_timeslot_map = {}
     for index, booking_array in enumerate(bookings_sanitised):
-        booking_details = []
-        for booking in booking_array:
-            if booking.startswith("Booking Time:"):
-                details = {}
-                lines = booking.split("\n")
-                timeslot = lines[0].replace("Booking Time: ", "")
-                for line in lines[1:]:
-                    key, value = line.split(": ", 1)
-                    details[key] = value
-                booking_details.append({
-                    "timeslot": timeslot,
-                    "available": False,
-                    "status": "Booked",
-                    "details": details
-                })
-            elif booking.endswith("(not available)"):
-                time = booking.split(") (")[0].lstrip("(")
-                booking_details.append({
-                    "timeslot": time,
-                    "available": False,
-                    "status": "Not available",
-                    "details": None
-                })
-            else:
-                print(f"Unrecognised timeslot format, logged here: {booking}")
+        room_timeslot_map[room_names[index]] = timeslots_from_titles(booking_array)
+    
+    return room_timeslot_map
 
-        room_timeslot_map[room_names[index]] = fill_missing_timeslots(booking_details, generate_30_min_intervals())
+
+def parse_timeslots_by_day(room_names_raw, bookings_raw, valid_buildings, dates):
+    """
+    Per-date timeslot maps from a scheduler widened over consecutive dates. Each room
+    row holds one boundary-delimited group per day, so groups run room by room and
+    day by day within a room. Returns None when the group count is not rooms x days.
+    """
+    room_names = [name for name in room_names_raw if name not in valid_buildings]
+    bookings_sanitised = split_bookings_by_day(bookings_raw)
+    if len(bookings_sanitised) != len(room_names) * len(dates):
+        print(f"Expected {len(room_names) * len(dates)} day groups for {len(room_names)} rooms over {len(dates)} days, found {len(bookings_sanitised)}")
+        return None
     
+    timeslots_by_date = {date: {} for date in dates}
+    for index, booking_array in enumerate(bookings_sanitised):
+        room_index, day_index = divmod(index, len(dates))
+        timeslots_by_date[dates[day_index]][room_names[room_index]] = timeslots_from_titles(booking_array)
+    return timeslots_by_date
+
+
+def parse_extracted_timeslots(extracted, valid_buildings, view_dates=None):
+    if view_dates:
+        return parse_timeslots_by_day(extracted["room_names"], extracted["booking_titles"], valid_buildings, view_dates)
+    return parse_timeslots(extracted["room_names"], extracted["booking_titles"], valid_buildings)
+
+
+def timeslots_from_titles(booking_array):
+    booking_details = []
+    for booking in booking_array:
+        entry = parse_booking_title(booking)
+        if entry:
+            booking_details.append(entry)
+        else:
+            print(f"Unrecognised timeslot format, logged here: {booking}")
+    return fill_timeline(booking_details)
+
+
+def parse_booking_title(booking, timeslot=None):
+    """
+    Turn a scheduler event title into a timeslot entry. timeslot overrides the
+    time range in the title when exact times are known from elsewhere.
+    """
+    title = parse_title(booking)
+    return title.to_entry(timeslot) if title else None
+
+
+def model_timeslots(rooms, events_by_room):
+    """
+    Timeslot map for one day of scheduler model events, using the events' exact
+    start and end times instead of the times embedded in their titles.
+    """
+    room_timeslot_map = {}
+    for room in rooms:
+        booking_details = []
+        for event in events_by_room.get(room, []):
+            title = event["title"] or event["text"] or ""
+            entry = parse_booking_title(title, event["timeslot"])
+            if entry is None:
+                entry = {"timeslot": event["timeslot"], "available": False, "status": "Booked", "details": None}
+            booking_details.append(entry)
+        room_timeslot_map[room] = fill_timeline(booking_details)
     return room_timeslot_map
 
 
-async def scrape_smu_fbs(request, constants):
+async def scrape_timeslots_from_model(frame, valid_buildings, date_formatted, matching_rooms):
+    """
+    Read the day's availability from the scheduler's data model. Returns None when
+    there is no model or it does not cover every matching room, so the caller can
+    fall back to DOM extraction.
+    """
+    timeslots_by_date = await scrape_days_from_model(frame, valid_buildings, [date_formatted], matching_rooms)
+    return timeslots_by_date[date_formatted] if timeslots_by_date is not None else None
+
+
+async def scrape_days_from_model(frame, valid_buildings, dates, matching_rooms):
+    model = await read_scheduler_model(frame)
+    if not model:
+        return None
+    grouped, rooms = group_model_events(model, valid_buildings)
+    if not set(matching_rooms) <= set(rooms):
+        print("Scheduler model does not cover all matching rooms")
+        return None
+    return {date: model_timeslots(rooms, grouped.get(parse(date).date().isoformat(), {})) for date in dates}
+
+
+async def extract_timeslots_from_dom(frame, extractor, constants, date_formatted, matching_rooms, metrics, view_dates=None):
+    """
+    {room: timeslots} for the rendered scheduler, or {date: {room: timeslots}} over
+    view_dates when it has been widened. The widened view is always read in bulk.
+    """
+    timeslot_map = None
+    if extractor == "model":
+        if view_dates:
+            timeslot_map = await scrape_days_from_model(frame, constants['valid_buildings'], view_dates, matching_rooms)
+        else:
+            timeslot_map = await scrape_timeslots_from_model(frame, constants['valid_buildings'], date_formatted, matching_rooms)
+        if timeslot_map is None:
+            print("Scheduler model unavailable, falling back to bulk DOM extraction")
+            metrics.record("extractor", "bulk")
+    if timeslot_map is None and (extractor in ("model", "bulk") or view_dates):
+        timeslot_map = parse_extracted_timeslots(await extract_page_bulk(frame), constants['valid_buildings'], view_dates)
+    elif timeslot_map is None:
+        timeslot_map = await scrape_timeslots(frame, constants['valid_buildings'])
+    return timeslot_map
+
+
+async def wait_for_availability_render(frame, profile):
+    if profile.event_driven:
+        await frame.wait_for_selector("div.scheduler_bluewhite_rowheader_inner", timeout=profile.availability_ms)
+    else:
+        await frame.page.wait_for_load_state("networkidle")
+        await frame.wait_for_timeout(profile.availability_ms)
+
+
+async def capture_availability(frame, profile, matching_rooms):
+    """
+    Click CheckAvailability and parse the postback responses as they arrive,
+    without waiting for the scheduler to render. Returns None when no response
+    within the availability bound carries scheduler data for every matching room.
+    """
+    responses = asyncio.Queue()
+
+    def on_response(response):
+        if response.request.method == "POST" and response.frame == frame:
+            responses.put_nowait(response)
+
+    frame.page.on("response", on_response)
+    try:
+        await frame.click("a#CheckAvailability")
+        deadline = time.monotonic() + profile.availability_ms / 1000
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                response = await asyncio.wait_for(responses.get(), timeout=remaining)
+                body = await response.text()
+            except asyncio.TimeoutError:
+                return None
+            except Exception as e:
+                print(f"Could not read postback response: {e}")
+                continue
+            captured = parse_postback_body(body)
+            if captured["room_names"] and set(matching_rooms) <= set(captured["room_names"]):
+                return captured
+    finally:
+        frame.page.remove_listener("response", on_response)
+
+
+def use_availability_source(request, constants):
+    source = getattr(request, 'availability_source', None) or constants.get('default_availability_source', 'network')
+    if source not in ("network", "dom"):
+        raise ValueError(f"Unknown availability source '{source}'. Valid sources: network, dom")
+    return source
+
+
+async def read_room_buildings(frame, valid_buildings):
+    """
+    Room to building from the scheduler's grouping, preferring the data model since
+    the DOM only holds the rows currently rendered.
+    """
+    model = await read_scheduler_model(frame)
+    if model:
+        return {resource["name"]: resource["parent"] for resource in model["resources"] if resource["parent"] in valid_buildings}
+    return buildings_from_row_headers((await extract_page_bulk(frame))["room_names"], valid_buildings)
+
+
+def use_lean_profile(request, constants):
+    lean = getattr(request, 'lean', None)
+    if lean is None:
+        return constants.get('lean_profile', {}).get('enabled', True)
+    return lean
+
+
+async def prepare_context(context, request, constants, metrics):
+    if not use_lean_profile(request, constants):
+        record_response_sizes(context)
+        metrics.record("lean_profile", None)
+        return None
+    blocker = ResourceBlocker.from_constants(constants)
+    await blocker.attach(context)
+    return blocker
+
+
+def open_browser_context(browser_pool, profile, **context_options):
+    """
+    A leased context when the pooled browsers run at the profile's slow_mo, else a
+    standalone browser launched with it, since slow_mo is fixed when a browser launches.
+    """
+    if browser_pool is not None:
+        if browser_pool.launch_options.get("slow_mo", 0) == profile.slow_mo:
+            return browser_pool.lease(**context_options)
+        print(f"Wait profile '{profile.name}' needs slow_mo {profile.slow_mo}, launching a browser outside the pool")
+        return standalone_context({**browser_pool.launch_options, "slow_mo": profile.slow_mo}, **context_options)
+    launch_options = {"headless": True, "slow_mo": profile.slow_mo}
+    return standalone_context(launch_options, **context_options)
+
+
+def requested_dates(request, constants):
+    """
+    The dates a request covers, formatted for FBS and in calendar order: an explicit
+    list in dates, an inclusive range from date_raw to date_end, or just date_raw.
+    """
+    max_days = constants.get('date_range', {}).get('max_days', 14)
+    explicit_dates = getattr(request, 'dates', None)
+    date_end = getattr(request, 'date_end', None)
+    if explicit_dates:
+        dates = {format_date(date_raw) for date_raw in explicit_dates}
+    elif request.date_raw and date_end:
+        first_day = datetime.strptime(format_date(request.date_raw), "%d-%b-%Y")
+        last_day = datetime.strptime(format_date(date_end), "%d-%b-%Y")
+        if last_day < first_day:
+            raise ValueError(f"date_end {date_end} is before date_raw {request.date_raw}")
+        if (last_day - first_day).days + 1 > max_days:
+            raise ValueError(f"Date range exceeds the maximum of {max_days} days")
+        dates = {(first_day + timedelta(days=offset)).strftime("%d-%b-%Y") for offset in range((last_day - first_day).days + 1)}
+    elif request.date_raw:
+        dates = {format_date(request.date_raw)}
+    else:
+        raise ValueError("Request needs date_raw or dates")
+    if len(dates) > max_days:
+        raise ValueError(f"Request covers {len(dates)} dates, the maximum is {max_days}")
+    return sorted(dates, key=lambda date: datetime.strptime(date, "%d-%b-%Y"))
+
+
+async def scrape_parameters(request, constants):
+    date_formatted = requested_dates(request, constants)[0]
+    end_time = calculate_end_time(constants['valid_time'], request.start_time, request.duration_hours)[0]
+    room_capacity_formatted = await convert_room_capacity(7, {
+        lambda x: x < 5: "LessThan5Pax",
+        lambda x: x <= 10: "From6To10Pax",
+        lambda x: x <= 15: "From11To15Pax",
+        lambda x: x <= 20: "From16To20Pax",
+        lambda x: x <= 50: "From21To50Pax",
+        lambda x: x <= 100: "From51To100Pax",
+    })
+    return date_formatted, end_time, room_capacity_formatted
+
+
+async def scrape_smu_fbs(request, constants, browser_pool=None, session_cache=None, superset_store=None, history_store=None):
     """
     Asynchronously handle automated login to SMU FBS and scrape booked timeslots.
+    The request's engine picks between the browserless HTTP engine and Playwright;
+    the HTTP engine falls back to Playwright on any page it does not understand.
+    Requests covered by a superset snapshot in superset_store, or asking for a
+    superset scope, are answered by filtering the snapshot locally.
+    Logs read from FBS are queued for history_store when one is given; ones filtered
+    out of an existing snapshot are not, since that scrape is already recorded.
     Returns the final booking log.
     """
+    metrics = ScrapeMetrics()
+    log = await scrape_from_superset(request, constants, metrics, browser_pool, session_cache, superset_store)
+    if log is None:
+        log = await scrape_with_engine(request, constants, metrics, browser_pool, session_cache)
+    if history_store is not None and metrics.details.get("superset", {}).get("source") != "snapshot":
+        history_store.record(log)
+    return log
+
+
+async def scrape_with_engine(request, constants, metrics, browser_pool=None, session_cache=None):
+    engine = getattr(request, 'engine', None) or constants.get('default_engine', 'playwright')
+    if engine not in ("http", "playwright"):
+        raise ValueError(f"Unknown engine '{engine}'. Valid engines: http, playwright")
+    if engine == "http":
+        try:
+            with metrics.step("http_engine"):
+                return await scrape_with_http(request, constants, metrics)
+        except HttpEngineUnsupportedException as unsupported:
+            print(f"{unsupported}. Falling back to Playwright...")
+            metrics.record("engine_fallback", unsupported.reason)
+    return await scrape_with_playwright(request, constants, metrics, browser_pool, session_cache)
+
+
+def use_scope(request, constants):
+    scope = getattr(request, 'scope', None) or constants.get('superset', {}).get('default_scope', 'filtered')
+    if scope not in ("filtered", "building", "campus"):
+        raise ValueError(f"Unknown scope '{scope}'. Valid scopes: filtered, building, campus")
+    return scope
+
+
+async def scrape_from_superset(request, constants, metrics, browser_pool=None, session_cache=None, superset_store=None):
+    """
+    Answer a single-date request from a covering superset snapshot, scraping one
+    first when the request asks for a building or campus scope. Returns None when
+    the request should go through the filtered FBS search instead.
+    """
+    scope = use_scope(request, constants)
+    if scope == "filtered" and superset_store is None:
+        return None
+    dates = requested_dates(request, constants)
+    if len(dates) > 1:
+        if scope != "filtered":
+            print("Superset scopes cover a single date, scraping the filtered search instead")
+        return None
+    DATE_FORMATTED, END_TIME, ROOM_CAPACITY_FORMATTED = await scrape_parameters(request, constants)
+    
+    time_window = [request.start_time, END_TIME]
+    snapshot = superset_store.covering(request, constants, DATE_FORMATTED, ROOM_CAPACITY_FORMATTED, time_window) if superset_store else None
+    source = "snapshot"
+    if snapshot is None:
+        if scope == "filtered":
+            return None
+        snapshot = await scrape_superset_snapshot(request, constants, metrics, scope, DATE_FORMATTED, ROOM_CAPACITY_FORMATTED, time_window, browser_pool, session_cache)
+        if superset_store is not None:
+            await superset_store.put(snapshot)
+        source = "scraped"
+        if not can_answer(snapshot, request, constants):
+            print("Results grid lacks the metadata this request filters on, scraping the filtered search instead")
+            metrics.record("superset", {"scope": scope, "source": source, "attributes": snapshot["attributes"], "answered": False})
+            return None
+    
+    final_timeslot_map = filter_snapshot(snapshot, request, constants)
+    metrics.record("superset", {
+        "scope": snapshot["scope"],
+        "source": source,
+        "rooms_in_snapshot": len(snapshot["timeslots"]),
+        "rooms_matched": len(final_timeslot_map),
+        "attributes": snapshot["attributes"],
+    })
+    os.makedirs(constants['booking_log_filepath'], exist_ok=True)
+    return await generate_final_log(constants, DATE_FORMATTED, request, final_timeslot_map, metrics)
+
+
+async def scrape_superset_snapshot(request, constants, metrics, scope, date_formatted, room_capacity, time_window, browser_pool=None, session_cache=None):
+    """
+    Scrape every room in the requested buildings (scope "building") or on campus
+    (scope "campus") for the date and time_window ([start_time, end_time]), with
+    per-room metadata from the results grid.
+    """
+    if scope == "building" and not request.building_names:
+        raise ValueError("Scope 'building' needs building_names")
+    superset_request = copy.copy(request)
+    superset_request.building_names = list(request.building_names) if scope == "building" else []
+    superset_request.floors = []
+    superset_request.facility_types = []
+    superset_request.equipment = []
+    room_metadata = {}
+    with metrics.step("superset_scrape"):
+        superset_log = await scrape_with_playwright(superset_request, constants, metrics, browser_pool, session_cache, room_metadata)
+    rooms, attributes = room_metadata.get("rooms", {}), room_metadata.get("attributes", [])
+    return {
+        "date": date_formatted,
+        "room_capacity": room_capacity,
+        "time_window": list(time_window),
+        "scope": scope,
+        "building_names": sorted(superset_request.building_names),
+        "attributes": attributes,
+        "rooms": rooms,
+        "timeslots": superset_log["scraped"]["result"],
+    }
+
+
+async def scrape_with_http(request, constants, metrics):
+    if len(requested_dates(request, constants)) > 1:
+        raise HttpEngineUnsupportedException("Multi-date requests are scraped in parallel browser tabs")
+    DATE_FORMATTED, END_TIME, ROOM_CAPACITY_FORMATTED = await scrape_parameters(request, constants)
+    os.makedirs(constants['booking_log_filepath'], exist_ok=True)
+    engine = HttpEngine(constants)
     try:
-        DATE_FORMATTED = format_date(request.date_raw)
-        END_TIME = calculate_end_time(constants['valid_time'], request.start_time, request.duration_hours)[0]
-        ROOM_CAPACITY_FORMATTED = await convert_room_capacity(7, {
-            lambda x: x < 5: "LessThan5Pax",
-            lambda x: x <= 10: "From6To10Pax",
-            lambda x: x <= 15: "From11To15Pax",
-            lambda x: x <= 20: "From16To20Pax",
-            lambda x: x <= 50: "From21To50Pax",
-            lambda x: x <= 100: "From51To100Pax",
-        })
+        extracted = await engine.fetch_availability(request, DATE_FORMATTED, END_TIME, ROOM_CAPACITY_FORMATTED)
+    finally:
+        await engine.close()
+    metrics.record("engine", "http")
+    if not extracted["matching_rooms"]:
+        print("No rooms fitting description found.")
+        return await generate_final_log(constants, DATE_FORMATTED, request, {}, metrics)
+    print(f"{len(extracted['matching_rooms'])} rooms fitting description found")
+    final_timeslot_map = parse_timeslots(extracted["room_names"], extracted["booking_titles"], constants['valid_buildings'])
+    return await generate_final_log(constants, DATE_FORMATTED, request, final_timeslot_map, metrics)
+
+
+async def scrape_with_playwright(request, constants, metrics, browser_pool=None, session_cache=None, room_metadata=None):
+    """
+    Drive FBS in Chromium. Leases a context from browser_pool when given, otherwise
+    launches a one-off browser. Reuses cached sessions from session_cache to skip the
+    ADFS login where possible. Waits follow the request's wait profile.
+    Multi-date requests log in once and scrape each date in its own tab of the same
+    context, at most date_range.parallelism tabs at a time.
+    Single-date scrapes fill room_metadata, when given, with per-room grid metadata.
+    """
+    try:
+        metrics.record("engine", "playwright")
+        profile = WaitProfile.from_constants(constants, getattr(request, 'wait_profile', None))
+        metrics.record("wait_profile", profile.name)
+        DATE_FORMATTED, END_TIME, ROOM_CAPACITY_FORMATTED = await scrape_parameters(request, constants)
+        dates = requested_dates(request, constants)
         
         # Ensure directories exist
         os.makedirs(constants['screenshot_filepath'], exist_ok=True)
         os.makedirs(constants['booking_log_filepath'], exist_ok=True)
         
         local_credentials = request.credentials
+        cached_state, cached_at = None, None
+        if session_cache is not None:
+            cached_state = await session_cache.get(local_credentials.username, local_credentials.password)
+            cached_at = session_cache.saved_at(local_credentials.username)
+        context_options = {"storage_state": cached_state} if cached_state else {}
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True, slow_mo=1000)
-            page = await browser.new_page()
+        async with open_browser_context(browser_pool, profile, **context_options) as context:
+            blocker = await prepare_context(context, request, constants, metrics)
+            page = await context.new_page()
             
             try:
                 # Login
-                await login_credentials(page, constants, local_credentials)
-                
-                # Navigate to content frame
-                frame = page.frame(name="frameContent")
-                if not frame:
-                    raise FrameNotFoundException("Frame 'frameContent' could not be found.")
-                
-                # Navigate to the desired date
-                await navigate_to_date(frame, DATE_FORMATTED)
-                
-                # Select start and end times
-                await select_time(frame, "select#TimeFrom_c1_ctl04", request.start_time, "start time")
-                await select_time(frame, "select#TimeTo_c1_ctl04", END_TIME, "end time")
-                await frame.wait_for_timeout(3000)
-                
-                # Apply filters
-                await apply_filters(frame, request)
-                
-                # Select room capacity
-                await select_time(frame, "select#DropCapacity_c1", ROOM_CAPACITY_FORMATTED, "room capacity")
-                await frame.wait_for_timeout(3000)
-                
-                # Take initial screenshot
-                await page.screenshot(path=os.path.join(constants['screenshot_filepath'], "0.png"))
+                with metrics.step("login"):
+                    await authenticate(page, constants, local_credentials, profile, session_cache, cached_state, cached_at)
                 
-                # Extract matching rooms
-                matching_rooms = await extract_matching_rooms(frame)
-                if not matching_rooms:
-                    print("No rooms fitting description found.")
-                    return await generate_final_log(constants, DATE_FORMATTED, request, {})
+                if len(dates) == 1:
+                    final_timeslot_map = await scrape_date(page, request, constants, profile, DATE_FORMATTED, END_TIME, ROOM_CAPACITY_FORMATTED, metrics, room_metadata=room_metadata)
+                    return await generate_final_log(constants, DATE_FORMATTED, request, final_timeslot_map, metrics)
                 
-                print(f"{len(matching_rooms)} rooms fitting description found:")
-                for room in matching_rooms:
-                    print(f"- {room}")
-                
-                # Search availability
-                await frame.click("a#CheckAvailability")
-                print("Submitting search availability request...")
-                await page.wait_for_load_state("networkidle")
-                await page.wait_for_timeout(6000)
-                
-                # Capture screenshot of timeslots
-                await page.screenshot(path=os.path.join(constants['screenshot_filepath'], "1.png"))
-                
-                # Scrape timeslots
-                final_timeslot_map = await scrape_timeslots(frame, constants['valid_buildings'])
-                
-                # Generate and write final booking log
-                return await generate_final_log(constants, DATE_FORMATTED, request, final_timeslot_map)
+                with metrics.step("scrape_dates"):
+                    final_timeslot_map = None
+                    date_mode = use_date_mode(request, constants, dates)
+                    metrics.record("date_mode", date_mode)
+                    if date_mode == "view":
+                        final_timeslot_map = await scrape_dates_in_view(page, request, constants, profile, dates, END_TIME, ROOM_CAPACITY_FORMATTED, metrics)
+                        if final_timeslot_map is None:
+                            print("Multi-day scheduler view unavailable, falling back to one tab per date")
+                            metrics.record("date_mode", "tabs")
+                            # Start the tabs from a clean form rather than the widened one
+                            await page.goto(constants['target_url'])
+                    if final_timeslot_map is None:
+                        final_timeslot_map, date_metrics = await scrape_dates_in_tabs(page, request, constants, profile, dates, END_TIME, ROOM_CAPACITY_FORMATTED)
+                        metrics.record("dates", date_metrics)
+                return await generate_final_log(constants, dates, request, final_timeslot_map, metrics)
             
             except FrameNotFoundException as fnf_error:
                 print(f"Frame not found error: {fnf_error}")
@@ -319,23 +885,205 @@ async def scrape_smu_fbs(request, constants):
                 raise e
             
             finally:
-                print("Closing browser...")
-                await browser.close()
+                if blocker is not None:
+                    metrics.record("lean_profile", blocker.stats())
     
     except Exception as e:
         print(f"Failed to initialize Playwright: {e}")
         raise e
 
 
-async def generate_final_log(constants, date_formatted, request, result):
+def use_date_mode(request, constants, dates):
+    """
+    "view" widens one scheduler over the whole span of dates, "tabs" scrapes each
+    date in its own tab. Spans longer than date_range.max_view_days always use tabs.
+    """
+    config = constants.get('date_range', {})
+    date_mode = getattr(request, 'date_mode', None) or config.get('mode', 'view')
+    if date_mode not in ("view", "tabs"):
+        raise ValueError(f"Unknown date mode '{date_mode}'. Valid modes: view, tabs")
+    span_days = (datetime.strptime(dates[-1], "%d-%b-%Y") - datetime.strptime(dates[0], "%d-%b-%Y")).days + 1
+    if date_mode == "view" and span_days > config.get('max_view_days', 7):
+        return "tabs"
+    return date_mode
+
+
+async def scrape_dates_in_view(page, request, constants, profile, dates, end_time, room_capacity, metrics):
+    """
+    Scrape every date from one CheckAvailability by widening the scheduler from the
+    first to the last date. Returns {date: {room: timeslots}} for the requested dates,
+    or None when the page does not support the widened view.
+    """
+    first_day = datetime.strptime(dates[0], "%d-%b-%Y")
+    span_days = (datetime.strptime(dates[-1], "%d-%b-%Y") - first_day).days + 1
+    view_dates = [(first_day + timedelta(days=offset)).strftime("%d-%b-%Y") for offset in range(span_days)]
+    print(f"Scraping {len(dates)} dates from one scheduler view spanning {span_days} days")
+    timeslots_by_date = await scrape_date(page, request, constants, profile, dates[0], end_time, room_capacity, metrics, view_dates=view_dates)
+    if timeslots_by_date is None:
+        return None
+    return {date: timeslots_by_date[date] for date in dates}
+
+
+async def scrape_dates_in_tabs(login_page, request, constants, profile, dates, end_time, room_capacity):
+    """
+    Scrape every date in its own tab of the already authenticated context. The login
+    tab takes the first date; the others open the home page with the session cookies.
+    Returns ({date: {room: timeslots}}, {date: metrics}).
+    """
+    parallelism = max(1, constants.get('date_range', {}).get('parallelism', 3))
+    semaphore = asyncio.Semaphore(parallelism)
+    date_metrics = {date: ScrapeMetrics() for date in dates}
+    
+    async def scrape_in_tab(date_formatted, page=None):
+        async with semaphore:
+            opened_tab = page is None
+            if opened_tab:
+                page = await login_page.context.new_page()
+            try:
+                if opened_tab:
+                    with date_metrics[date_formatted].step("open_tab"):
+                        await authenticate(page, constants, request.credentials, profile)
+                return await scrape_date(page, request, constants, profile, date_formatted, end_time, room_capacity, date_metrics[date_formatted], screenshot_prefix=f"{date_formatted}-")
+            finally:
+                if opened_tab:
+                    await page.close()
+    
+    print(f"Scraping {len(dates)} dates, {parallelism} tabs at a time")
+    results = await asyncio.gather(
+        scrape_in_tab(dates[0], login_page),
+        *(scrape_in_tab(date_formatted) for date_formatted in dates[1:]),
+    )
+    return dict(zip(dates, results)), {date: metrics.as_dict() for date, metrics in date_metrics.items()}
+
+
+async def scrape_date(page, request, constants, profile, date_formatted, end_time, room_capacity, metrics, screenshot_prefix="", view_dates=None, room_metadata=None):
+    """
+    Run the search form for one date on an authenticated page and return {room: timeslots}.
+    With view_dates (consecutive dates starting at date_formatted) the scheduler is
+    widened to cover them all and {date: {room: timeslots}} is returned instead, or
+    None when the widened view cannot be set up or parsed. A room_metadata dict is
+    filled with {"rooms": {room: metadata}, "attributes": [...]} from the results grid.
+    """
+    # Navigate to content frame
+    frame = page.frame(name="frameContent")
+    if not frame:
+        raise FrameNotFoundException("Frame 'frameContent' could not be found.")
+    
+    # Navigate to the desired date
+    with metrics.step("navigate_to_date"):
+        await navigate_to_date(frame, date_formatted, profile, metrics)
+    if view_dates:
+        with metrics.step("widen_scheduler"):
+            if not await widen_scheduler(frame, view_dates[-1], profile):
+                return None
+    
+    # Select start and end times
+    with metrics.step("select_time"):
+        await select_time(frame, "select#TimeFrom_c1_ctl04", request.start_time, "start time")
+        await select_time(frame, "select#TimeTo_c1_ctl04", end_time, "end time")
+        await settle(frame, profile)
+    
+    # Apply filters and room capacity
+    if use_filter_mode(request, constants) == "batched":
+        with metrics.step("apply_filters"):
+            metrics.record("batched_filters", await apply_filters_batched(frame, request, profile, room_capacity))
+            await select_time(frame, "select#DropCapacity_c1", room_capacity, "room capacity")
+    else:
+        with metrics.step("apply_filters"):
+            await apply_filters(frame, request, profile)
+        
+        # Select room capacity
+        with metrics.step("select_capacity"):
+            await select_time(frame, "select#DropCapacity_c1", room_capacity, "room capacity")
+            await settle(frame, profile)
+    
+    # Take initial screenshot
+    await page.screenshot(path=os.path.join(constants['screenshot_filepath'], f"{screenshot_prefix}0.png"))
+    
+    # Extract matching rooms
+    extractor = use_extractor(request, constants)
+    metrics.record("extractor", extractor)
+    with metrics.step("extract_matching_rooms"):
+        if extractor in ("model", "bulk") or room_metadata is not None:
+            await frame.wait_for_selector("table#GridResults_gv")
+            grid = await extract_page_bulk(frame)
+            matching_rooms = grid["matching_rooms"]
+        else:
+            matching_rooms = await extract_matching_rooms(frame)
+    if not matching_rooms:
+        print(f"No rooms fitting description found on {date_formatted}.")
+        return {date: {} for date in view_dates} if view_dates else {}
+    
+    print(f"{len(matching_rooms)} rooms fitting description found on {date_formatted}:")
+    for room in matching_rooms:
+        print(f"- {room}")
+    
+    # Search availability
+    availability_source = use_availability_source(request, constants)
+    compare_paths = bool(getattr(request, 'compare_availability', False))
+    availability = {"path": availability_source}
+    final_timeslot_map = None
+    started = time.monotonic()
+    if availability_source == "network":
+        with metrics.step("check_availability"):
+            print("Submitting search availability request...")
+            captured = await capture_availability(frame, profile, matching_rooms)
+        if captured is not None:
+            final_timeslot_map = parse_extracted_timeslots(captured, constants['valid_buildings'], view_dates)
+        if final_timeslot_map is not None:
+            availability["network_ms"] = round((time.monotonic() - started) * 1000, 1)
+        else:
+            print("No usable availability response captured, falling back to the rendered DOM")
+            availability["path"] = "dom"
+        if final_timeslot_map is None or compare_paths:
+            with metrics.step("check_availability"):
+                await wait_for_availability_render(frame, profile)
+    else:
+        with metrics.step("check_availability"):
+            async with expect_change(frame, "body", profile, profile.availability_ms):
+                await frame.click("a#CheckAvailability")
+                print("Submitting search availability request...")
+            await wait_for_availability_render(frame, profile)
+    
+    # Capture screenshot of timeslots
+    await page.screenshot(path=os.path.join(constants['screenshot_filepath'], f"{screenshot_prefix}1.png"))
+    
+    # Scrape timeslots
+    if final_timeslot_map is None or compare_paths:
+        with metrics.step("scrape_timeslots"):
+            dom_timeslot_map = await extract_timeslots_from_dom(frame, extractor, constants, date_formatted, matching_rooms, metrics, view_dates)
+        availability["dom_ms"] = round((time.monotonic() - started) * 1000, 1)
+        if final_timeslot_map is None:
+            final_timeslot_map = dom_timeslot_map
+        else:
+            availability["results_match"] = final_timeslot_map == dom_timeslot_map
+    metrics.record("availability", availability)
+    
+    if room_metadata is not None:
+        with metrics.step("room_metadata"):
+            if availability["path"] == "network" and not compare_paths:
+                await wait_for_availability_render(frame, profile)
+            room_buildings = await read_room_buildings(frame, constants['valid_buildings'])
+            rooms, attributes = describe_rooms(grid["grid_headers"], grid["grid_rows"], room_buildings, constants)
+            room_metadata.update({"rooms": rooms, "attributes": attributes})
+    return final_timeslot_map
+
+
+async def generate_final_log(constants, date_formatted, request, result, metrics=None):
+    """
+    Multi-date logs pass a list of dates and a result keyed by date, then room.
+    """
     current_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    dates = date_formatted if isinstance(date_formatted, list) else [date_formatted]
     final_booking_log = {
         "metrics": {
             "scraping_date": current_datetime,
+            **(metrics.as_dict() if metrics else {}),
         },
         "scraped": {
             "config": {
-                "date": date_formatted,
+                "date": dates[0],
+                **({"dates": dates} if len(dates) > 1 else {}),
                 "start_time": request.start_time,
                 "end_time": calculate_end_time(constants['valid_time'], request.start_time, request.duration_hours)[0],
                 "duration": request.duration_hours,
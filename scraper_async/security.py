@@ -1,6 +1,9 @@
 import base64
+import hashlib
+import hmac
 import os
 from dotenv import load_dotenv
+from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
 
@@ -47,3 +50,28 @@ def decrypt_data_rsa(encrypted_data):
         )
     )
     return decrypted.decode()
+
+
+def load_symmetric_key():
+    # Derived from the RSA private key so no extra secret needs provisioning
+    private_key_b64 = os.getenv("SESSION_CACHE_KEY") or os.getenv("PRIVATE_KEY")
+    if not private_key_b64:
+        raise ValueError("SESSION_CACHE_KEY or PRIVATE_KEY not found in environment variables.")
+    return base64.urlsafe_b64encode(hashlib.sha256(private_key_b64.encode()).digest())
+
+def encrypt_data_symmetric(data: bytes):
+    return Fernet(load_symmetric_key()).encrypt(data)
+
+def decrypt_data_symmetric(encrypted_data: bytes, ttl=None):
+    return Fernet(load_symmetric_key()).decrypt(encrypted_data, ttl=ttl)
+
+
+def hash_password(password, salt=None):
+    # scrypt, so a leaked symmetric key still does not hand out cheap password guesses
+    salt = salt if salt is not None else os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=2**14, r=8, p=1)
+    return salt.hex(), digest.hex()
+
+def verify_password(password, salt_hex, digest_hex):
+    _, digest = hash_password(password, bytes.fromhex(salt_hex))
+    return hmac.compare_digest(digest, digest_hex)
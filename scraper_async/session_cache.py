@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import aiofiles
+from cryptography.fernet import InvalidToken
+from security import encrypt_data_symmetric, decrypt_data_symmetric, hash_password, verify_password
+
+
+class SessionCache:
+    """
+    Encrypted, TTL-bound store of Playwright storage_state per FBS user.
+    Entries are keyed by a hash of the username so plaintext identities never hit disk,
+    and carry a salted scrypt hash of the password they were logged in with, so a
+    session is only handed back to a request that presents the same password.
+    """
+
+    def __init__(self, ttl_seconds=1800, cache_dir=None):
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self._tokens = {}
+        self._saved_at = {}
+        self._locks = {}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_constants(cls, constants):
+        config = constants.get('session_cache', {})
+        if not config.get('enabled', True):
+            return None
+        return cls(
+            ttl_seconds=config.get('ttl_seconds', 1800),
+            cache_dir=config.get('filepath'),
+        )
+
+    @staticmethod
+    def key_for(username):
+        return hashlib.sha256(username.strip().lower().encode()).hexdigest()
+
+    def _path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.session")
+
+    def login_lock(self, username):
+        """
+        Per-user lock so concurrent scrapes share a single in-flight login.
+        """
+        return self._locks.setdefault(self.key_for(username), asyncio.Lock())
+
+    def saved_at(self, username):
+        return self._saved_at.get(self.key_for(username))
+
+    async def get(self, username, password):
+        key = self.key_for(username)
+        token = self._tokens.get(key)
+        if token is None and self.cache_dir and os.path.exists(self._path_for(key)):
+            async with aiofiles.open(self._path_for(key), 'rb') as session_file:
+                token = await session_file.read()
+            self._tokens[key] = token
+            self._saved_at[key] = os.path.getmtime(self._path_for(key))
+        if token is None:
+            return None
+        try:
+            # Fernet tokens carry their own timestamp, so the TTL check is part of decryption
+            entry = json.loads(decrypt_data_symmetric(token, ttl=self.ttl_seconds))
+        except InvalidToken:
+            print("Cached session expired or unreadable, discarding it")
+            await self.invalidate(username)
+            return None
+        if "password_hash" not in entry:
+            print("Cached session has no password hash, discarding it")
+            await self.invalidate(username)
+            return None
+        # A mismatch leaves the entry alone: the owner's session stays valid for them
+        if not await asyncio.to_thread(verify_password, password, entry["password_salt"], entry["password_hash"]):
+            print("Cached session belongs to a different password, not reusing it")
+            return None
+        return entry["storage_state"]
+
+    async def put(self, username, password, storage_state):
+        key = self.key_for(username)
+        salt, digest = await asyncio.to_thread(hash_password, password)
+        entry = {"password_salt": salt, "password_hash": digest, "storage_state": storage_state}
+        token = encrypt_data_symmetric(json.dumps(entry).encode())
+        self._tokens[key] = token
+        self._saved_at[key] = time.time()
+        if self.cache_dir:
+            async with aiofiles.open(self._path_for(key), 'wb') as session_file:
+                await session_file.write(token)
+
+    async def invalidate(self, username, saved_at=None):
+        """
+        Drop a user's cached session. When saved_at is given, only drop it if no
+        newer session has been stored since, so a peer's fresh login survives.
+        """
+        key = self.key_for(username)
+        if saved_at is not None and self._saved_at.get(key) != saved_at:
+            return
+        self._tokens.pop(key, None)
+        self._saved_at.pop(key, None)
+        if self.cache_dir and os.path.exists(self._path_for(key)):
+            os.remove(self._path_for(key))
@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import time
+import hashlib
+import aiofiles
+
+# Keywords that identify each metadata column in the GridResults_gv header row, tried in order
+GRID_COLUMNS = {
+    "building": ("building",),
+    "floor": ("floor", "level"),
+    "facility_type": ("facility type", "type"),
+    "capacity": ("capacity", "pax"),
+    "equipment": ("equipment",),
+}
+
+# Request list fields and the room attribute and constants.yaml names they filter on
+REQUEST_FILTERS = {
+    "building_names": ("building", "valid_buildings"),
+    "floors": ("floor", "valid_floors"),
+    "facility_types": ("facility_type", "valid_facility_types"),
+    "equipment": ("equipment", "valid_equipment"),
+}
+
+EQUIPMENT_SEPARATORS = re.compile(r"[,;/\n]+")
+
+
+def canonical_name(text, valid_names):
+    """
+    The constants.yaml spelling of text: an exact case-insensitive match, else the
+    longest valid name contained in text (so "Level 10" never matches "Level 1").
+    """
+    if not text:
+        return None
+    lowered = text.strip().lower()
+    for name in valid_names:
+        if name.lower() == lowered:
+            return name
+    contained = [name for name in valid_names if name.lower() in lowered]
+    return max(contained, key=len) if contained else None
+
+
+def grid_columns(grid_headers):
+    columns = {}
+    lowered = [header.strip().lower() for header in grid_headers]
+    for attribute, keywords in GRID_COLUMNS.items():
+        for keyword in keywords:
+            index = next((i for i, header in enumerate(lowered) if keyword in header and i not in columns.values()), None)
+            if index is not None:
+                columns[attribute] = index
+                break
+    return columns
+
+
+def describe_rooms(grid_headers, grid_rows, room_buildings, constants):
+    """
+    Per-room metadata from the results grid, with names normalised to constants.yaml.
+    room_buildings maps room to building from the scheduler's grouping rows and fills
+    in the building when the grid has no building column.
+    Returns ({room: metadata}, attributes known for every room).
+    """
+    columns = grid_columns(grid_headers)
+    rooms = {}
+    for row in grid_rows:
+        if len(row) <= 1:
+            continue
+        cell = lambda attribute: row[columns[attribute]] if attribute in columns and columns[attribute] < len(row) else None
+        capacity = re.search(r"\d+", cell("capacity") or "")
+        equipment_cell = cell("equipment")
+        equipment = None
+        if equipment_cell is not None:
+            pieces = [canonical_name(piece, constants['valid_equipment']) for piece in EQUIPMENT_SEPARATORS.split(equipment_cell)]
+            equipment = sorted({piece for piece in pieces if piece})
+        room = row[1]
+        rooms[room] = {
+            "building": canonical_name(cell("building"), constants['valid_buildings']) or room_buildings.get(room),
+            "floor": canonical_name(cell("floor"), constants['valid_floors']),
+            "facility_type": canonical_name(cell("facility_type"), constants['valid_facility_types']),
+            "capacity": int(capacity.group()) if capacity else None,
+            "equipment": equipment,
+        }
+    attributes = [
+        attribute for attribute in GRID_COLUMNS
+        if rooms and all(metadata[attribute] is not None for metadata in rooms.values())
+    ]
+    return rooms, attributes
+
+
+def buildings_from_row_headers(room_names_raw, valid_buildings):
+    """
+    The scheduler lists each building as a group row followed by its rooms.
+    """
+    room_buildings = {}
+    building = None
+    for name in room_names_raw:
+        if name in valid_buildings:
+            building = name
+        elif building is not None:
+            room_buildings[name] = building
+    return room_buildings
+
+
+def requested_filters(request, constants):
+    filters = {}
+    for field, (attribute, valid_key) in REQUEST_FILTERS.items():
+        names = getattr(request, field, None) or []
+        if names:
+            filters[attribute] = {canonical_name(name, constants[valid_key]) or name for name in names}
+    return filters
+
+
+def can_answer(snapshot, request, constants):
+    """
+    Whether filtering snapshot reproduces what FBS would return for request: every
+    filtered attribute must be known and the requested buildings must be covered.
+    """
+    filters = requested_filters(request, constants)
+    if not set(filters) <= set(snapshot["attributes"]):
+        return False
+    if snapshot["scope"] == "building":
+        return bool(filters.get("building")) and filters["building"] <= set(snapshot["building_names"])
+    return True
+
+
+def filter_snapshot(snapshot, request, constants):
+    """
+    {room: timeslots} for the rooms in snapshot that pass the request's filters.
+    Each list is an any-of match, like the FBS dropdowns.
+    """
+    filters = requested_filters(request, constants)
+    result = {}
+    for room, timeslots in snapshot["timeslots"].items():
+        metadata = snapshot["rooms"].get(room)
+        if metadata is None:
+            continue
+        matched = True
+        for attribute, names in filters.items():
+            value = metadata[attribute]
+            if attribute == "equipment":
+                matched = bool(names.intersection(value or []))
+            else:
+                matched = value in names
+            if not matched:
+                break
+        if matched:
+            result[room] = timeslots
+    return result
+
+
+class SupersetStore:
+    """
+    Superset snapshots per date, capacity bucket and time window, kept for
+    ttl_seconds. Any narrower request for the same date and window can be answered
+    from a covering snapshot. FBS may leave rooms out of the results grid when they
+    are closed or restricted for part of the window, so with match_time_window
+    off, which is only safe once that has been ruled out, a snapshot answers
+    requests for any window on its date.
+    With cache_dir set, snapshots are also written to disk and reloaded by load().
+    """
+
+    def __init__(self, ttl_seconds=300, cache_dir=None, match_time_window=True):
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self.match_time_window = match_time_window
+        self._snapshots = {}
+        self.hits = 0
+        self.misses = 0
+        # Called with every snapshot put into the store or reloaded, and its saved_at
+        self.listeners = []
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_constants(cls, constants):
+        config = constants.get('superset', {})
+        if not config.get('enabled', True):
+            return None
+        return cls(
+            ttl_seconds=config.get('ttl_seconds', 300),
+            cache_dir=config.get('filepath'),
+            match_time_window=config.get('match_time_window', True),
+        )
+
+    def _key(self, date_formatted, room_capacity, time_window):
+        # Snapshots saved before the window was recorded have none and only match without it
+        return (date_formatted, room_capacity, tuple(time_window or ()) if self.match_time_window else None)
+
+    def _path_for(self, snapshot):
+        identity = json.dumps([snapshot["date"], snapshot["room_capacity"], snapshot.get("time_window"), snapshot["scope"], snapshot["building_names"]])
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(identity.encode()).hexdigest()}.json")
+
+    def _keep(self, snapshot, saved_at):
+        key = self._key(snapshot["date"], snapshot["room_capacity"], snapshot.get("time_window"))
+        kept = [
+            (existing_saved_at, existing) for existing_saved_at, existing in self._snapshots.get(key, [])
+            if (existing["scope"], existing["building_names"]) != (snapshot["scope"], snapshot["building_names"])
+        ]
+        kept.append((saved_at, snapshot))
+        self._snapshots[key] = kept
+        for listener in self.listeners:
+            try:
+                listener(snapshot, saved_at)
+            except Exception as e:
+                print(f"Superset store listener failed: {e}")
+
+    async def put(self, snapshot):
+        saved_at = time.time()
+        self._keep(snapshot, saved_at)
+        if self.cache_dir:
+            async with aiofiles.open(self._path_for(snapshot), 'w') as snapshot_file:
+                await snapshot_file.write(json.dumps({"saved_at": saved_at, "snapshot": snapshot}))
+
+    async def load(self):
+        """
+        Reload persisted snapshots still within ttl_seconds, dropping the rest from disk.
+        """
+        if not self.cache_dir:
+            return 0
+        loaded = 0
+        for filename in sorted(os.listdir(self.cache_dir)):
+            path = os.path.join(self.cache_dir, filename)
+            if not filename.endswith(".json"):
+                continue
+            try:
+                async with aiofiles.open(path, 'r') as snapshot_file:
+                    persisted = json.loads(await snapshot_file.read())
+                saved_at, snapshot = persisted["saved_at"], persisted["snapshot"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Discarding unreadable superset snapshot {filename}: {e}")
+                os.remove(path)
+                continue
+            if time.time() - saved_at >= self.ttl_seconds:
+                os.remove(path)
+                continue
+            self._keep(snapshot, saved_at)
+            loaded += 1
+        print(f"Warm-started superset store with {loaded} snapshots")
+        return loaded
+
+    def covering(self, request, constants, date_formatted, room_capacity, time_window):
+        """
+        The newest fresh snapshot that can answer request, scraped for the same date,
+        capacity and, with match_time_window, the same [start_time, end_time].
+        """
+        key = self._key(date_formatted, room_capacity, time_window)
+        now = time.time()
+        fresh = []
+        for saved_at, snapshot in self._snapshots.get(key, []):
+            if now - saved_at < self.ttl_seconds:
+                fresh.append((saved_at, snapshot))
+            elif self.cache_dir and os.path.exists(self._path_for(snapshot)):
+                os.remove(self._path_for(snapshot))
+        self._snapshots[key] = fresh
+        for _, snapshot in sorted(fresh, key=lambda entry: entry[0], reverse=True):
+            if can_answer(snapshot, request, constants):
+                self.hits += 1
+                return snapshot
+        self.misses += 1
+        return None
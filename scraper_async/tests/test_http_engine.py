@@ -0,0 +1,171 @@
+"""
+HttpEngine against a stand-in FBS served through httpx.MockTransport: the ADFS
+login, the SAML hand-off, the frameContent search form and its postbacks.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from exceptions import HttpEngineUnsupportedException
+from http_engine import HttpEngine
+
+CONSTANTS = {"target_url": "https://fbs.test/home"}
+CREDENTIALS = SimpleNamespace(username="jane.doe.2024", password="hunter2")
+BUILDINGS = ["School of Accountancy", "School of Computing & Information Systems 1"]
+ROOMS = ["SOA-GSR 2-1", "SCIS1-GSR 2-4"]
+TITLES = ["(00:00-08:00) (not available)", "(22:30-23:59) (not available)"]
+
+LOGIN_PAGE = """
+<form method="post" action="/adfs/ls">
+  <input id="userNameInput" name="UserName" type="text">
+  <input id="passwordInput" name="Password" type="password">
+  <input type="submit" value="Sign in">
+</form>
+"""
+
+SAML_PAGE = """
+<form method="post" action="https://fbs.test/acs">
+  <input type="hidden" name="SAMLResponse" value="signed-token">
+</form>
+"""
+
+HOME_PAGE = '<frameset><frame name="frameContent" src="/booking"></frameset>'
+
+
+def render_search(state, searched=False):
+    boxes = "".join(
+        f'<input type="checkbox" id="DropMultiBuildingList_c1_{index}" name="DropMultiBuildingList$c1${index}"'
+        f'{" checked" if building in state["buildings"] else ""}'
+        f""" onclick="__doPostBack('DropMultiBuildingList$c1','')">"""
+        f'<label for="DropMultiBuildingList_c1_{index}">{building}</label>'
+        for index, building in enumerate(BUILDINGS)
+    )
+    grid = "".join(
+        f"<tr><td>{index}</td><td>{room}</td></tr>"
+        for index, room in enumerate(ROOMS)
+        if any(room.startswith(prefix) for prefix in state["room_prefixes"])
+    )
+    scheduler = ""
+    if searched:
+        scheduler = "".join(f'<div class="scheduler_bluewhite_rowheader_inner">{room}</div>' for room in ROOMS)
+        scheduler += "".join(f'<div class="scheduler_bluewhite_event scheduler_bluewhite_event_line0" title="{title}"></div>' for title in TITLES)
+    return f"""
+<form method="post" action="/booking">
+  <input type="hidden" name="__VIEWSTATE" value="state">
+  <input type="hidden" name="__EVENTTARGET" value="">
+  <input type="hidden" name="__EVENTARGUMENT" value="">
+  <input id="DateBookingFrom_c1_textDate" name="DateBookingFrom$c1$textDate" value="{state['date']}"
+         onchange="__doPostBack('DateBookingFrom$c1$textDate','')">
+  {boxes}
+  <select id="TimeFrom_c1_ctl04" name="TimeFrom$c1$ctl04"><option value="08:00" selected>08:00</option></select>
+  <select id="TimeTo_c1_ctl04" name="TimeTo$c1$ctl04"><option value="22:00" selected>22:00</option></select>
+  <select id="DropCapacity_c1" name="DropCapacity$c1"><option value="" selected>Any</option></select>
+  <a id="CheckAvailability" href="javascript:__doPostBack('CheckAvailability','')">Check Availability</a>
+</form>
+<table id="GridResults_gv"><tr><th>#</th><th>Room</th></tr>{grid}</table>
+{scheduler}
+"""
+
+
+class StandInFbs:
+    """Serves just enough of ADFS and FBS for HttpEngine, recording every request."""
+
+    def __init__(self):
+        self.requests = []
+        self.state = {"date": "01-Nov-2024", "buildings": set(), "room_prefixes": []}
+
+    def __call__(self, request):
+        self.requests.append(request)
+        url = request.url
+        form = {name: values[0] for name, values in parse_qs(request.content.decode()).items()}
+        if url.host == "fbs.test" and url.path == "/home":
+            if "fbs_auth" not in request.headers.get("cookie", ""):
+                return httpx.Response(302, headers={"Location": "https://adfs.test/adfs/ls"})
+            return httpx.Response(200, html=HOME_PAGE)
+        if url.host == "adfs.test" and request.method == "GET":
+            return httpx.Response(200, html=LOGIN_PAGE)
+        if url.host == "adfs.test":
+            if (form.get("UserName"), form.get("Password")) != (CREDENTIALS.username, CREDENTIALS.password):
+                return httpx.Response(200, html=LOGIN_PAGE)
+            return httpx.Response(200, html=SAML_PAGE)
+        if url.path == "/acs":
+            return httpx.Response(302, headers={"Location": "https://fbs.test/home", "Set-Cookie": "fbs_auth=1; Path=/"})
+        if url.path == "/booking":
+            return self.booking(request, form)
+        return httpx.Response(404)
+
+    def booking(self, request, form):
+        if request.method == "GET":
+            return httpx.Response(200, html=render_search(self.state))
+        target = form.get("__EVENTTARGET")
+        if target == "DateBookingFrom$c1$textDate":
+            self.state["date"] = form["DateBookingFrom$c1$textDate"]
+        elif target == "DropMultiBuildingList$c1":
+            self.state["buildings"] = {
+                building for index, building in enumerate(BUILDINGS)
+                if f"DropMultiBuildingList$c1${index}" in form
+            }
+            self.state["room_prefixes"] = ["SOA" if "Accountancy" in building else "SCIS1" for building in self.state["buildings"]]
+        return httpx.Response(200, html=render_search(self.state, searched=target == "CheckAvailability"))
+
+
+def search_request(**overrides):
+    fields = {
+        "credentials": CREDENTIALS,
+        "start_time": "09:00",
+        "building_names": [BUILDINGS[0]],
+        "floors": [],
+        "facility_types": [],
+        "equipment": [],
+    }
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def fetch(handler, request):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True) as client:
+            engine = HttpEngine(CONSTANTS, client=client)
+            return await engine.fetch_availability(request, "04-Nov-2024", "22:00", "")
+    return asyncio.run(run())
+
+
+def test_fetch_availability_replays_login_and_postbacks():
+    fbs = StandInFbs()
+    extracted = fetch(fbs, search_request())
+    assert extracted == {"matching_rooms": ["SOA-GSR 2-1"], "room_names": ROOMS, "booking_titles": TITLES}
+    assert fbs.state["date"] == "04-Nov-2024"
+    assert fbs.state["buildings"] == {BUILDINGS[0]}
+
+
+def test_wrong_credentials_are_unsupported():
+    with pytest.raises(HttpEngineUnsupportedException, match="login form came back"):
+        fetch(StandInFbs(), search_request(credentials=SimpleNamespace(username="jane.doe.2024", password="wrong")))
+
+
+@pytest.mark.parametrize("status_code", [500, 503, 403])
+def test_http_error_status_is_unsupported(status_code):
+    fbs = StandInFbs()
+
+    def failing(request):
+        if request.url.path == "/booking" and request.method == "POST":
+            return httpx.Response(status_code)
+        return fbs(request)
+
+    with pytest.raises(HttpEngineUnsupportedException, match=str(status_code)) as raised:
+        fetch(failing, search_request())
+    assert isinstance(raised.value.__cause__, httpx.HTTPStatusError)
+
+
+@pytest.mark.parametrize("error", [httpx.ConnectError, httpx.ReadTimeout, httpx.RemoteProtocolError])
+def test_transport_error_is_unsupported(error):
+    def unreachable(request):
+        raise error("stand-in FBS is down", request=request)
+
+    with pytest.raises(HttpEngineUnsupportedException) as raised:
+        fetch(unreachable, search_request())
+    assert isinstance(raised.value.__cause__, error)
@@ -0,0 +1,139 @@
+"""
+Property tests for fill_timeline: random room-days, on and off the grid, with
+overlapping, unsorted and unreadable entries, checked against the invariants the
+scraper relies on.
+"""
+
+import random
+
+import pytest
+
+from timeline import DAY_MINUTES, FREE_STATUS, fill_timeline, time_label, timeslot_bounds
+
+SLOT_MINUTES = [5, 10, 15, 30, 60]
+CASES = 300
+
+
+def random_entries(rng, slot_minutes):
+    """Unavailable entries for one room-day, mostly in start order, as FBS returns them."""
+    entries = []
+    minutes = 0
+    while minutes < DAY_MINUTES:
+        minutes += rng.choice([0, 0, slot_minutes, rng.randrange(0, 180)])
+        if minutes >= DAY_MINUTES:
+            break
+        # Off-grid ends, overlaps and entries running to the end of the day all occur
+        end = min(minutes + rng.choice([slot_minutes, 2 * slot_minutes, rng.randrange(1, 240)]), DAY_MINUTES)
+        booked = rng.random() < 0.7
+        entries.append({
+            "timeslot": f"{time_label(minutes)}-{time_label(end)}",
+            "available": False,
+            "status": "Booked" if booked else "Not available",
+            "details": {} if booked else None,
+        })
+        overlap = rng.randrange(1, 60) if rng.random() < 0.1 else 0
+        minutes = max(end - overlap, minutes + 1)
+    if len(entries) > 1 and rng.random() < 0.2:
+        first, second = rng.sample(range(len(entries)), 2)
+        entries[first], entries[second] = entries[second], entries[first]
+    return entries
+
+
+def unreadable(rng, entries):
+    """entries with a few unreadable timeslots inserted, and where they went."""
+    entries = list(entries)
+    for _ in range(rng.randrange(1, 3)):
+        entries.insert(rng.randrange(len(entries) + 1), {
+            "timeslot": rng.choice(["TBC", "25:00-26:00", "10:00-09:00", ""]),
+            "available": False,
+            "status": "Booked",
+            "details": {},
+        })
+    return entries
+
+
+def cases():
+    for seed in range(CASES):
+        rng = random.Random(seed)
+        slot_minutes = rng.choice(SLOT_MINUTES)
+        yield rng, slot_minutes, random_entries(rng, slot_minutes)
+
+
+def free_minutes(timeline):
+    return [timeslot_bounds(entry["timeslot"]) for entry in timeline if entry["available"]]
+
+
+def test_entries_pass_through_once_in_start_order():
+    for rng, slot_minutes, entries in cases():
+        timeline = fill_timeline(entries, slot_minutes)
+        kept = [entry for entry in timeline if not entry["available"]]
+        assert sorted(map(id, kept)) == sorted(map(id, entries))
+        # Stable: entries starting together keep their scraped order
+        expected = sorted(entries, key=lambda entry: timeslot_bounds(entry["timeslot"])[0])
+        assert [id(entry) for entry in kept] == [id(entry) for entry in expected]
+
+
+def test_free_slots_fill_every_gap_and_never_overlap_entries():
+    for rng, slot_minutes, entries in cases():
+        timeline = fill_timeline(entries, slot_minutes)
+        busy = [False] * DAY_MINUTES
+        for entry in entries:
+            start, end = timeslot_bounds(entry["timeslot"])
+            busy[start:end] = [True] * (end - start)
+        covered = [False] * DAY_MINUTES
+        for start, end in free_minutes(timeline):
+            assert not any(busy[start:end]), f"free {start}-{end} overlaps a booking"
+            assert not any(covered[start:end]), f"free {start}-{end} is listed twice"
+            covered[start:end] = [True] * (end - start)
+        assert all(busy[minute] or covered[minute] for minute in range(DAY_MINUTES))
+
+
+def test_free_slots_stay_within_one_grid_cell():
+    for rng, slot_minutes, entries in cases():
+        timeline = fill_timeline(entries, slot_minutes)
+        for start, end in free_minutes(timeline):
+            assert start < end
+            assert start // slot_minutes == (end - 1) // slot_minutes
+        for entry in timeline:
+            if entry["available"]:
+                assert entry["status"] == FREE_STATUS and entry["details"] is None
+
+
+def test_timeline_is_in_start_order():
+    for rng, slot_minutes, entries in cases():
+        starts = [timeslot_bounds(entry["timeslot"])[0] for entry in fill_timeline(entries, slot_minutes)]
+        assert starts == sorted(starts)
+
+
+def test_day_window_bounds_the_free_slots():
+    for rng, slot_minutes, entries in cases():
+        day_start = rng.randrange(0, DAY_MINUTES // 2)
+        day_end = rng.randrange(day_start + 1, DAY_MINUTES + 1)
+        timeline = fill_timeline(entries, slot_minutes, day_start=day_start, day_end=day_end)
+        for start, end in free_minutes(timeline):
+            assert day_start <= start < end <= day_end
+        assert len(timeline) - len(free_minutes(timeline)) == len(entries)
+
+
+def test_unreadable_entries_are_kept_after_the_entry_before_them():
+    for rng, slot_minutes, entries in cases():
+        entries = sorted(entries, key=lambda entry: timeslot_bounds(entry["timeslot"])[0])
+        mixed = unreadable(rng, entries)
+        timeline = fill_timeline(mixed, slot_minutes)
+        unavailable = [entry for entry in timeline if not entry["available"]]
+        assert [id(entry) for entry in unavailable] == [id(entry) for entry in mixed]
+        # They do not move the timeline forward, so the readable entries still get the same free slots
+        assert free_minutes(timeline) == free_minutes(fill_timeline(entries, slot_minutes))
+
+
+def test_empty_day_is_all_free():
+    for slot_minutes in SLOT_MINUTES:
+        timeline = fill_timeline([], slot_minutes)
+        assert len(timeline) == DAY_MINUTES // slot_minutes
+        assert timeline[-1]["timeslot"].endswith("-23:59")
+
+
+@pytest.mark.parametrize("slot_minutes", [7, 25, 1000])
+def test_slot_minutes_must_divide_the_day(slot_minutes):
+    with pytest.raises(ValueError):
+        fill_timeline([], slot_minutes)
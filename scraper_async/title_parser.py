@@ -0,0 +1,126 @@
+"""
+Parser for the title attribute of FBS scheduler events, which is either a booking:
+
+    Booking Time: 09:00-10:30
+    Booking Status: Confirmed
+    Booking Reference Number: BK-20241101-000001
+    Booked for User Name: JANE DOE
+    ...
+
+or a closed period such as "(22:30-23:59) (not available)".
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict
+from timeline import time_label, timeslot_bounds
+
+TIME = r"\d{1,2}:\d{2}"
+BOOKING_TITLE_PATTERN = re.compile(rf"\s*Booking Time:[ \t]*(?P<start>{TIME})[ \t]*-[ \t]*(?P<end>{TIME})[ \t]*(?:\r?\n(?P<fields>.*))?\Z", re.S)
+NOT_AVAILABLE_PATTERN = re.compile(rf"\s*\([ \t]*(?P<start>{TIME})[ \t]*-[ \t]*(?P<end>{TIME})[ \t]*\)[ \t]*\(not available\)\s*\Z")
+LINE_BREAK_PATTERN = re.compile(r"\r?\n")
+
+# The fields FBS writes, in its order. A title with exactly these, which is nearly all
+# of them, is read by one match, with any lines after the purpose read as more of it;
+# any other booking goes through parse_fields.
+FIELD_NAMES = (
+    "Booking Time",
+    "Booking Status",
+    "Booking Reference Number",
+    "Booked for User Name",
+    "Booked for User Org Unit",
+    "Booked for User Email Address",
+    "Use Type",
+    "Purpose of Booking",
+)
+STANDARD_BOOKING_PATTERN = re.compile(
+    rf"Booking Time: ({TIME}-{TIME})"
+    + "".join(rf"\n{re.escape(name)}: ([^\r\n]*)" for name in FIELD_NAMES[1:-1])
+    + r"\nPurpose of Booking: ([^\r\n]*(?:\n[^\r\n:]*[^\s:][^\r\n:]*)*)\n?\Z"
+)
+
+
+@dataclass(slots=True)
+class BookingTitle:
+    """
+    One scheduler event. start and end are minutes from midnight, with 23:59 read
+    as the end of the day, timeslot is the zero-padded HH:MM-HH:MM label, and fields
+    keeps every "Key: value" line of a booking in title order, Booking Time included.
+    """
+    start: int
+    end: int
+    timeslot: str
+    status: str
+    fields: Dict[str, str] = field(default_factory=dict)
+
+    def to_entry(self, timeslot=None):
+        """
+        The timeslot entry the scraper returns. timeslot overrides the time range in
+        the title when exact times are known from elsewhere.
+        """
+        return {
+            "timeslot": timeslot or self.timeslot,
+            "available": False,
+            "status": self.status,
+            "details": dict(self.fields) if self.status == "Booked" else None,
+        }
+
+
+@lru_cache(maxsize=4096)
+def read_timeslot(start_label, end_label):
+    """
+    (start, end, timeslot) with timeslot rebuilt zero-padded from the minutes, or
+    None when the range is not valid. The same few labels recur on every page.
+    """
+    try:
+        start, end = timeslot_bounds(f"{start_label}-{end_label}")
+    except ValueError:
+        return None
+    return start, end, f"{time_label(start)}-{time_label(end)}"
+
+
+def parse_fields(text):
+    """
+    "Key: value" lines into a dict. A line without a key continues the previous
+    value, as a multi-line purpose does, and "Key:" alone is an empty value.
+    """
+    fields = {}
+    key = None
+    for line in LINE_BREAK_PATTERN.split(text):
+        name, separator, value = line.partition(": ")
+        if not separator and len(line) > 1 and line.endswith(":"):
+            name, separator, value = line[:-1], ":", ""
+        if separator and name:
+            key = name
+            fields[key] = value
+        elif key is not None and line.strip():
+            fields[key] += "\n" + line
+    return fields
+
+
+def parse_title(title):
+    """
+    A BookingTitle for a booking or not-available title, or None when the title
+    matches neither or its times are not a valid range.
+    """
+    if not title:
+        return None
+    if title.startswith("("):
+        match = NOT_AVAILABLE_PATTERN.match(title)
+        bounds = match and read_timeslot(match.group("start"), match.group("end"))
+        return BookingTitle(*bounds, "Not available") if bounds else None
+    match = STANDARD_BOOKING_PATTERN.match(title)
+    if match is not None:
+        fields = dict(zip(FIELD_NAMES, match.groups()))
+        start_label, _, end_label = fields["Booking Time"].partition("-")
+    else:
+        match = BOOKING_TITLE_PATTERN.match(title)
+        if match is None:
+            return None
+        start_label, end_label = match.group("start", "end")
+        fields = {"Booking Time": f"{start_label}-{end_label}", **parse_fields(match.group("fields") or "")}
+    bounds = read_timeslot(start_label, end_label)
+    if bounds is None:
+        return None
+    return BookingTitle(*bounds, "Booked", fields)
@@ -0,0 +1,118 @@
+from contextlib import asynccontextmanager
+from playwright.async_api import Error as PlaywrightError
+
+# True once the ASP.NET page has finished loading and no UpdatePanel postback is in flight
+POSTBACK_IDLE_JS = """
+() => {
+    if (document.readyState !== 'complete') return false;
+    const prm = window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager;
+    return !(prm && prm.getInstance().get_isInAsyncPostBack());
+}
+"""
+
+ARM_MUTATION_OBSERVER_JS = """
+(selector) => {
+    window.__sagasuMutated = false;
+    if (window.__sagasuObserver) window.__sagasuObserver.disconnect();
+    const target = document.querySelector(selector) || document.body;
+    window.__sagasuObserver = new MutationObserver(() => { window.__sagasuMutated = true; });
+    window.__sagasuObserver.observe(target, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+"""
+
+# A full postback replaces the frame's window, which drops the flag altogether, so
+# anything but the armed false value means the page changed
+MUTATED_JS = "() => window.__sagasuMutated !== false"
+
+VALUE_CHANGED_JS = """
+([selector, previous]) => {
+    const element = document.querySelector(selector);
+    return element !== null && element.value !== previous;
+}
+"""
+
+
+class WaitProfile:
+    """
+    Upper bounds (event-driven mode) or fixed sleeps (legacy mode) for each
+    scraping step, in milliseconds.
+    """
+
+    def __init__(self, name, event_driven=True, slow_mo=0, login_ms=20000, filter_ms=10000,
+                 date_step_ms=10000, settle_ms=10000, availability_ms=20000):
+        self.name = name
+        self.event_driven = event_driven
+        self.slow_mo = slow_mo
+        self.login_ms = login_ms
+        self.filter_ms = filter_ms
+        self.date_step_ms = date_step_ms
+        self.settle_ms = settle_ms
+        self.availability_ms = availability_ms
+
+    @classmethod
+    def from_constants(cls, constants, name=None):
+        name = name or constants.get('default_wait_profile', 'fast')
+        profiles = constants.get('wait_profiles', {})
+        if name not in profiles:
+            raise ValueError(f"Unknown wait profile '{name}'. Valid profiles: {', '.join(profiles)}")
+        return cls(name, **profiles[name])
+
+
+async def wait_for_postback(frame, timeout_ms):
+    try:
+        await frame.wait_for_function(POSTBACK_IDLE_JS, timeout=timeout_ms)
+    except PlaywrightError as e:
+        print(f"Postback did not settle within {timeout_ms} ms: {e}")
+
+
+async def after_login(page, profile):
+    if not profile.event_driven:
+        await page.wait_for_timeout(profile.login_ms)
+        await page.wait_for_load_state('networkidle')
+        return
+    await page.wait_for_selector("[name='frameContent']", state='attached', timeout=profile.login_ms)
+    frame = page.frame(name="frameContent")
+    if frame:
+        await frame.wait_for_load_state('domcontentloaded', timeout=profile.login_ms)
+        await wait_for_postback(frame, profile.login_ms)
+
+
+async def settle(frame, profile):
+    if not profile.event_driven:
+        await frame.wait_for_timeout(profile.settle_ms)
+        return
+    await wait_for_postback(frame, profile.settle_ms)
+
+
+@asynccontextmanager
+async def expect_change(frame, selector, profile, timeout_ms):
+    """
+    Wrap an action that triggers a postback. In event-driven mode, waits until
+    the DOM under selector mutates (or the frame reloads) and the postback is
+    idle again; in legacy mode, waits for networkidle plus a fixed sleep.
+    """
+    if not profile.event_driven:
+        yield
+        await frame.page.wait_for_load_state('networkidle')
+        await frame.wait_for_timeout(timeout_ms)
+        return
+
+    await frame.evaluate(ARM_MUTATION_OBSERVER_JS, selector)
+    yield
+    try:
+        await frame.wait_for_function(MUTATED_JS, timeout=timeout_ms)
+    except PlaywrightError as e:
+        # Also raised when the reload tears down the context mid-poll, which wait_for_postback then covers
+        print(f"No change under {selector} observed within {timeout_ms} ms: {e}")
+    await wait_for_postback(frame, timeout_ms)
+
+
+async def wait_for_value_change(frame, selector, previous, profile, timeout_ms):
+    if not profile.event_driven:
+        await frame.wait_for_timeout(timeout_ms)
+        return
+    try:
+        await frame.wait_for_function(VALUE_CHANGED_JS, arg=[selector, previous], timeout=timeout_ms)
+    except PlaywrightError as e:
+        print(f"Value of {selector} did not change within {timeout_ms} ms: {e}")
+    await wait_for_postback(frame, timeout_ms)